@@ -49,8 +49,11 @@ import pytest
 # My packages
 # For when 'from arcanequant import *' is used
 __all__ = ["DataManifest",
-           "DownloadIntraday", "ExtractData",
-           "SQLSetup", "SQLEstablish", "SQLRepair", "SQLSave", "SQLSync", "SQLClear", "SQLNuke", "SetKeysQuery", "DropKeysQuery", "ExecuteSQL", "DFtoSQLFormat", "SQLtoDFFormat"]
+           "DownloadIntraday", "ExtractData", "ExtractDataUnits", "ExtractDataChunks",
+           "UnitCache", "unitCache", "TickerCache", "tickerCache", "PoolMetrics", "poolMetrics",
+           "SaveBinary", "LoadBinary", "BinaryIndex", "CSVtoBinary",
+           "SQLSetup", "SQLEstablish", "SQLRepair", "SQLMigrate", "SQLManifest", "SQLSave", "SQLSync", "SQLLoad", "SQLClear", "SQLClearUnits", "SQLNuke", "SetKeysQuery", "DropKeysQuery", "DDLPlan", "ExecuteSQL", "DFtoSQLFormat", "SQLtoDFFormat", "CompactFormat", "DateTimeIDs",
+           "StorageBackend", "PostgresBackend", "DuckDBBackend"]
 
 # Relative imports (child) (i.e. from arcanequant import DataManifest (relies on quantlib folder))
 from .quantlib import *
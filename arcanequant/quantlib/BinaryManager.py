@@ -0,0 +1,208 @@
+import os
+import json
+import threading
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from .DataManifestManager import DataManifest
+
+class BinaryManager():
+    """Placeholder class for package-level structure or future use."""
+    pass
+
+
+# Functions in this file:
+# - SaveBinary - Saves (inserts or replaces) months of market data into the binary series of their ticker/interval
+# - LoadBinary - Loads a time range of the binary series of a ticker/interval (as a memory-mapped slice or DataFrame)
+# - BinaryIndex - Reads the month-offset index of the binary series of a ticker/interval
+# - CSVtoBinary - Converts the .csv market data files indicated in a DataManifest into binary series
+
+# Binary store layout:
+# One binary series per ticker/interval "{directory}{ticker}/{ticker}_{interval}.bin": a header (binaryMagic, the uint64 length
+# of the month-offset index, and the index as JSON padded to a multiple of 64 bytes) then a contiguous array of fixed-width
+# records (binaryDtype) sorted by time (ascending). The index gives the number of rows and the rows [start, stop) of each
+# month in the series. The DateTime is stored as int64 nanoseconds (a datetime64[ns] view).
+# The index is in the same file as the records, so a series is replaced (with its index) at once, and a reader reads both
+# from the same open file (never the index of another version of the records).
+binaryDtype = np.dtype([('DateTime', '<i8'), ('Open', '<f8'), ('High', '<f8'), ('Low', '<f8'), ('Close', '<f8'), ('Volume', '<i8')])
+binaryMagic = b'AQBIN01\n'
+
+
+def SaveBinary(dataDF: pd.DataFrame, directory: str, ticker: str, interval: int, months: str | list[str] = None) -> dict:
+    """
+    Saves market data into the binary series of its ticker/interval, replacing the rows of the months in the data (an upsert
+    by month), and updates the month-offset index of the series. The series (and its folder) is created if it does not exist.
+    Inputs:
+    - dataDF - DataFrame of market data of a single ticker/interval, with the DateTime, Open, High, Low, Close and Volume
+    columns (as in the .csv files, DateTime as string or datetime64), in any time order.
+    - directory - String of the directory of the data (as DataManifest.directory, ending with '/')
+    - ticker - String of the ticker of the data
+    - interval - Integer of the interval of the data
+
+    Optional input:
+    - months - String or list of strings ('YYYY-MM') of months to replace even if not in the data (i.e. to clear them)
+
+    Output:
+    - The updated month-offset index of the series
+
+    Note:
+    - The series is rewritten with its index (to a temporary file then swapped in), so saving costs the size of the whole
+    series, and readers see either the series before or after the save.
+    """
+    newRecords = _toRecords(dataDF)
+    binPath = _binaryPath(directory, ticker, interval)
+
+    # Replace the months saved (and any months given)
+    replaceMonths = np.unique(_recordMonths(newRecords))
+    if months is not None:
+        replaceMonths = np.union1d(replaceMonths, np.array([months] if isinstance(months, str) else list(months), dtype = 'datetime64[M]'))
+
+    oldRecords = _openSeries(directory, ticker, interval) if os.path.exists(binPath) else np.empty(0, dtype = binaryDtype)
+    records = np.concatenate([oldRecords[~np.isin(_recordMonths(oldRecords), replaceMonths)], newRecords])
+    records = records[np.argsort(records['DateTime'], kind = 'stable')]
+
+    return _writeSeries(records, binPath)
+
+def LoadBinary(directory: str, ticker: str, interval: int, start = None, end = None, asFrame = True) -> pd.DataFrame | np.memmap:
+    """
+    Loads a time range of the binary series of a ticker/interval. The series is opened as a memory map, and the range is
+    found by binary search on the (sorted) DateTime, so the range read is a slice of the memory map (no copy or parsing).
+    Inputs:
+    - directory - String of the directory of the data (as DataManifest.directory, ending with '/')
+    - ticker - String of the ticker of the series
+    - interval - Integer of the interval of the series
+
+    Optional inputs:
+    - start - Start period of the range (as ExtractData, i.e. whatever pandas.Period() accepts, start of period), None for no limit
+    - end - End period of the range (as ExtractData, end of period), None for no limit
+    - asFrame - Boolean indicating to return a DataFrame (DateTime as datetime64[ns], in ascending time order), otherwise
+    returns the memory-mapped slice of records (binaryDtype) itself
+
+    Note:
+    - Raises FileNotFoundError if the series does not exist.
+    - The memory-mapped slice is read-only, and is only valid until the series is saved again (copy it to keep it).
+    """
+    from .DataManager import _periodBounds
+    records = _openSeries(directory, ticker, interval)
+
+    # Rows in range (binary search on the sorted DateTime)
+    startDT, endDT = _periodBounds(start, end)
+    first = np.searchsorted(records['DateTime'], startDT.value, side = 'left')
+    last = np.searchsorted(records['DateTime'], endDT.value, side = 'right')
+    records = records[first:last]
+
+    if not asFrame: return records
+    return _toFrame(records, convertDatetime = True)
+
+def BinaryIndex(directory: str, ticker: str, interval: int) -> dict:
+    """
+    Reads the month-offset index of the binary series of a ticker/interval (from the header of the series), a dictionary with
+    the number of 'rows' of the series and the 'months' in the series, each with the rows [start, stop) of the month.
+    Note:
+    - Raises FileNotFoundError if the series does not exist, and ValueError if the file is not a binary series.
+    - To read rows of the series by the index, read both with _readSeries (the series may be saved again in between).
+    """
+    with open(_binaryPath(directory, ticker, interval), 'rb') as binFile:
+        return _readHeader(binFile)[0]
+
+def CSVtoBinary(dataManifest: DataManifest, workers: int = 4, echo = True) -> int:
+    """
+    Converts the .csv market data files indicated in a DataManifest (values 1 or 2) into binary series in the same directory,
+    writing each ticker/interval series once with all of its months. Returns the number of series written.
+    Inputs:
+    - dataManifest - DataManifest with a valid directory (the .csv files are read from, and the series written to, it)
+
+    Optional inputs:
+    - workers - Integer number of threads converting the series
+    - echo - Boolean indicating function verbosity
+
+    Note:
+    - Existing series are replaced (by the months in the manifest only).
+    - The .csv files (and manifest) are left as they are, use DataManifest.validateManifest(source = 'binary') to check the
+    binary series against the manifest (recording the units found as stored in binary, see DataManifest.unitFormat).
+    - The units already stored in binary (see DataManifest.unitFormat) are read from their series.
+    - The units are read without the unitCache (read once, they would only evict the units cached).
+    """
+    if ( not isinstance(dataManifest.directory, str) ) or dataManifest.directory == "":
+        raise TypeError('The data manifest directory pointer must be a string pointing to a valid path/folder.')
+    from concurrent.futures import ThreadPoolExecutor
+
+    # Months of each ticker/interval series
+    seriesMonths = {}
+    for ticker, interval, month in dataManifest.listUnits():
+        seriesMonths.setdefault((ticker, interval), []).append(month)
+
+    def convertSeries(series) -> int:
+        (ticker, interval), months = series
+        dataDF = pd.concat([dataManifest.loadData_fromfile(ticker, interval, month, echo = False, cache = False) for month in months], ignore_index = True)
+        records = _toRecords(dataDF)
+        _writeSeries(records, _binaryPath(dataManifest.directory, ticker, interval))
+        if echo: print(f"Converted {ticker} ({interval} min) to binary: {len(months)} months, {len(records)} rows")
+        return 1
+
+    with ThreadPoolExecutor(max_workers = max(1, workers)) as pool:
+        return sum(pool.map(convertSeries, seriesMonths.items()))
+
+
+# Path of the binary series of a ticker/interval
+def _binaryPath(directory: str, ticker: str, interval: int) -> str:
+    return rf"{directory}{ticker}/{ticker}_{interval}.bin"
+
+# Records (binaryDtype, sorted by time) of a DataFrame of market data
+def _toRecords(dataDF: pd.DataFrame) -> np.ndarray:
+    records = np.empty(len(dataDF), dtype = binaryDtype)
+    dateTimes = dataDF['DateTime']
+    if not pd.api.types.is_datetime64_any_dtype(dateTimes):
+        dateTimes = pd.to_datetime(dateTimes, format = "%Y-%m-%d %H:%M:%S")
+    records['DateTime'] = dateTimes.to_numpy(dtype = 'datetime64[ns]').view('<i8')
+    for col in ['Open', 'High', 'Low', 'Close']:
+        records[col] = dataDF[col].to_numpy(dtype = '<f8')
+    records['Volume'] = dataDF['Volume'].to_numpy(dtype = '<i8')
+    return records[np.argsort(records['DateTime'], kind = 'stable')]
+
+# Months (datetime64[M]) of each record
+def _recordMonths(records: np.ndarray) -> np.ndarray:
+    return records['DateTime'].view('datetime64[ns]').astype('datetime64[M]')
+
+# Writes the records (sorted) of a series with its month-offset index in the header (to a temporary file, then swapped in)
+def _writeSeries(records: np.ndarray, binPath: str) -> dict:
+    months, starts = np.unique(_recordMonths(records), return_index = True)
+    stops = np.append(starts[1:], len(records))
+    index = {'rows': int(len(records)), 'months': {str(month): [int(first), int(last)] for month, first, last in zip(months, starts, stops)}}
+    header = json.dumps(index).encode()
+    header += b' ' * (-(len(binaryMagic) + 8 + len(header)) % 64) # Records aligned in the file
+
+    Path(binPath).parent.mkdir(parents = True, exist_ok = True)
+    tmpPath = f"{binPath}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmpPath, 'wb') as binFile:
+        binFile.write(binaryMagic + np.uint64(len(header)).tobytes() + header)
+        records.tofile(binFile)
+    os.replace(tmpPath, binPath)
+    return index
+
+# Month-offset index of an open series (from its header), with the offset of its records in the file
+def _readHeader(binFile) -> tuple[dict, int]:
+    prefix = binFile.read(len(binaryMagic) + 8)
+    if len(prefix) < len(binaryMagic) + 8 or prefix[:len(binaryMagic)] != binaryMagic:
+        raise ValueError(f"The file {binFile.name} is not a binary series (save it again with SaveBinary or CSVtoBinary).")
+    headerSize = int(np.frombuffer(prefix[len(binaryMagic):], dtype = '<u8')[0])
+    return json.loads(binFile.read(headerSize)), len(prefix) + headerSize
+
+# Month-offset index and records (read-only memory map) of a series, both read from the same open file (the same version)
+def _readSeries(directory: str, ticker: str, interval: int) -> tuple[dict, np.ndarray]:
+    with open(_binaryPath(directory, ticker, interval), 'rb') as binFile:
+        index, offset = _readHeader(binFile)
+        if index['rows'] == 0: return index, np.empty(0, dtype = binaryDtype) # Cannot map an empty range
+        return index, np.memmap(binFile, dtype = binaryDtype, mode = 'r', offset = offset, shape = (index['rows'],))
+
+# Opens the records of a series as a (read-only) memory map
+def _openSeries(directory: str, ticker: str, interval: int) -> np.ndarray:
+    return _readSeries(directory, ticker, interval)[1]
+
+# DataFrame of records, DateTime as datetime64[ns] or as string (as in the .csv files)
+def _toFrame(records: np.ndarray, convertDatetime = True) -> pd.DataFrame:
+    dateTimes = records['DateTime'].view('datetime64[ns]')
+    if not convertDatetime:
+        dateTimes = np.char.replace(np.datetime_as_string(dateTimes, unit = 's'), 'T', ' ').astype(object)
+    return pd.DataFrame({'DateTime': dateTimes, 'Open': records['Open'], 'High': records['High'], 'Low': records['Low'],
+                         'Close': records['Close'], 'Volume': records['Volume']})
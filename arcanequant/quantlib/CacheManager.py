@@ -0,0 +1,359 @@
+import os
+import time
+import threading
+import weakref
+from collections import OrderedDict
+import pandas as pd
+import sqlalchemy
+from typing import Iterable
+
+
+##################################
+##################################
+# Unit Cache Class
+class UnitCache():
+    """
+    UnitCache keeps in memory the unit datasets (a single ticker, interval and month of data, as loaded by loadData_fromcsv
+    and loadData_fromsql) that were loaded recently, so loading the same units again does not read the files or query the
+    database again. A single process-wide UnitCache (unitCache) is shared by every DataManifest (and so ExtractData).
+    The units are kept up to a budget of bytes, evicting the least recently used units first.
+    Note:
+    - Units are stored with the version of their source they were loaded from: the modification time and size of the files
+    for .csv files, and a generation number for SQL databases which is increased whenever SQLSave/SQLClear/SQLNuke changes
+    the database. Units loaded from an older version are never served.
+    - Changes to the database made outside of this process (or not through SQLSave/SQLClear/SQLNuke) are not detected, use
+    invalidate() after such changes.
+    - Units marked as 2 (incomplete) in the manifest are never cached.
+    - One-pass bulk reads (validateManifest, SQLSync, CSVtoBinary) do not use the cache (loadData_fromcsv cache = False), so
+    they do not evict the units cached.
+    - Copies of the units are stored and served, so changing a DataFrame served does not change the cache.
+    ___________________________________
+    Method List:
+    > get - Gets a copy of a unit (if cached with the same version and options)
+    > put - Caches a copy of a unit (evicting the least recently used units if over budget)
+    > source - Gets the source identifier of a directory (.csv files) or connection engine (SQL database)
+    > generation - Gets the generation number of a source (its version, for sources without file versions)
+    > invalidate - Removes the cached units of a source and/or unit (ticker, interval, month)
+    > clear - Removes all cached units
+    > stats - Hits, misses and evictions counters, with the number of units and bytes cached
+    """
+
+    def __init__(self, maxBytes: int = 256 * 1024**2):
+        self.maxBytes = maxBytes # Budget of bytes of the cached units, 0 disables the cache
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        self._entries = OrderedDict() # Key (source, ticker, interval, month, version, options) to (unit, bytes), least recently used first
+        self._generations = {} # Source to generation number
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f'UnitCache(maxBytes = {self.maxBytes}). Units cached: {len(self._entries)}, bytes: {self.bytes}'
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxBytes > 0
+
+    def get(self, source: tuple, ticker: str, interval: int, month: str, version, options: tuple = ()) -> pd.DataFrame | tuple | None:
+        """
+        This method gets a copy of a cached unit (DataFrame or tuple of DataFrames as cached), or None if the unit is not cached
+        with the given version and options (a miss).
+        Inputs:
+        - source - Tuple identifying the source of the unit (from the source method)
+        - ticker, interval, month - Identifiers of the unit
+        - version - Version of the source the unit must have been loaded from (i.e. file modification times/sizes or generation)
+        - options - Tuple of the loading options the unit must have been loaded with (i.e. DateTime conversion)
+        """
+        key = (source, ticker, interval, month, version, options)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key) # Most recently used
+            self.hits += 1
+        return _copyUnit(entry[0])
+
+    def put(self, source: tuple, ticker: str, interval: int, month: str, version, unit: pd.DataFrame | tuple, options: tuple = ()):
+        """
+        This method caches a copy of a unit (DataFrame or tuple of DataFrames) loaded from the given source version with the
+        given options, then evicts the least recently used units until the cache is within its budget of bytes.
+        Units larger than the whole budget are not cached.
+        """
+        if not self.enabled: return
+        unit = _copyUnit(unit)
+        unitBytes = _unitBytes(unit)
+        if unitBytes > self.maxBytes: return
+
+        key = (source, ticker, interval, month, version, options)
+        with self._lock:
+            if key in self._entries: self.bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (unit, unitBytes)
+            self.bytes += unitBytes
+            while self.bytes > self.maxBytes:
+                _, (_, evictedBytes) = self._entries.popitem(last = False)
+                self.bytes -= evictedBytes
+                self.evictions += 1
+
+    def source(self, origin: str | sqlalchemy.engine.Engine) -> tuple:
+        """
+        This method gets the source identifier of a directory of .csv files (string) or of a SQL database (connection engine).
+        """
+        if isinstance(origin, str):
+            return ('csv', os.path.abspath(origin))
+        return _engineSource(origin)
+
+    def generation(self, source: tuple) -> int:
+        """
+        This method gets the generation number of a source, increased whenever the whole source is invalidated (used as the
+        version of sources without files, i.e. SQL databases). Get it before loading the unit.
+        """
+        with self._lock:
+            return self._generations.get(source, 0)
+
+    def invalidate(self, source: tuple | str | sqlalchemy.engine.Engine = None, ticker: str = None, interval: int = None, month: str = None) -> int:
+        """
+        This method removes the cached units matching all the given identifiers (None matches any), returning the number of
+        units removed.
+        Inputs:
+        - source - Source identifier (or directory/engine) of the units, None for all sources
+        - ticker, interval, month - Identifiers of the units, None for any
+        Note:
+        - If no ticker, interval and month are given, the whole source changed: its generation number is also increased, so
+        a unit being loaded meanwhile (from the previous generation) is never served.
+        """
+        if source is not None and not isinstance(source, tuple): source = self.source(source)
+        with self._lock:
+            if ticker is None and interval is None and month is None:
+                for gSource in ([source] if source is not None else list(self._generations)):
+                    self._generations[gSource] = self._generations.get(gSource, 0) + 1
+
+            removed = [key for key in self._entries
+                       if (source is None or key[0] == source) and (ticker is None or key[1] == ticker)
+                       and (interval is None or key[2] == interval) and (month is None or key[3] == month)]
+            for key in removed:
+                self.bytes -= self._entries.pop(key)[1]
+        return len(removed)
+
+    def clear(self):
+        """
+        This method removes all cached units (the counters are kept).
+        """
+        self.invalidate()
+
+    @property
+    def stats(self) -> dict:
+        """Hits, misses and evictions counters, with the number of units and bytes cached (and the budget)."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'units': len(self._entries),
+                    'bytes': self.bytes, 'maxBytes': self.maxBytes}
+
+
+##################################
+##################################
+# Ticker Cache Class
+class TickerCache():
+    """
+    TickerCache keeps in memory the TickerID of each Ticker of the tickerTable of each SQL database (by connection engine), so
+    SQLSave resolves the TickerIDs of the saved rows without reading the tickerTable on every save. The tickerTable of a
+    database is read once, then new tickers are inserted (and their TickerIDs returned) by the same query, and added to the cache.
+    A single process-wide TickerCache (tickerCache) is shared by every SQLSave.
+    Note:
+    - The cache of a database is invalidated by SQLEstablish, SQLClear and SQLNuke. Changes to the tickerTable made outside of
+    this process (or not through these functions) are not detected, use invalidate() after such changes.
+    ___________________________________
+    Method List:
+    > resolve - Gets the TickerIDs of the given tickers (inserting the new tickers into the tickerTable)
+    > invalidate - Removes the cached TickerIDs of a database (or of all databases)
+    > stats - Reads (of the tickerTable) and inserts counters, with the number of databases and tickers cached
+    """
+
+    def __init__(self):
+        self.reads = 0
+        self.inserts = 0
+        self._tickerIDs = {} # Source to dictionary of Ticker to TickerID
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f'TickerCache(). Databases cached: {len(self._tickerIDs)}, tickers: {sum(len(ids) for ids in self._tickerIDs.values())}'
+
+    def resolve(self, engine: sqlalchemy.engine.Engine, tickers: Iterable[str], conn: sqlalchemy.engine.Connection = None) -> dict:
+        """
+        This method gets the TickerIDs of the given tickers (a dictionary of Ticker to TickerID) in the database of the
+        connection engine, reading its tickerTable if not cached yet, and inserting the tickers not in the tickerTable (with
+        INSERT ... RETURNING, a single query for all new tickers).
+        Inputs:
+        - engine - Connection engine of the database
+        - tickers - Iterable of the tickers to resolve (repeats allowed)
+
+        Optional input:
+        - conn - Connection to use (i.e. within an open transaction), otherwise a connection of the engine is used (and committed)
+        """
+        source = _engineSource(engine)
+        tickers = list(dict.fromkeys(str(tick) for tick in tickers))
+        with self._lock:
+            tickerIDs = self._tickerIDs.get(source)
+            newTicks = [tick for tick in tickers if tick not in tickerIDs] if tickerIDs is not None else tickers
+        if tickerIDs is not None and not newTicks:
+            return {tick: tickerIDs[tick] for tick in tickers}
+
+        ownConn = conn is None
+        conn = engine.connect() if ownConn else conn
+        try:
+            if tickerIDs is None: # Read the whole tickerTable once
+                tickerIDs = dict(conn.execute(sqlalchemy.text('SELECT "Ticker", "TickerID" FROM "tickerTable";')).all())
+                with self._lock: self.reads += 1
+                newTicks = [tick for tick in tickers if tick not in tickerIDs]
+            else:
+                tickerIDs = dict(tickerIDs)
+
+            if newTicks:
+                # Tickers inserted meanwhile (by another process) are not returned, so they are read after
+                insertQuery = sqlalchemy.text('''INSERT INTO "tickerTable" ("Ticker") SELECT unnest(CAST(:tickers AS VARCHAR[]))
+                                                ON CONFLICT ("Ticker") DO NOTHING RETURNING "Ticker", "TickerID";''')
+                tickerIDs.update(conn.execute(insertQuery, {'tickers': newTicks}).all())
+                missing = [tick for tick in newTicks if tick not in tickerIDs]
+                if missing:
+                    selectQuery = sqlalchemy.text('SELECT "Ticker", "TickerID" FROM "tickerTable" WHERE "Ticker" = ANY(CAST(:tickers AS VARCHAR[]));')
+                    tickerIDs.update(conn.execute(selectQuery, {'tickers': missing}).all())
+                with self._lock: self.inserts += 1
+            if ownConn: conn.commit()
+        finally:
+            if ownConn: conn.close()
+
+        with self._lock:
+            self._tickerIDs[source] = {**self._tickerIDs.get(source, {}), **tickerIDs}
+        return {tick: tickerIDs[tick] for tick in tickers}
+
+    def invalidate(self, engine: sqlalchemy.engine.Engine = None):
+        """
+        This method removes the cached TickerIDs of the database of the connection engine (None for all databases).
+        """
+        with self._lock:
+            if engine is None: self._tickerIDs.clear()
+            else: self._tickerIDs.pop(_engineSource(engine), None)
+
+    @property
+    def stats(self) -> dict:
+        """Reads (of the tickerTable) and inserts counters, with the number of databases and tickers cached."""
+        with self._lock:
+            return {'reads': self.reads, 'inserts': self.inserts, 'databases': len(self._tickerIDs),
+                    'tickers': sum(len(ids) for ids in self._tickerIDs.values())}
+
+
+##################################
+##################################
+# Pool Metrics Class
+class PoolMetrics():
+    """
+    PoolMetrics records the checkouts of connections from the connection pools of the SQL databases (by connection engine),
+    with the time waited for each connection: the time to get an idle connection of the pool, to open a new one (within the
+    pool size and overflow), or to wait for one to be returned by another thread (until the pool timeout). Engines created by
+    DataManifest.connectSQL are recorded, into a single process-wide PoolMetrics (poolMetrics).
+    Note:
+    - Other engines are recorded if tracked (see track), with any pool class (the pool size and overflow are given for a QueuePool).
+    - Each engine is recorded apart (engines of the same database with different pool settings are not merged), including the
+    pools it recreates (on dispose).
+    - Long waits (or timeouts) indicate a pool too small for the threads using it (see POOL_SIZE/MAX_OVERFLOW of connectSQL),
+    or connections held longer than needed.
+    ___________________________________
+    Method List:
+    > track - Records the checkouts of the pool of a connection engine
+    > record - Records a checkout of a connection engine (called by its pool)
+    > stats - Checkouts, timeouts and wait times of a connection engine, with the current state of its pool
+    > reset - Clears the records of a connection engine (or of all engines)
+    """
+
+    def __init__(self):
+        self._metrics = weakref.WeakKeyDictionary() # Engine to dictionary of checkouts, timeouts, total and maximum wait seconds
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f'PoolMetrics(). Engines recorded: {len(self._metrics)}, checkouts: {sum(m["checkouts"] for m in self._metrics.values())}'
+
+    def track(self, engine: sqlalchemy.engine.Engine) -> sqlalchemy.engine.Engine:
+        """
+        This method records the checkouts of the pool of the connection engine (timing its Pool.connect), returning the engine.
+        The pools recreated by the engine (on dispose) are recorded the same way. Tracking an engine again has no effect.
+        """
+        with self._lock:
+            if engine in self._metrics: return engine
+            self._metrics[engine] = _emptyPoolMetrics()
+        _timePool(engine)
+        sqlalchemy.event.listen(engine, 'engine_disposed', _timePool)
+        return engine
+
+    def record(self, engine: sqlalchemy.engine.Engine, waitSeconds: float, timedOut = False):
+        """
+        This method records a checkout of a connection (or its timeout) from the pool of a connection engine, with the seconds waited.
+        """
+        with self._lock:
+            metrics = self._metrics.setdefault(engine, _emptyPoolMetrics())
+            if timedOut: metrics['timeouts'] += 1
+            else: metrics['checkouts'] += 1
+            metrics['waitSeconds'] += waitSeconds
+            metrics['maxWaitSeconds'] = max(metrics['maxWaitSeconds'], waitSeconds)
+
+    def stats(self, engine: sqlalchemy.engine.Engine) -> dict:
+        """
+        This method gets the 'checkouts' (and 'timeouts') of connections of the connection engine, the total, mean and maximum
+        seconds waited ('waitSeconds', 'meanWaitSeconds', 'maxWaitSeconds'), and the current state of the pool of the engine:
+        its 'size', the connections 'checkedOut' and the 'overflow' connections opened beyond its size.
+        """
+        with self._lock:
+            metrics = dict(self._metrics.get(engine, _emptyPoolMetrics()))
+        metrics['meanWaitSeconds'] = metrics['waitSeconds'] / max(metrics['checkouts'] + metrics['timeouts'], 1)
+        if isinstance(engine.pool, sqlalchemy.pool.QueuePool):
+            metrics.update({'size': engine.pool.size(), 'checkedOut': engine.pool.checkedout(), 'overflow': max(engine.pool.overflow(), 0)})
+        return metrics
+
+    def reset(self, engine: sqlalchemy.engine.Engine = None):
+        """
+        This method clears the records of the connection engine (None for all engines), which stay tracked.
+        """
+        with self._lock:
+            for tracked in (list(self._metrics) if engine is None else [engine]):
+                if tracked in self._metrics: self._metrics[tracked] = _emptyPoolMetrics()
+
+
+# Records of an engine without checkouts
+def _emptyPoolMetrics() -> dict:
+    return {'checkouts': 0, 'timeouts': 0, 'waitSeconds': 0.0, 'maxWaitSeconds': 0.0}
+
+# Times the checkouts of the current pool of an engine into poolMetrics (wrapping its Pool.connect)
+def _timePool(engine: sqlalchemy.engine.Engine):
+    pool = engine.pool
+    connect = pool.connect
+
+    def timedConnect():
+        startTime = time.perf_counter()
+        try:
+            connection = connect()
+        except sqlalchemy.exc.TimeoutError:
+            poolMetrics.record(engine, time.perf_counter() - startTime, timedOut = True)
+            raise
+        poolMetrics.record(engine, time.perf_counter() - startTime)
+        return connection
+    pool.connect = timedConnect
+
+
+# Source identifier of a SQL database (from its connection engine, without the connection options of its URL)
+def _engineSource(engine: sqlalchemy.engine.Engine) -> tuple:
+    return ('sql', engine.url.set(query = {}).render_as_string(hide_password = True))
+
+# Copy of a unit (DataFrame, or tuple of DataFrames with meta data)
+def _copyUnit(unit: pd.DataFrame | tuple) -> pd.DataFrame | tuple:
+    if isinstance(unit, tuple): return tuple(part.copy() if part is not None else None for part in unit)
+    return unit.copy()
+
+# Bytes used by a unit (DataFrame, or tuple of DataFrames with meta data)
+def _unitBytes(unit: pd.DataFrame | tuple) -> int:
+    parts = unit if isinstance(unit, tuple) else (unit,)
+    return int(sum(part.memory_usage(index = True, deep = True).sum() for part in parts if part is not None))
+
+
+# Process-wide unit cache, ticker cache and pool metrics
+unitCache = UnitCache()
+tickerCache = TickerCache()
+poolMetrics = PoolMetrics()
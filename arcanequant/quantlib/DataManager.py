@@ -2,9 +2,11 @@ import pandas as pd
 import requests
 from datetime import datetime
 from pathlib import Path
-from typing import Iterable
+from typing import Iterable, Iterator
+import sqlalchemy
 import sqlalchemy.engine
 from .DataManifestManager import DataManifest
+from .CacheManager import unitCache
 
 # Placeholder class for file name and package importing
 class DataManager():
@@ -17,6 +19,8 @@ class DataManager():
     Method List:
     > DownloadIntraday - Downloads intraday data of a list (iterable) of given stocks, months and intervals.
     > ExtractData - Extracts an arbitrary given dataset, with given conditions (time range, ticker, etc.) from either database or direct files 
+    > ExtractDataUnits - Streams market data as ExtractData does, one unit (ticker, interval, month) at a time
+    > ExtractDataChunks - Streams market data as ExtractData does, in chunks of a fixed number of rows
     """
     def __init__(self):
         pass
@@ -50,7 +54,7 @@ def DownloadIntraday(tickers: Iterable[str], intervals: Iterable[int], months: I
     Notes:
     - The function requires one of the three:
         > dataManifest, if using any saveMode options
-        > savePath, if using 'direct' or 'both' saveModes
+        > savePath, if using 'direct', 'both' or 'binary' saveModes
         > connEngine, if using 'database' or 'both' saveModes
     - If given more than one, dataManifest is prioritised.
     - Upon downloading, the manifest is automatically updated, and saved (as directed).
@@ -58,13 +62,18 @@ def DownloadIntraday(tickers: Iterable[str], intervals: Iterable[int], months: I
         > 'direct' saves data directly to '.csv' and manifest into '.json' formats
         > 'database' saves data and manifest directly to the given SQL database (engine must be provided)
         > 'both' saves data in both formats
+        > 'binary' saves data into the binary series of each ticker/interval (see BinaryManager), with the meta data into '.csv'
+        and manifest into '.json' formats (as 'direct')
+    - The manifest records the file format each unit is saved in ('binary', or '.csv' for 'direct' and 'both'), so the direct
+    reads (ExtractData, validateManifest, SQLSync) read each unit from its own format (see DataManifest.unitFormat).
     """
     # Guard function against bad save option input (to avoid calling API and not saving)
-    if not saveMode.lower() in ['database', 'direct', 'both']:
-        raise ValueError('You must specify a valid save mode - (SQL) database, direct (to .csv file) or both')
+    if not saveMode.lower() in ['database', 'direct', 'both', 'binary']:
+        raise ValueError('You must specify a valid save mode - (SQL) database, direct (to .csv file), both or binary')
 
     from .DataManifestManager import DataManifest
-    from .SQLManager import SQLSave, DFtoSQLFormat
+    from .SQLManager import DFtoSQLFormat
+    from .BinaryManager import SaveBinary
 
     # Word of warning to user if using 'both' as can only load one DataManifest
     if saveMode.lower() == 'both':
@@ -72,7 +81,7 @@ def DownloadIntraday(tickers: Iterable[str], intervals: Iterable[int], months: I
     
     ### Loading manifest data, if saveMode 'both' loads directly (.json file)
     # Also sets dataManifest.directory
-    if saveMode.lower() in ['direct', 'both']:
+    if saveMode.lower() in ['direct', 'both', 'binary']:
         try:
             # Use dataManifest as priority, savePath only if no dataManifest
             if dataManifest == None:
@@ -101,7 +110,7 @@ def DownloadIntraday(tickers: Iterable[str], intervals: Iterable[int], months: I
         elif dataManifest.SQLengine == None: # If dataManifest directly provided but empty connection engine
             dataManifest.SQLengine = connEngine
         
-        if dataManifest.SQLengine == None: # If still None, then error
+        if dataManifest.SQLengine == None and dataManifest.storage is None: # If still None (and no other storage backend), then error
             raise ValueError('You must provide a connection Engine to SQL through the DataManifest.SQLengine, or though connEngine.')
 
         dataManifest.loadManifest(loadFrom = 'database')
@@ -199,10 +208,10 @@ def DownloadIntraday(tickers: Iterable[str], intervals: Iterable[int], months: I
                             # Process table (transpose, add month indicator and fix interval value from 'Xmin' to X)
                             metaSQLDF = DFtoSQLFormat(metaDF, dfType = "meta", dataContext = month)
                             # Save into SQL
-                            SQLSave(saveDF = metaSQLDF, engine = dataManifest.SQLengine, saveTable = "metaTable", ignore_index = True, echo = False)
+                            dataManifest.backend().save(metaSQLDF, "metaTable")
                             pass
 
-                        if saveMode.lower() in ['direct', 'both']:
+                        if saveMode.lower() in ['direct', 'both', 'binary']:
                             try:
                                 metaDF.to_csv(rf"{savePath}{symbol}/{symbol}_{interval}_{month}_meta.csv",index=True)
                             except OSError: # If no folder to save into, create it
@@ -224,27 +233,34 @@ def DownloadIntraday(tickers: Iterable[str], intervals: Iterable[int], months: I
                         # Saving actual stock data
                         # No need to save index numbering with intraday data
                         if saveMode.lower() in ['database', 'both']:
-                            # Create dummy dataframe with additional interval and month columns to be used by SQLSave 
+                            # Create dummy dataframe with additional interval and month columns to be saved 
                             SQLdataDF = dataDF.copy(deep = True) # Deepcopy to avoid creating additional columns on dataDF
                             # Add ticker/interval cols
                             SQLdataDF = DFtoSQLFormat(SQLdataDF, dfType = "stock", dataContext = (symbol,interval))
-                            SQLSave(saveDF = SQLdataDF, engine = dataManifest.SQLengine, saveTable = "marketTable", ignore_index = True, echo = False)
+                            dataManifest.backend().save(SQLdataDF, "marketTable")
 
                         # Direct save
                         if saveMode.lower() in ['direct', 'both']:
                             # No need to create directory as will already be done if needed for meta.csv
                             dataDF.to_csv(rf"{savePath}{symbol}/{symbol}_{interval}_{month}.csv",index=False) 
 
+                        # Binary save (replacing the month in the series of the ticker/interval)
+                        if saveMode.lower() == 'binary':
+                            SaveBinary(dataDF, savePath, symbol, interval, months = month)
+
                         ### Setting manifest value and saving
                         # Decide to put 1 or 2 in manifest (based on if requested month is the present month) 
                         newValue = 1
                         if month == currentMonth: newValue = 2
                             
-                        dataManifest.setValue(symbol, interval, month, newValue, sort = False) # No sort to save time
+                        unitCache.invalidate(ticker = symbol, interval = interval, month = month) # Any cached copy of the unit is outdated
+                        # File format of the unit (as saved, unchanged if only saved to the database)
+                        fileFormat = {'direct': 'csv', 'both': 'csv', 'binary': 'binary'}.get(saveMode.lower())
+                        dataManifest.setValue(symbol, interval, month, newValue, sort = False, fileFormat = fileFormat) # No sort to save time
                         # Save manifest based on saveMode input
                         if saveMode.lower() == 'database':
                             dataManifest.saveManifest(savePath = savePath, saveTo = 'sql', echo = verbose)
-                        elif saveMode.lower() == 'direct':
+                        elif saveMode.lower() in ['direct', 'binary']:
                             dataManifest.saveManifest(savePath = savePath, saveTo = 'json', echo = verbose)
                         elif saveMode.lower() == 'both':
                             dataManifest.saveManifest(savePath = savePath, saveTo = 'both', echo = verbose)
@@ -255,7 +271,7 @@ def DownloadIntraday(tickers: Iterable[str], intervals: Iterable[int], months: I
     return
 
 
-def ExtractData(targetData: str, start, end, manifest: DataManifest = DataManifest(), postProcess = True, fromSQL = False, convertDatetime = False, condition = None, **filters) -> pd.DataFrame:
+def ExtractData(targetData: str, start, end, manifest: DataManifest = DataManifest(), postProcess = True, fromSQL = False, convertDatetime = False, condition = None, workers: int = None, poolType = 'thread', compact = False, filterSpec: dict = None, **filters) -> pd.DataFrame:
     """
     Extracts data from a target dataset (market data or data manifest), with a provided start and end period, using a provided
     extraction method and filtering condition(s) if desired. The function returns a DataFrame. If both boolean mask 'condition' 
@@ -269,15 +285,25 @@ def ExtractData(targetData: str, start, end, manifest: DataManifest = DataManife
     Optional inputs:
     - manifest - DataManifest object relating to the data to be extracted (if fromSQL below is False).
     - fromSQL - Boolean indicating where to extract data from, the default (False) takes data directly from .csv for market data and
-    .json for manifests, while True takes data from SQL (manifest must have a valid SQL database, and SQLengine attribute).
+    .json for manifests, while True takes data from SQL (manifest must have a valid SQL database, and SQLengine attribute, or
+    another storage backend linked, see DataManifest.backend).
     - postProcess - Boolean that converts the output into the original form where possible (unit dataset, e.g. stock dataset of one
     ticker in one interval for one month.)
     - convertDatetime - Boolean indicating to convert any Date/Time columns to a datetime64[ns] format. If False, converts to string.
     - condition - A user-custom callable condition for filtering or selecting subset of data, e.g. lambda functions. The
     condition must take in one input (DataFrame) only. Example: lambda df: df['Ticker'] == 'TEST', or for compound filtering,
     use lambda df: (df['2. Symbol'] == 'TEXT') & (df['4. Interval'] == f"{15}min")
+    - workers - Integer number of workers used to read the unit files (.csv or binary series) in parallel when extracting directly
+    (fromSQL is False). None or 1 reads them one after another in the calling thread.
+    - poolType - String of the pool used by the workers, 'thread' (default) or 'process'.
+    - compact - Boolean indicating to convert market data into compact datatypes (see CompactFormat in SQLManager): categorical
+    Ticker, int16 Interval, datetime64 DateTime (whatever convertDatetime is), float32 prices (if precise enough) and int32
+    Volume (if it fits).
+    - filterSpec - Dictionary of filters ({column: value}) applied in the same way as the filters kwargs below, for columns
+    that are built up programmatically (the kwargs take priority if a column is given in both).
     - filters - Custom inputtable keyword-argument (kwarg) variables to act as simple equality filters (i.e. inputting Ticker =
-    "TEST" as a kwarg filters the 'Ticker' column for "TEST" datapoints only) 
+    "TEST" as a kwarg filters the 'Ticker' column for "TEST" datapoints only). A list/tuple/set of values acts as a membership
+    filter instead (i.e. Ticker = ['TEST', 'TEST2'] keeps the datapoints of either ticker)
 
     Notes:
     - Order of operation: Obtain data (and stitch where necessary with pre-process, e.g. adding Ticker/Month identifiers), apply
@@ -306,89 +332,47 @@ def ExtractData(targetData: str, start, end, manifest: DataManifest = DataManife
     - If fromSQL variable is not True/Truthy, it is automatically treated as False (come on, you should be able to not ruin
     an optional boolean... :D)
     - Extracting stock data from SQL is faster for larger datasets.
+    - Extracting market data directly reads each unit in the file format it is stored in, its .csv file or the binary series of
+    its ticker/interval (see DataManifest.unitFormat and BinaryManager), with the same output either way.
+    - When extracting directly, the unit files are all read first and then stitched together in a single concatenation (in
+    manifest order), so the output is the same whichever number of workers is used. Threads are usually enough as most of the
+    .csv parsing is done outside the GIL, processes can help with many small files but the DataFrames are copied back.
+    - For market data, Ticker and Interval filters (equality or membership) are used before any data is read: only the units
+    of the selected tickers/intervals are read when extracting directly, and they are added to the query when extracting
+    from SQL. The result is the same as filtering afterwards.
     """
-    # Check the start and end inputs for 'all' or None flags
-    period_inputs = [start,end]
-    if any( (isinstance(period,str) and 'all' in period.lower() ) for period in period_inputs ): # If any 'all' set to max limit
-        start = '1900'
-        end = '2200-01-01'
-    if start is None: 
-        start = '1900'
-    if end is None: # Doing these two after 'all' check is more efficient (likelier to skip)
-        end = '2200-01-01'
-
-    # Get start and end times for start and end args inputted
-    startDT = pd.Period(start).start_time
-    endDT = pd.Period(end).end_time
-    # Get the range of all months that are considered
-    startMstr = startDT.strftime("%Y-%m")
-    endMstr = endDT.strftime("%Y-%m")
-
-    # List of all months
-    monthList = list(pd.date_range(start = startMstr, end = endMstr, freq = 'MS', inclusive = 'both').strftime("%Y-%m").values)
+    # Get start and end times for start and end args inputted, and the range of all months that are considered
+    startDT, endDT, monthList = _periodRange(start, end)
 
     resultDF = pd.DataFrame()
+
+    # Merge the filter spec with the filters kwargs, and get the Ticker/Interval values selected (None if not filtered) to
+    # restrict the data read/queried to these only
+    filters = {**(filterSpec or {}), **filters}
+    tickerSelect = _filterValues(filters, 'Ticker')
+    intervalSelect = _filterValues(filters, 'Interval')
     
-    from .SQLManager import SQLtoDFFormat, ExecuteSQL
+    from .SQLManager import SQLtoDFFormat, CompactFormat
 
     # The method for acquiring market data and manifest data are different, method for filtering for time period is also different for each (SQL vs DataManifest) method
-    if fromSQL: # If extracting from SQL
+    if fromSQL: # If extracting from SQL (or the storage backend of the manifest)
+        storage = manifest.backend()
         if 'market' in targetData.lower() or 'stock' in targetData.lower(): # Getting market data
-            resultDF = pd.read_sql(f'SELECT * FROM "stockData" WHERE "DateTime" BETWEEN \'{str(startDT)}\' AND \'{str(endDT)}\';', manifest.SQLengine)#, index_col = ['Ticker','Interval'])
+            # The Ticker/Interval filters are pushed into the query, ordered as the direct data (unit by unit, the .csv files
+            # in descending DateTime) whatever the storage order of marketTable (as partitions)
+            resultDF = storage.market(startDT, endDT, tickerSelect, intervalSelect, order = 'unit')
             resultDF.drop(columns=['Nominal'], inplace = True) # Drop nominal (for now)
+            if compact: resultDF = CompactFormat(resultDF)
 
         elif 'comp' in targetData.lower() and 'manifest' in targetData.lower(): # Getting compressed manifest data
             print('To add this functionality in the future...') #TODO: ADD THIS FUNCTIONALITY
 
         elif 'manifest' in targetData.lower(): # Getting (regular) manifest data
-            # Edit view to include new manifest columns
-            updateViewQuery = """
-                DO $$
-                DECLARE
-                    col_list text;
-                BEGIN
-                    SELECT string_agg('m."' || column_name || '"', ', ' ORDER BY ordinal_position)
-                    INTO col_list
-                    FROM information_schema.columns
-                    WHERE table_name = 'manifestTable'
-                      AND column_name NOT IN ('TickerID')
-                      AND table_schema = 'public';
-                
-                    EXECUTE format('
-                        CREATE OR REPLACE VIEW "manifestData" AS
-                        SELECT t."Ticker", %s
-                        FROM "manifestTable" m
-                        JOIN "tickerTable" t ON m."TickerID" = t."TickerID";
-                    ', col_list);
-                END $$;
-                """
-            ExecuteSQL(updateViewQuery, manifest.SQLengine)
-
-            # Extract list of columns that are within the given timeframe (from SQL-side, for efficiency)
-            # Dynamically obtain list of columns within given date limits
-            colListQuery = f"""
-                SELECT string_agg('"' || column_name || '"', ', ')
-                FROM information_schema.columns
-                WHERE table_name = 'manifestData'
-                AND table_schema = 'public'
-                AND column_name ~ {"'^\\d{4}-\\d{2}$'"}
-                AND to_date(column_name, 'YYYY-MM') BETWEEN '{startDT.strftime("%Y-%m-%d")}' AND '{endDT.strftime("%Y-%m-%d")}';
-                """
-            
-            dynamicCols = ExecuteSQL(colListQuery, manifest.SQLengine, fetch=True)
-            dynamicColsString = dynamicCols[0][0]
-            fixedColsString = '"Ticker", "Interval"'
-            searchString = ""
-            if dynamicColsString is not None:
-                searchString = f"{fixedColsString}, {dynamicColsString}"
-            else:
-                searchString = fixedColsString
-            
-            # Extract whole or partial view 
-            resultDF = pd.read_sql(f'SELECT {searchString} FROM "manifestData";', manifest.SQLengine, index_col = ['Ticker','Interval'])
+            # Months in range (as the direct manifest), a range query on the month index of the long manifestTable
+            resultDF = storage.manifest(monthList[0], monthList[-1])
 
         elif 'meta' in targetData.lower():
-            resultDF = pd.read_sql(f'SELECT * FROM "metaData" WHERE "7. Month" BETWEEN \'{monthList[0]}\' AND \'{monthList[-1]}\';', manifest.SQLengine)
+            resultDF = storage.meta(monthList[0], monthList[-1])
 
         else:
             raise ValueError("The targetData input must match 'market'/'stock', 'manifest', 'meta' or 'comp' & 'manifest'.")
@@ -413,21 +397,17 @@ def ExtractData(targetData: str, start, end, manifest: DataManifest = DataManife
             # Get combination of ticker/interval to combine with month for .csv file name
             remainderDF = manifest.DF[monthList] # Ignore non-whole months
             remainderDF = remainderDF.loc[(remainderDF != 0).any(axis = 1)] # Gets rid of rows (ticker, interval) that are zeroes (for all months in manifest)
-            
-            for tick, interv in list(remainderDF.index.values):
-                # If data for each month exists in manifest, add full file to aggregate DF
-                for month in monthList:
-                    if int(manifest.DF.loc[tick, interv][month]): # Check data exists on manifest
-                        addDF = manifest.loadData_fromcsv(tick, interv, month, convert_DateTime = convertDatetime, echo = False)
-                        # Add ticker name on DF (as normally its not specified, and we are mixing the datasets)
-                        addDF['Ticker'] = tick
-                        addDF['Interval'] = interv
-                        addDF.insert(0, 'Ticker', addDF.pop('Ticker'))
-                        addDF.insert(1, 'Interval', addDF.pop('Interval'))
-
-                        resultDF = pd.concat([resultDF, addDF], axis = 0, ignore_index = True)
+            # Only keep the rows of the tickers/intervals selected by the filters (so no other file is read)
+            remainderDF = _selectRows(remainderDF, tickerSelect, intervalSelect)
+
+            # If data for each month exists in manifest, read the full file, then stitch all files together once
+            units = manifest.listUnits(monthList, index = remainderDF.index)
+            parts = _loadUnits(manifest, units, convertDatetime, meta = False, workers = workers, poolType = poolType, compact = compact)
+            if parts: resultDF = pd.concat(parts, axis = 0, ignore_index = True)
+            else: resultDF = _emptyMarketDF(convertDatetime) # Nothing selected/stored, keep the columns of the market data
 
             resultDF = resultDF[(pd.to_datetime(resultDF.DateTime) >= startDT) & (pd.to_datetime(resultDF.DateTime) <= endDT)]
+            if compact: resultDF = CompactFormat(resultDF) # Ticker/Interval (units are already compact)
                 
         elif 'comp' in targetData.lower() and 'manifest' in targetData.lower(): # Getting compressed manifest data
             print('To add this functionality in the future...')
@@ -442,14 +422,10 @@ def ExtractData(targetData: str, start, end, manifest: DataManifest = DataManife
             remainderDF = manifest.DF[monthList] # Ignore non-whole months
             remainderDF = remainderDF.loc[(remainderDF != 0).any(axis = 1)] # Gets rid of rows (ticker, interval) that are zeroes (for all months in manifest)
 
-            for tick, interv in list(remainderDF.index.values): #For each ticker and interval
-                # If data for each month exists in manifest, add full file to aggregate DF
-                for month in monthList:
-                    if int(manifest.DF.loc[tick, interv][month]): # Check data exists on manifest
-                        # Get data and concatenate with whole set of extracted
-                        _, addDF = manifest.loadData_fromcsv(tick, interv, month, convert_DateTime = convertDatetime, meta = True, echo = False)
-                        addDF.loc['7. Month'] = month
-                        resultDF = pd.concat([resultDF, addDF], axis = 1, ignore_index = True)
+            # If data for each month exists in manifest, get the meta data and concatenate with whole set of extracted (once)
+            units = manifest.listUnits(monthList, index = remainderDF.index)
+            parts = _loadUnits(manifest, units, convertDatetime, meta = True, workers = workers, poolType = poolType)
+            if parts: resultDF = pd.concat(parts, axis = 1, ignore_index = True)
 
             # If convertDatetime, change to datetime (no actual change), else convert to string. (Use .loc as already in correct row form)
             if convertDatetime:
@@ -459,18 +435,13 @@ def ExtractData(targetData: str, start, end, manifest: DataManifest = DataManife
         else:
             raise ValueError("The targetData input must match 'market'/'stock', 'manifest', 'meta' or 'comp' & 'manifest'.")
     
-    # If custom filter function given and callable, apply it
-    if callable(condition):
-        resultDF = apply_condition(resultDF, condition)
-
-    # Apply simply equality filters from 'filters' kwargs
-    for col, val in filters.items():
-        resultDF = resultDF[resultDF[col] == val]
+    # Apply the custom filter function (condition) and the equality (or membership) filters from 'filters' kwargs and filterSpec
+    resultDF = _applyFilters(resultDF, condition, filters)
 
     # Post-process data at the end
     if postProcess:
         if 'market' in targetData.lower() or 'stock' in targetData.lower():
-            resultDF = SQLtoDFFormat(resultDF, 'stock', convertDatetime = convertDatetime)
+            resultDF = SQLtoDFFormat(resultDF, 'stock', convertDatetime = convertDatetime, compact = compact)
         elif 'meta' in targetData.lower():
             resultDF = SQLtoDFFormat(resultDF, 'meta', convertDatetime = convertDatetime)
         elif 'manifest' in targetData.lower():
@@ -479,6 +450,105 @@ def ExtractData(targetData: str, start, end, manifest: DataManifest = DataManife
     return resultDF
 
 
+def ExtractDataUnits(start, end, manifest: DataManifest, postProcess = True, fromSQL = False, convertDatetime = False, condition = None, compact = False, filterSpec: dict = None, fetchSize: int = 100000, **filters) -> Iterator[tuple[str, int, str, pd.DataFrame]]:
+    """
+    This function is the streaming form of ExtractData for market data: instead of returning one DataFrame of the whole
+    range, it yields the data one unit (ticker, interval, month) at a time, in time order (month by month, and by ticker
+    and interval within a month). Only one unit is held in memory at a time (plus one fetch of rows from SQL).
+
+    Inputs:
+    - start - Start period of the data to extract (as in ExtractData).
+    - end - End period of the data to extract (as in ExtractData).
+    - manifest - DataManifest object relating to the data to be extracted (with a valid directory, or SQLengine attribute if fromSQL).
+
+    Optional inputs:
+    - postProcess - Boolean that converts each unit into its original form (as ExtractData does for a unit dataset).
+    - fromSQL - Boolean indicating to extract the data from SQL (True) or directly from the .csv files (False).
+    - convertDatetime - Boolean indicating to convert the DateTime column to a datetime64[ns] format. If False, converts to string.
+    - condition - A user-custom callable condition for filtering the rows of each unit (as in ExtractData).
+    - compact - Boolean indicating to convert each unit into compact datatypes (as in ExtractData).
+    - filterSpec - Dictionary of filters ({column: value}) applied the same way as the filters kwargs (as in ExtractData).
+    - fetchSize - Integer number of rows fetched at a time from the SQL server-side cursor (fromSQL only).
+    - filters - Custom kwarg equality (or membership, if list/tuple/set) filters (as in ExtractData).
+
+    Output:
+    - Yields tuples of (ticker, interval, month, DataFrame) for each unit with data left after the time range trimming and filters.
+
+    Notes:
+    - The start/end trimming, filters, condition and post-processing are applied to each unit as ExtractData applies them to
+    the whole range, so a condition must only depend on each row (not on the other rows of the range).
+    - From SQL, the rows are read through a server-side cursor (streamed) ordered by month, ticker, interval and descending
+    DateTime (the order of the .csv files) and regrouped into units, the whole query is never held by the client.
+    - Directly, the manifest is loaded from its .json file and the unit files are read one at a time.
+    """
+    startDT, endDT, monthList = _periodRange(start, end)
+    filters = {**(filterSpec or {}), **filters}
+
+    from .SQLManager import SQLtoDFFormat, CompactFormat
+    for tick, interv, month, unitDF in _iterMarketUnits(startDT, endDT, monthList, manifest, fromSQL, convertDatetime, filters, fetchSize, compact):
+        # Filter the unit as ExtractData does with the whole range
+        unitDF = _applyFilters(unitDF, condition, filters)
+        if unitDF.empty: continue
+
+        if compact: unitDF = CompactFormat(unitDF)
+        if postProcess:
+            unitDF = SQLtoDFFormat(unitDF, 'stock', convertDatetime = convertDatetime, compact = compact)
+        yield tick, interv, month, unitDF
+
+def ExtractDataChunks(start, end, manifest: DataManifest, chunkSize: int = 100000, postProcess = True, fromSQL = False, convertDatetime = False, condition = None, compact = False, filterSpec: dict = None, **filters) -> Iterator[pd.DataFrame]:
+    """
+    This function is the streaming form of ExtractData for market data in chunks of a fixed number of rows: it yields
+    DataFrames of chunkSize rows (the last one can be shorter), stitched from the units given by ExtractDataUnits in time
+    order (month by month, and by ticker and interval within a month). At most one chunk and one unit are held in memory.
+
+    Inputs:
+    - start - Start period of the data to extract (as in ExtractData).
+    - end - End period of the data to extract (as in ExtractData).
+    - manifest - DataManifest object relating to the data to be extracted (with a valid directory, or SQLengine attribute if fromSQL).
+
+    Optional inputs:
+    - chunkSize - Integer number of rows of each chunk.
+    - postProcess - Boolean that converts the DateTime column (see convertDatetime) and numbers the rows of the chunks
+    continuously (i.e. the index of the chunks follows on from the previous chunk).
+    - fromSQL, convertDatetime, condition, compact, filterSpec, filters - As in ExtractDataUnits (and ExtractData).
+
+    Notes:
+    - Chunks can mix tickers and intervals, so the Ticker and Interval columns are always kept (unlike ExtractData, which
+    drops them in post-processing if a single ticker and interval are extracted).
+    - The fetch size of the SQL server-side cursor is chunkSize.
+    """
+    if chunkSize < 1: raise ValueError('The chunkSize must be a positive integer.')
+    from .SQLManager import CompactFormat
+
+    buffer = []
+    bufferRows = 0
+    chunkStart = 0 # Row number of the first row of the next chunk (for postProcess)
+
+    def makeChunk(frames: list[pd.DataFrame]) -> pd.DataFrame:
+        nonlocal chunkStart
+        chunkDF = pd.concat(frames, axis = 0, ignore_index = True) if len(frames) > 1 else frames[0]
+        if compact: chunkDF = CompactFormat(chunkDF) # Ticker categories of the units are merged
+        if postProcess:
+            if convertDatetime or compact: chunkDF['DateTime'] = pd.to_datetime(chunkDF['DateTime'], format = "%Y-%m-%d %H:%M:%S")
+            else: chunkDF['DateTime'] = chunkDF['DateTime'].astype(str)
+            chunkDF.index = pd.RangeIndex(chunkStart, chunkStart + len(chunkDF))
+        chunkStart += len(chunkDF)
+        return chunkDF
+
+    for _, _, _, unitDF in ExtractDataUnits(start, end, manifest, postProcess = False, fromSQL = fromSQL, convertDatetime = convertDatetime,
+                                            condition = condition, compact = compact, filterSpec = filterSpec, fetchSize = chunkSize, **filters):
+        # Fill up the current chunk with the rows of the unit, yielding every full chunk
+        while len(unitDF):
+            take = chunkSize - bufferRows
+            buffer.append(unitDF.iloc[:take])
+            bufferRows += len(buffer[-1])
+            unitDF = unitDF.iloc[take:]
+            if bufferRows == chunkSize:
+                yield makeChunk(buffer)
+                buffer, bufferRows = [], 0
+
+    if buffer: yield makeChunk(buffer)
+
 def apply_condition(df, condition) -> pd.DataFrame:
     from pandas.errors import IndexingError
     try:
@@ -488,6 +558,184 @@ def apply_condition(df, condition) -> pd.DataFrame:
         # Fall back to transposed filter (for column filtering based on row values)
         return df.loc[:, condition(df)]
 
+# Gets the start/end datetimes of the start/end periods (treating 'all'/None as unbounded), and the list of months between them
+def _periodRange(start, end) -> tuple[pd.Timestamp, pd.Timestamp, list[str]]:
+    startDT, endDT = _periodBounds(start, end)
+    # Get the range of all months that are considered
+    startMstr = startDT.strftime("%Y-%m")
+    endMstr = endDT.strftime("%Y-%m")
+
+    # List of all months
+    monthList = list(pd.date_range(start = startMstr, end = endMstr, freq = 'MS', inclusive = 'both').strftime("%Y-%m").values)
+    return startDT, endDT, monthList
+
+# Gets the start/end datetimes of the start/end periods (treating 'all'/None as unbounded)
+def _periodBounds(start, end) -> tuple[pd.Timestamp, pd.Timestamp]:
+    # Check the start and end inputs for 'all' or None flags
+    period_inputs = [start,end]
+    if any( (isinstance(period,str) and 'all' in period.lower() ) for period in period_inputs ): # If any 'all' set to max limit
+        start = '1900'
+        end = '2200-01-01'
+    if start is None: 
+        start = '1900'
+    if end is None: # Doing these two after 'all' check is more efficient (likelier to skip)
+        end = '2200-01-01'
+
+    # Get start and end times for start and end args inputted
+    startDT = pd.Period(start).start_time
+    endDT = pd.Period(end).end_time
+    return startDT, endDT
+
+# Query of the market data between the start/end datetimes, with the Ticker/Interval filters (as bound parameters, expanded into IN lists)
+# Reads marketTable directly with the time range on its stored DateTime, so the range (and the filters) is an index scan of
+# the table (on the TickerID/Interval/DateTime index, or the DateTime index), without joins other than the tickerTable
+def _marketQuery(startDT: pd.Timestamp, endDT: pd.Timestamp, tickerSelect: list = None, intervalSelect: list = None, orderBy: str = None) -> tuple[sqlalchemy.TextClause, dict]:
+    marketQuery = '''SELECT tickt."Ticker", mt."Interval", mt."DateTime",
+                       mt."Open", mt."High", mt."Low", mt."Close", mt."Volume", mt."Nominal"
+                   FROM "marketTable" mt
+                   JOIN "tickerTable" tickt ON tickt."TickerID" = mt."TickerID"
+                   WHERE mt."DateTime" BETWEEN :startDT AND :endDT
+                   AND mt."DateID" BETWEEN :startDateID AND :endDateID'''
+    # Whole seconds (the resolution of the stored DateTime), inside the start/end datetimes
+    queryParams = {'startDT': startDT.ceil('s').to_pydatetime(), 'endDT': endDT.floor('s').to_pydatetime()}
+    # Same range on the DateID (the partition key of a partitioned marketTable, so only the partitions in range are scanned)
+    queryParams['startDateID'], queryParams['endDateID'] = [_dateID(dt) for dt in (queryParams['startDT'], queryParams['endDT'])]
+    if tickerSelect is not None:
+        marketQuery += ' AND tickt."Ticker" IN :tickers'
+        queryParams['tickers'] = [str(tick) for tick in tickerSelect]
+    if intervalSelect is not None:
+        marketQuery += ' AND mt."Interval" IN :intervals'
+        queryParams['intervals'] = [interv.item() if hasattr(interv, 'item') else interv for interv in intervalSelect] # No numpy types
+    if orderBy is not None:
+        marketQuery += f' ORDER BY {orderBy}'
+
+    paramTypes = {'tickers': sqlalchemy.String, 'intervals': sqlalchemy.Integer} # Typed, as an empty list is still a valid filter
+    marketQuery = sqlalchemy.text(marketQuery + ';').bindparams(*[sqlalchemy.bindparam(key, expanding = True, type_ = paramTypes[key])
+                                                                  for key in ('tickers', 'intervals') if key in queryParams])
+    return marketQuery, queryParams
+
+# DateID (YYYYMMDD integer, as DateTimeIDs) of a datetime
+def _dateID(dt) -> int:
+    return dt.year * 10000 + dt.month * 100 + dt.day
+
+# Keeps the manifest rows (ticker, interval) of the tickers/intervals selected (None selects all)
+def _selectRows(manifestDF: pd.DataFrame, tickerSelect: list = None, intervalSelect: list = None) -> pd.DataFrame:
+    if tickerSelect is not None:
+        manifestDF = manifestDF.loc[manifestDF.index.get_level_values('Ticker').isin(tickerSelect)]
+    if intervalSelect is not None:
+        manifestDF = manifestDF.loc[manifestDF.index.get_level_values('Interval').isin(intervalSelect)]
+    return manifestDF
+
+# Applies the condition and the equality/membership filters to a DataFrame (as ExtractData does)
+def _applyFilters(resultDF: pd.DataFrame, condition = None, filters: dict = {}) -> pd.DataFrame:
+    # If custom filter function given and callable, apply it
+    if callable(condition):
+        resultDF = apply_condition(resultDF, condition)
+
+    # Apply simply equality (or membership) filters from 'filters' kwargs and filterSpec
+    for col, val in filters.items():
+        if _isMembership(val): resultDF = resultDF[resultDF[col].isin(list(val))]
+        else: resultDF = resultDF[resultDF[col] == val]
+    return resultDF
+
+# Yields the market data units (ticker, interval, month, DataFrame) in time order, trimmed to the start/end datetimes,
+# reading the unit files one at a time (direct) or regrouping the rows streamed from a server-side cursor (SQL)
+def _iterMarketUnits(startDT: pd.Timestamp, endDT: pd.Timestamp, monthList: list[str], manifest: DataManifest, fromSQL = False,
+                     convertDatetime = False, filters: dict = {}, fetchSize: int = 100000, compact = False) -> Iterator[tuple[str, int, str, pd.DataFrame]]:
+    tickerSelect = _filterValues(filters, 'Ticker')
+    intervalSelect = _filterValues(filters, 'Interval')
+
+    if fromSQL:
+        pending = None # Rows of the unit being regrouped (a unit can be split across fetches)
+        for fetchDF in manifest.backend().marketChunks(startDT, endDT, tickerSelect, intervalSelect, fetchSize):
+            fetchDF = fetchDF.drop(columns = ['Nominal']) # Drop nominal (for now)
+            if pending is not None: fetchDF = pd.concat([pending, fetchDF], axis = 0, ignore_index = True)
+
+            unitKeys = pd.to_datetime(fetchDF['DateTime']).dt.strftime("%Y-%m") + '|' + fetchDF['Ticker'] + '|' + fetchDF['Interval'].astype(str)
+            # Boundaries between the units of the fetch (the last unit may continue in the next fetch)
+            starts = [0] + list((unitKeys != unitKeys.shift()).to_numpy().nonzero()[0][1:]) + [len(fetchDF)]
+            for first, last in zip(starts[:-2], starts[1:-1]):
+                yield _sqlUnit(fetchDF.iloc[first:last])
+            pending = fetchDF.iloc[starts[-2]:]
+        if pending is not None and not pending.empty: yield _sqlUnit(pending)
+        return
+
+    # Direct: the units of the selected rows of the manifest, ordered by month
+    manifest.loadManifest(path = manifest.directory)
+    monthList = [month for month in monthList if month in manifest.DF.columns]
+    remainderDF = _selectRows(manifest.DF[monthList], tickerSelect, intervalSelect)
+    units = manifest.listUnits(monthList, index = remainderDF.index)
+    units.sort(key = lambda unit: unit[2]) # Stable (keeps the manifest order within a month)
+
+    for tick, interv, month in units:
+        unitDF = _loadUnit(manifest, tick, interv, month, convertDatetime, compact = compact)
+        # Only the first and last months can be partly outside the start/end datetimes
+        if month in (monthList[0], monthList[-1]):
+            dateTimes = pd.to_datetime(unitDF.DateTime)
+            unitDF = unitDF[(dateTimes >= startDT) & (dateTimes <= endDT)]
+        yield tick, interv, month, unitDF
+
+# Unit (ticker, interval, month, DataFrame) from the rows of a single unit read from SQL
+def _sqlUnit(unitDF: pd.DataFrame) -> tuple[str, int, str, pd.DataFrame]:
+    unitDF = unitDF.reset_index(drop = True)
+    return unitDF['Ticker'].iat[0], int(unitDF['Interval'].iat[0]), pd.Timestamp(unitDF['DateTime'].iat[0]).strftime("%Y-%m"), unitDF
+
+# Checks if a filter value is a collection of values (membership filter) rather than a single value (equality filter)
+def _isMembership(val) -> bool:
+    return isinstance(val, (list, tuple, set, frozenset, pd.Index, pd.Series)) or (hasattr(val, 'ndim') and val.ndim == 1)
+
+# Gets the list of values selected by the filter of a column (None if the column is not filtered)
+def _filterValues(filters: dict, col: str) -> list | None:
+    if col not in filters: return None
+    return list(filters[col]) if _isMembership(filters[col]) else [filters[col]]
+
+# Empty market DataFrame, with the columns and datatypes of the market data stitched from .csv
+def _emptyMarketDF(convertDatetime = False) -> pd.DataFrame:
+    return pd.DataFrame({'Ticker': pd.Series(dtype = object), 'Interval': pd.Series(dtype = 'int64'),
+                         'DateTime': pd.Series(dtype = 'datetime64[ns]' if convertDatetime else object),
+                         'Open': pd.Series(dtype = 'float64'), 'High': pd.Series(dtype = 'float64'), 'Low': pd.Series(dtype = 'float64'),
+                         'Close': pd.Series(dtype = 'float64'), 'Volume': pd.Series(dtype = 'int64')})
+
+# Loads the given units (ticker, interval, month) from .csv, in parallel if desired, keeping the order of the units
+def _loadUnits(manifest: DataManifest, units: list[tuple[str, int, str]], convertDatetime = False, meta = False, workers: int = None, poolType = 'thread', compact = False) -> list[pd.DataFrame]:
+    if poolType not in ('thread', 'process'): raise ValueError("The poolType must be either 'thread' or 'process'.")
+
+    # Sequential read (no pool)
+    if workers is None or workers <= 1 or len(units) <= 1:
+        return [_loadUnit(manifest, tick, interv, month, convertDatetime, meta, compact) for tick, interv, month in units]
+
+    from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+    if poolType == 'process':
+        # Send a detached copy, the connection engine (or storage) cannot be sent to other processes (and is not needed to read files)
+        import copy
+        manifest = copy.copy(manifest)
+        manifest.SQLengine = None
+        manifest.storage = None
+        manifest._manifestCache = None
+        Executor = ProcessPoolExecutor
+    else:
+        Executor = ThreadPoolExecutor
+
+    with Executor(max_workers = min(workers, len(units))) as pool:
+        # map() returns the results in the order of the units (not the order of completion)
+        return list(pool.map(_loadUnit, *zip(*[(manifest, tick, interv, month, convertDatetime, meta, compact) for tick, interv, month in units])))
+
+# Loads a unit from its file (.csv or binary series), adding the Ticker/Interval (market data) or Month (meta data) to identify
+# it once stitched
+def _loadUnit(manifest: DataManifest, tick: str, interv: int, month: str, convertDatetime = False, meta = False, compact = False) -> pd.DataFrame:
+    if meta:
+        _, addDF = manifest.loadData_fromfile(tick, interv, month, convert_DateTime = convertDatetime, meta = True, echo = False)
+        addDF.loc['7. Month'] = month
+        return addDF
+
+    addDF = manifest.loadData_fromfile(tick, interv, month, convert_DateTime = convertDatetime, echo = False, compact = compact)
+    # Add ticker name on DF (as normally its not specified, and we are mixing the datasets)
+    addDF['Ticker'] = tick
+    addDF['Interval'] = interv
+    addDF.insert(0, 'Ticker', addDF.pop('Ticker'))
+    addDF.insert(1, 'Interval', addDF.pop('Interval'))
+    return addDF
+
 
 ##################################
 ##################################
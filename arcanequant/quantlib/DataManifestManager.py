@@ -1,7 +1,10 @@
 from pathlib import Path
-from dotenv import load_dotenv, find_dotenv
+from dotenv import load_dotenv, find_dotenv, dotenv_values
 import os
+import hashlib
+import threading
 from io import StringIO
+from functools import partial
 from ast import literal_eval
 #from datetime import datetime
 import json
@@ -9,6 +12,7 @@ import pandas as pd
 import sqlalchemy
 from sqlalchemy import create_engine, text
 from typing import Iterable
+from .CacheManager import unitCache, poolMetrics
 
 
 # CREATE A COMPRESSED MANIFEST (YEARS AND STOCKS ONLY, 2 INDICATES AN INCOMPLETE POINT (I.E. NOT ALL MONTHS OR NOT ALL INTERVALS)
@@ -51,6 +55,8 @@ class DataManifest():
     Note:
     - Consider manifest size and data size (of the range of data you use), SQL is better at working with very large datasets.
     - To save all existing data to SQL (instead of one datapoint), use SQLSync from SQLManager.
+    - The database form is the PostgreSQL database of the SQLengine, or the storage backend linked (self.storage, i.e. an
+    embedded DuckDB database by connectDuckDB, see StorageManager), which is used instead when set.
     ---
     Value list:
     0 - No file exists
@@ -61,12 +67,21 @@ class DataManifest():
     ___________________________________
     Method List:
     > loadManifest - Loads manifest from a .json file into the Data Frame in this class
+    > refresh - Reloads the manifest from its .json file, ignoring the in-memory copy of the last load
     > saveManifest - Saves manifest in this class from DataFrame into a .json file 
     > setValue - Sets (or adds) a given value in the manifest
     > validateManifest - Checks the files (or lack thereof) indicated by the manifest
     > reduceManifest - Culls and rows and columns full of zeroes
+    > listUnits - Lists the data units (ticker, interval, month) indicated to exist in the manifest
+    > unitFormat - Gives the file format a data unit is stored in ('csv' or 'binary')
+    > buildCache - Builds the columnar (parquet/feather) cache of the .csv market data files
+    > loadData_fromfile - Loads actual data (of point indicated in manifest) from its file, in the format it is stored in
     > loadData_fromcsv - Loads actual data (of point indicated in manifest) from .csv file
     > loadData_fromsql - Loads actual data (of point indicated in manifest) from database
+    > loadData_frombin - Loads actual data (of point indicated in manifest) from its binary series (see BinaryManager)
+    > connectSQL - Creates and links the connection engine of a PostgreSQL database
+    > connectDuckDB - Creates and links an embedded DuckDB database as the storage backend
+    > backend - Gives the storage backend of the database form of the data (the linked storage, or the PostgreSQL database)
     """
         
     def __init__(self):
@@ -76,6 +91,11 @@ class DataManifest():
         self.directory = None
         self.fileName = 'dataManifest'
         self.SQLengine = None
+        self.storage = None # Storage backend of the database form used instead of the SQLengine (see StorageManager), None to not use
+        self.cacheFormat = None # Columnar cache of the .csv market data files ('parquet' or 'feather'), None to not use
+        self.unitFormats = {} # Format of the units not stored as .csv files, {(ticker, interval, month): 'binary'} (saved with the .json)
+        self._manifestCache = None # Parsed copy of the last .json loaded, with the file details it was loaded from
+        self.manifestCacheStats = {'hits': 0, 'misses': 0} # Direct loads served from the parsed copy (hits) or the file (misses)
         
         print('Data Manifest Initialised') # Also runs during startup
 
@@ -86,7 +106,7 @@ class DataManifest():
         return f'DataManifest(fileName = {self.fileName}, directory = {self.directory}, SQLengine = {self.SQLengine}). DF dimensions: {self.DF.shape}'
 
     # Validate Manifest Data (check if file exists, add to manifest or set to 1, else set to 0 or remove)
-    def validateManifest(self, fastValidate = True, echo = True):
+    def validateManifest(self, fastValidate = True, source = None, echo = True):
         """
         This method validates the DataManifest's DataFrame.
         This is done by comparing the stated intraday data file's presence (or lack thereof) in the DataManifest's indicated directory path.
@@ -94,12 +114,19 @@ class DataManifest():
         
         Input:
         - fastValidate - Boolean, indicates if fast validation method is to be used.
+        - source - String of the storage validated, 'csv' for the .csv files or 'binary' for the months in the binary series
+        "{ticker}_{interval}.bin" (see BinaryManager), or None for each unit in the format it is stored in (see unitFormat).
         - echo - Boolean, indicating verbosity of method.
 
         Notes:
         - fastValidate works by only considering the entries which are stated as 1 or 2 (exists). This is because the
         ignored entries (set as 0) can be redownloaded later anyways (i.e. when user wants to obtain data for 0 entries).
+        - With a source given, the units found are recorded as stored in that format (units set to 0 are no longer recorded).
         """
+        if source not in (None, 'csv', 'binary'): raise ValueError("The source must be either None, 'csv' or 'binary'.")
+        # Each unit read once (not kept in the unitCache)
+        loadUnit = {None: partial(self.loadData_fromfile, cache = False), 'csv': partial(self.loadData_fromcsv, cache = False),
+                    'binary': self.loadData_frombin}[source]
         print('Validating data manifest DataFrame.')
         
         if fastValidate: print('Conducting fast validation.')
@@ -139,13 +166,15 @@ class DataManifest():
                             fileString = r'' + symbol + "_" + str(interval) + "_" + month
                             if echo: print('Searching for file ' + fileString)
                             
-                            fileRead = self.loadData_fromcsv(symbol, interval, month, echo = echo)
+                            fileRead = loadUnit(symbol, interval, month, echo = echo)
                         except FileNotFoundError:
                             print('File ' + fileString + ' not found when stated to exist.')
                             self.DF.loc[((symbol,interval),month)] = 0
+                            self._setFormat(symbol, interval, month, None)
                             invalidpoints[0] += 1 # Adding to no. of invalid datapoints
                         else:
                             if echo: print('File ' + fileString + ' found.')
+                            if source is not None: self._setFormat(symbol, interval, month, source)
                         
                     elif fileValue == 0 and not fastValidate:
                         # Check if file does NOT exist if value zero AND fastValidate is off.
@@ -155,12 +184,13 @@ class DataManifest():
                             fileString = r'' + symbol + "_" + str(interval) + "_" + month
                             if echo: print('Searching for file ' + fileString)
                             
-                            fileRead = self.loadData_fromcsv(symbol, interval, month, echo = echo)
+                            fileRead = loadUnit(symbol, interval, month, echo = echo)
                         except FileNotFoundError:
                             if echo: print('File ' + fileString + ' not found.')
                         else:
                             print('File ' + fileString + ' found when stated to not exist.')
                             self.DF.loc[((symbol,interval),month)] = 1
+                            self._setFormat(symbol, interval, month, source)
                             invalidpoints[0] += 1 # Adding to no. of invalid datapoints
 
         print(f"Number of invalid/tested datapoints in manifest: {invalidpoints[0]}/{invalidpoints[1]}")
@@ -189,6 +219,16 @@ class DataManifest():
 
         The .env is normally readily creatable/editable if file extensions can be changed manually by the user.
 
+        The file can also have the following optional keys, configuring the pool of connections of the engine:
+        POOL_SIZE - number of connections kept open in the pool (default 5)
+        MAX_OVERFLOW - number of connections opened beyond the pool size when all are checked out (default 10)
+        POOL_TIMEOUT - seconds to wait for a connection when the pool and overflow are all checked out (default 30)
+        POOL_PRE_PING - true/false to test each connection as it is checked out, replacing it if dropped (default false)
+        POOL_RECYCLE - seconds after which a connection is replaced on checkout (default -1, never)
+        STATEMENT_TIMEOUT - milliseconds after which a statement is cancelled by the server (default none)
+        APPLICATION_NAME - name of the connections shown by the server, i.e. in pg_stat_activity (default arcanequant)
+        KEEPALIVES_IDLE - seconds of inactivity after which TCP keep-alives are sent on the connections (default none, as the OS)
+
         Example:
         DRIVER=psycopg2:
         DIALECT=postgresql
@@ -197,6 +237,16 @@ class DataManifest():
         HOST_MACHINE=localhost
         PORT=5432
         DBNAME=databasename
+        POOL_SIZE=8
+        POOL_PRE_PING=true
+        STATEMENT_TIMEOUT=600000
+
+        Note:
+        - The optional keys are read from the file only (not from the environment, so they do not carry over to other files).
+        - STATEMENT_TIMEOUT, APPLICATION_NAME and KEEPALIVES_IDLE are connection options of PostgreSQL (libpq), added to the URL of
+        the engine (so engines made from its URL, i.e. by the workers of SQLSync, connect with them too). STATEMENT_TIMEOUT applies
+        to every statement, including the long ones of SQLSync/SQLSetup (keep it above them, or 0 for no timeout).
+        - The checkouts of connections from the pool (and the time waited for them) are recorded in poolMetrics (see CacheManager).
         """
         # If given path empty or relative (working directory) use basepath (main.py's directory)
         basePath = Path(".").resolve()
@@ -221,10 +271,67 @@ class DataManifest():
         connstring = f"{dialect}+{driver}//{username}:{password}@{host_machine}:{port}/{dbname}"
         
                                      #"dialect+driver//username:password@hostname:portnumber/databasename") 
-        self.SQLengine = create_engine(connstring)
+        # Optional pool settings and connection options (from the file only)
+        settings = dotenv_values(env_path)
+        def setting(key: str, default, cast = int):
+            value = settings.get(key)
+            if value is None or value.strip() == '': return default
+            try:
+                return cast(value.strip())
+            except ValueError:
+                raise EnvError(f'Environment variable {key} has an invalid value ({value}).')
+        def flag(value: str) -> bool:
+            if value.lower() not in ('true', 'false', '1', '0', 'yes', 'no'): raise ValueError(value)
+            return value.lower() in ('true', '1', 'yes')
+
+        connOptions = {'application_name': setting('APPLICATION_NAME', 'arcanequant', str)}
+        statementTimeout = setting('STATEMENT_TIMEOUT', None)
+        if statementTimeout is not None: connOptions['options'] = f'-c statement_timeout={statementTimeout}'
+        keepalivesIdle = setting('KEEPALIVES_IDLE', None)
+        if keepalivesIdle is not None: connOptions.update({'keepalives': '1', 'keepalives_idle': str(keepalivesIdle)})
+
+        connURL = sqlalchemy.engine.make_url(connstring)
+        if connURL.get_backend_name() == 'postgresql': connURL = connURL.update_query_dict(connOptions)
+        self.SQLengine = poolMetrics.track(create_engine(connURL,
+                                                         pool_size = setting('POOL_SIZE', 5),
+                                                         max_overflow = setting('MAX_OVERFLOW', 10),
+                                                         pool_timeout = setting('POOL_TIMEOUT', 30, float),
+                                                         pool_pre_ping = setting('POOL_PRE_PING', False, flag),
+                                                         pool_recycle = setting('POOL_RECYCLE', -1)))
         if echo: print(f"Connecting to engine: {self.SQLengine}")
         # Note: Code fails if no/wrong database (OperationalError)
         return
+
+    # Method to create and link an embedded DuckDB database as the storage backend
+    def connectDuckDB(self, path: str = ':memory:', echo = True):
+        """
+        Creates (or opens) an embedded DuckDB database and links it to the class instance (self.storage) as the storage backend
+        of the database form of the data, used instead of the SQLengine (no database server needed).
+
+        Optional Inputs:
+        - path - String of the path of the database file, ':memory:' for a database in memory (lost when closed)
+        - echo - Boolean indicating method verbosity
+
+        Note:
+        - Requires duckdb to be installed.
+        - Load the .csv data into it with self.storage.sync(self) (see DuckDBBackend in StorageManager).
+        """
+        from .StorageManager import DuckDBBackend
+        self.storage = DuckDBBackend(path)
+        if echo: print(f"Connecting to storage: {self.storage}")
+        return
+
+    # Method to give the storage backend of the database form of the data
+    def backend(self):
+        """
+        Gives the storage backend of the database form of the data (see StorageBackend in StorageManager): the storage linked
+        (self.storage) if set, otherwise the PostgreSQL database of self.SQLengine.
+        """
+        if self.storage is not None: return self.storage
+        if self.SQLengine is None:
+            raise ValueError('The DataManifest must have a connection engine (connectSQL) or a storage backend (connectDuckDB).')
+        from .StorageManager import PostgresBackend
+        return PostgresBackend(self.SQLengine)
     
     # Method to reduce manifest (remove completely 0 rows and columns)
     def reduceManifest(self):
@@ -243,12 +350,14 @@ class DataManifest():
         return
 
     # Method to update manifest (adds columns/index rows as necessary)
-    def setValue(self, ticker: str, interval: int, month: str, value: int, sort = True):
+    def setValue(self, ticker: str, interval: int, month: str, value: int, sort = True, fileFormat: str = None):
         """
         This method updates a value in the DataManifest's DataFrame.
         The method adds columns/indices as necessary.
+        The file format of the unit ('csv' or 'binary') is recorded if given (see unitFormat), and dropped if the value is 0.
         """
         if value != 0 and value != 1 and value != 2: raise ValueError('Manifest values must be set to 0, 1 or 2')
+        if fileFormat not in (None, 'csv', 'binary'): raise ValueError("The fileFormat must be either None, 'csv' or 'binary'.")
 
         # If any of the symbol, interval (for the symbol) and month values are new, fill all NaNs as 0 in the new rows/cols
         uniqueSymbols = list(self.DF.index.get_level_values(0).unique().values)
@@ -262,6 +371,8 @@ class DataManifest():
         
         
         self.DF.loc[((ticker,interval),month)] = int(value)
+        if value == 0: self._setFormat(ticker, interval, month, None)
+        elif fileFormat is not None: self._setFormat(ticker, interval, month, fileFormat)
 
         if isnewRowCol: self.DF.fillna(int(0), inplace=True)
 
@@ -271,8 +382,57 @@ class DataManifest():
         
         return
 
+    # Method to list the data units (ticker, interval, month) indicated to exist in the manifest
+    def listUnits(self, months: Iterable[str] = None, index: Iterable[tuple[str, int]] = None, fileFormat: str = None) -> list[tuple[str, int, str]]:
+        """
+        This method lists the data units (ticker, interval, month) that the manifest indicates to exist (value 1 or 2).
+        The units are listed row by row (ticker, interval) and then month by month, in the order of the manifest.
+
+        Optional inputs:
+        - months - Iterable of month strings (YYYY-MM) to consider, all manifest months if None (must be in the manifest)
+        - index - Iterable of (ticker, interval) rows to consider, all manifest rows if None (must be in the manifest)
+        - fileFormat - String of the file format ('csv' or 'binary') of the units to list (see unitFormat), all units if None
+        """
+        months = list(self.DF.columns.values) if months is None else list(months)
+        subDF = self.DF[months]
+        if index is not None: subDF = subDF.loc[list(index)]
+
+        values = subDF.to_numpy()
+        units = [(tick, interv, months[j]) for i, (tick, interv) in enumerate(subDF.index) for j in range(len(months)) if int(values[i, j])]
+        if fileFormat is None: return units
+        return [unit for unit in units if self.unitFormat(*unit) == fileFormat]
+
+    # Method to give the file format a data unit is stored in
+    def unitFormat(self, ticker: str, interval: int, month: str) -> str:
+        """
+        This method gives the file format of a data unit (ticker, interval, month) in the directory of the manifest, 'binary' if
+        its month is stored in the binary series of its ticker/interval (see BinaryManager), otherwise 'csv' (its .csv file).
+        The formats are recorded when the units are saved (DownloadIntraday, SQLLoad) or validated, and saved with the .json.
+        """
+        return self.unitFormats.get((ticker, int(interval), month), 'csv')
+
+    # Records the file format of a unit (only the units not stored as .csv files are kept, None drops the record)
+    def _setFormat(self, ticker: str, interval: int, month: str, fileFormat: str = None):
+        if fileFormat in (None, 'csv'): self.unitFormats.pop((ticker, int(interval), month), None)
+        else: self.unitFormats[(ticker, int(interval), month)] = fileFormat
+
+    # Method to load market data from the file of a unit, in the format it is stored in
+    def loadData_fromfile(self, ticker: str, interval: int, month: str, convert_DateTime = False, meta = False, echo = True, compact = False, cache = True) -> pd.DataFrame | tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        This method loads a month of stock data from the file it is stored in (see unitFormat), using loadData_frombin for the
+        units stored in binary series and loadData_fromcsv otherwise. The inputs and output are those of loadData_fromcsv.
+        """
+        if self.unitFormat(ticker, interval, month) == 'csv':
+            return self.loadData_fromcsv(ticker, interval, month, convert_DateTime = convert_DateTime, meta = meta, echo = echo, compact = compact, cache = cache)
+
+        output = self.loadData_frombin(ticker, interval, month, convert_DateTime = convert_DateTime, meta = meta, echo = echo)
+        if not compact: return output
+        from .SQLManager import CompactFormat
+        if meta: return (CompactFormat(output[0]), output[1])
+        return CompactFormat(output)
+
     # Method to load .csv market data based on the path of the class, and inputted parameters (ticker, interval, month).
-    def loadData_fromcsv(self, ticker: str, interval: int, month: str, convert_DateTime = False, meta = False, echo = True) -> pd.DataFrame | tuple[pd.DataFrame, pd.DataFrame]:
+    def loadData_fromcsv(self, ticker: str, interval: int, month: str, convert_DateTime = False, meta = False, echo = True, compact = False, cache = True) -> pd.DataFrame | tuple[pd.DataFrame, pd.DataFrame]:
         """
         This method loads a .csv file of stock data, based on the path of the class, and inputted parameters (ticker, interval, month)
         The method assumes the file naming format "{ticker}_{interval}_{month}.csv" where month is YYYY-MM ("2025-01") on the .csv files 
@@ -287,10 +447,19 @@ class DataManifest():
         - convert_DateTime - Boolean indicating to read the DateTime column as datetime64 type (or as a string)
         - meta - Boolean that outputs the relevant meta data as well (in a tuple alongside the actual stock data as two DataFrames)
         - echo - Boolean that provides greater description during execution.
+        - compact - Boolean indicating to convert the stock data into compact datatypes (see CompactFormat in SQLManager), with
+        the DateTime column as datetime64 (whatever convert_DateTime is).
+        - cache - Boolean indicating to use the unitCache (disable for one-pass bulk reads, i.e. SQLSync or CSVtoBinary, which
+        would only evict the cached units without being served from the cache).
         
         Note:
         > This method only returns a single monthly period, for custom length periods, use ExtractData.
         > If meta data output is enabled, make sure recieve the tuple output (as opposed to a single DataFrame output when meta=False)
+        > If the DataManifest has a cacheFormat ('parquet' or 'feather'), the market data is read from the columnar cache file next
+        to the .csv when the cache is fresh (same .csv modification time and size as when cached), otherwise the .csv is read and
+        cached. The output is the same either way.
+        > The output is also kept in the process-wide unitCache (see CacheManager), and served from it while the .csv files keep
+        the same modification time and size (except for units marked as 2 in the manifest, which are always read).
         """
         if ( not isinstance(self.directory, str) ) or self.directory == "":
             raise TypeError('The data manifest directory pointer must be a string pointing to a valid path/folder.')
@@ -300,24 +469,203 @@ class DataManifest():
             print(rf"Loading data file: {fileString}.csv")
             if meta: print(rf"Loading meta data file: {fileString}_meta.csv")
 
-        fileRead = pd.read_csv(rf"{self.directory}{ticker}/{fileString}.csv")
+        csvPath = rf"{self.directory}{ticker}/{fileString}.csv"
+        metaPath = rf"{self.directory}{ticker}/{fileString}_meta.csv"
+
+        # Serve from the unit cache if loaded before from the same files (never for incomplete units, or without cache)
+        cacheUnit = cache and unitCache.enabled and self._unitValue(ticker, interval, month) != 2
+        if cacheUnit:
+            unitSource = unitCache.source(self.directory)
+            # Version of the files, before reading (so a file changed meanwhile is not cached as its new version)
+            unitVersion = tuple((fileStat.st_mtime_ns, fileStat.st_size) for fileStat in map(os.stat, [csvPath, metaPath] if meta else [csvPath]))
+            cached = unitCache.get(unitSource, ticker, interval, month, unitVersion, options = (convert_DateTime, meta, compact))
+            if cached is not None: return cached
+
+        fileRead = None
+        # Use the columnar cache if enabled and fresh, otherwise read and cache the .csv
+        if self.cacheFormat:
+            fileRead = self._loadCache(csvPath, convert_DateTime)
+        if fileRead is None:
+            sourceStat = os.stat(csvPath) if self.cacheFormat else None # Before reading (so a file changed meanwhile is stale)
+            fileRead = pd.read_csv(csvPath)
+            if self.cacheFormat: self._saveCache(fileRead, csvPath, sourceStat)
+
         metaFileRead = None
-        if meta: metaFileRead = pd.read_csv(rf"{self.directory}{ticker}/{fileString}_meta.csv", index_col=0)
+        if meta: metaFileRead = pd.read_csv(metaPath, index_col=0)
 
         # Convert datetime column from string to datetime64
         if convert_DateTime:
             fileRead['DateTime'] = pd.to_datetime(fileRead['DateTime'], format = "%Y-%m-%d %H:%M:%S")
             if meta:
                 metaFileRead.loc['3. Last Refreshed'] = pd.to_datetime(metaFileRead.loc['3. Last Refreshed'], format = "%Y-%m-%d %H:%M:%S")
+        if compact:
+            from .SQLManager import CompactFormat
+            fileRead = CompactFormat(fileRead)
+
+        output = (fileRead, metaFileRead) if meta else fileRead
+        if cacheUnit: unitCache.put(unitSource, ticker, interval, month, unitVersion, output, options = (convert_DateTime, meta, compact))
+        return output
+
+    def loadData_frombin(self, ticker: str, interval: int, month: str, convert_DateTime = False, meta = False, echo = True) -> pd.DataFrame | tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        This method loads a month of stock data from the binary series of its ticker/interval "{ticker}_{interval}.bin" (see
+        BinaryManager), based on the path of the class, and inputted parameters (ticker, interval, month).
+        The method returns the data frame of stock data (and meta data if 'meta' enabled), in the same form as loadData_fromcsv.
+
+        Input:
+        - ticker - string of ticker name (i.e. "NVDA")
+        - interval - int of interval value (time gap between datapoints)
+        - month - string of the year and month of the period (in YYYY-MM format, i.e. "2025-01")
+
+        Optional inputs:
+        - convert_DateTime - Boolean indicating to read the DateTime column as datetime64 type (or as a string)
+        - meta - Boolean that outputs the relevant meta data as well (from its .csv file, in a tuple alongside the actual stock data)
+        - echo - Boolean that provides greater description during execution.
+
+        Note:
+        > Raises FileNotFoundError if the series does not exist or does not have the month (as with a missing .csv file).
+        > The month is read from the memory-mapped series (no parsing), using the month-offset index of the series.
+        """
+        if ( not isinstance(self.directory, str) ) or self.directory == "":
+            raise TypeError('The data manifest directory pointer must be a string pointing to a valid path/folder.')
+        from .BinaryManager import _readSeries, _toFrame
+
+        fileString = r'' + ticker + "_" + str(interval) + "_" + month
+        if echo: print(rf"Loading binary data of: {fileString}")
 
-        if meta: return (fileRead, metaFileRead)
-        else: return fileRead
+        index, records = _readSeries(self.directory, ticker, interval)
+        monthRows = index['months'].get(month)
+        if monthRows is None: raise FileNotFoundError(f"The binary series of {ticker} ({interval} min) does not have the month {month}.")
+        # Descending time order (as the .csv files)
+        fileRead = _toFrame(records[monthRows[0]:monthRows[1]][::-1], convertDatetime = convert_DateTime)
+
+        if not meta: return fileRead
+        metaFileRead = pd.read_csv(rf"{self.directory}{ticker}/{fileString}_meta.csv", index_col=0)
+        if convert_DateTime:
+            metaFileRead.loc['3. Last Refreshed'] = pd.to_datetime(metaFileRead.loc['3. Last Refreshed'], format = "%Y-%m-%d %H:%M:%S")
+        return (fileRead, metaFileRead)
+
+    # Value of a unit in the manifest (None if not in the manifest)
+    def _unitValue(self, ticker: str, interval: int, month: str) -> int | None:
+        try:
+            return self.DF.at[(ticker, interval), month]
+        except (KeyError, TypeError):
+            return None
+
+    # Method to build (or refresh) the columnar cache of all market data files indicated in the manifest
+    def buildCache(self, cacheFormat: str = None, workers: int = 4, rebuild = False, background = False, echo = True):
+        """
+        This method writes the columnar cache file (next to the .csv file) of every market data unit indicated to exist in the
+        manifest, using a pool of threads. Cache files that are already fresh are skipped (unless rebuild is enabled).
+
+        Optional inputs:
+        - cacheFormat - String of the cache format, 'parquet' or 'feather'. If given, also sets the DataManifest's cacheFormat
+        (so loadData_fromcsv and ExtractData use it), otherwise the DataManifest's cacheFormat is used.
+        - workers - Integer number of threads writing the cache files
+        - rebuild - Boolean indicating to rewrite the cache files even if they are fresh
+        - background - Boolean indicating to build the cache in the background, returning a concurrent.futures.Future
+        (its result is the number of cache files written) instead of waiting
+        - echo - Boolean indicating method verbosity
+
+        Note:
+        - Requires pyarrow to be installed.
+        - Cache files are named as the .csv file with the format as extension, i.e. "{ticker}_{interval}_{month}.parquet".
+        """
+        if cacheFormat is not None: self.cacheFormat = cacheFormat
+        if self.cacheFormat not in ('parquet', 'feather'): raise ValueError("The cacheFormat must be 'parquet' or 'feather'.")
+        if ( not isinstance(self.directory, str) ) or self.directory == "":
+            raise TypeError('The data manifest directory pointer must be a string pointing to a valid path/folder.')
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        def cacheUnit(unit) -> int:
+            ticker, interval, month = unit
+            csvPath = rf"{self.directory}{ticker}/{ticker}_{interval}_{month}.csv"
+            if not rebuild and self._loadCache(csvPath, readData = False) is not None: return 0 # Already fresh
+            sourceStat = os.stat(csvPath)
+            self._saveCache(pd.read_csv(csvPath), csvPath, sourceStat)
+            return 1
+
+        def build() -> int:
+            units = self.listUnits()
+            if echo: print(f'Building {self.cacheFormat} cache of {len(units)} data files')
+            with ThreadPoolExecutor(max_workers = max(1, workers)) as pool:
+                written = sum(pool.map(cacheUnit, units))
+            if echo: print(f'Cache built, {written} files (re)written')
+            return written
+
+        if background:
+            executor = ThreadPoolExecutor(max_workers = 1)
+            future = executor.submit(build)
+            executor.shutdown(wait = False) # Thread finishes the build and exits
+            return future
+        return build()
+
+    # Loads the columnar cache of a .csv market data file, returns None if there is no fresh cache
+    def _loadCache(self, csvPath: str, convert_DateTime = True, readData = True) -> pd.DataFrame | bool | None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        cachePath = f"{os.path.splitext(csvPath)[0]}.{self.cacheFormat}"
+        sourceStat = os.stat(csvPath) # Also raises FileNotFoundError if the .csv no longer exists (even if cached)
+        try:
+            # Close the file before returning (so the cache can be replaced later, even on Windows)
+            with pa.OSFile(cachePath, 'rb') as cacheSource:
+                if self.cacheFormat == 'parquet':
+                    cacheFile = pq.ParquetFile(cacheSource)
+                    schema = cacheFile.schema_arrow
+                else:
+                    cacheFile = pa.ipc.open_file(cacheSource)
+                    schema = cacheFile.schema
+
+                source = json.loads((schema.metadata or {}).get(b'arcanequant.source', b'{}'))
+                if source.get('mtime_ns') != sourceStat.st_mtime_ns or source.get('size') != sourceStat.st_size:
+                    return None # Stale (the .csv changed since it was cached)
+                if not readData: return True
+
+                table = cacheFile.read() if self.cacheFormat == 'parquet' else cacheFile.read_all()
+                if not convert_DateTime: # Back to the .csv string form (arrow cast gives "YYYY-MM-DD HH:MM:SS" for seconds)
+                    dateTimeString = table['DateTime'].cast(pa.timestamp('s')).cast(pa.string())
+                    table = table.set_column(table.schema.get_field_index('DateTime'), 'DateTime', dateTimeString)
+                return table.to_pandas()
+        except (FileNotFoundError, pa.ArrowInvalid):
+            return None
+
+    # Saves the columnar cache of a .csv market data file (as read by pandas) with the .csv file details it was made from
+    def _saveCache(self, fileRead: pd.DataFrame, csvPath: str, sourceStat: os.stat_result):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        cacheDF = fileRead.copy()
+        try:
+            cacheDF['DateTime'] = pd.to_datetime(cacheDF['DateTime'], format = "%Y-%m-%d %H:%M:%S")
+        except (ValueError, TypeError):
+            return # Not in the standard format, keep reading the .csv
+
+        table = pa.Table.from_pandas(cacheDF, preserve_index = False)
+        source = json.dumps({'mtime_ns': sourceStat.st_mtime_ns, 'size': sourceStat.st_size})
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), b'arcanequant.source': source.encode()})
+
+        # Write to a temporary file first, then replace (readers never see a partially written cache)
+        cachePath = f"{os.path.splitext(csvPath)[0]}.{self.cacheFormat}"
+        tempPath = f"{cachePath}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            if self.cacheFormat == 'parquet':
+                pq.write_table(table, tempPath)
+            else:
+                with pa.OSFile(tempPath, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tempPath, cachePath)
+        except OSError as e: # Cache is optional, the .csv is still read
+            print(f"Could not write cache file {cachePath}: {e}")
+            if os.path.exists(tempPath): os.remove(tempPath)
+        return
 
     # Method to load database market data based on the path of the class, and inputted parameters (ticker, interval, month).
-    def loadData_fromsql(self, ticker: str, interval: int, month: str, convert_DateTime = False, postProcess = True, meta = False, echo = True) -> pd.DataFrame | tuple[pd.DataFrame, pd.DataFrame]:
+    def loadData_fromsql(self, ticker: str, interval: int, month: str, convert_DateTime = False, postProcess = True, meta = False, echo = True, compact = False) -> pd.DataFrame | tuple[pd.DataFrame, pd.DataFrame]:
         """
         This method loads a part of the database of stock data, based on the path of the class, and inputted parameters (ticker, interval, month)
-        The method assumes the postgreSQL information from self.SQLengine
+        The method assumes the postgreSQL information from self.SQLengine (or the storage backend linked, see backend)
         The method returns the data frame of stock data, and calls ExtractData to work.
         Note: This method only returns a single monthly period, for custom length periods, use ExtractData directly.
 
@@ -331,15 +679,31 @@ class DataManifest():
         - postProcess - Boolean that converts the direct output from SQL into the original form used to save into SQL
         - meta - Boolean that outputs the relevant meta data as well (in a tuple alongside the actual stock data as two DataFrames)
         - echo - Boolean that provides more output during execution.
+        - compact - Boolean indicating to convert the stock data into compact datatypes (see CompactFormat in SQLManager)
+
+        Note:
+        - The output is kept in the process-wide unitCache (see CacheManager), and served from it until the database is changed
+        by SQLSave/SQLClear/SQLNuke (except for units marked as 2 in the manifest, which are always queried).
         """
         from .DataManager import ExtractData
         if echo: print('Extracting data from SQL database')
 
-        sqlDF = ExtractData("stockData", month, month, self, fromSQL = True, postProcess=postProcess, convertDatetime=convert_DateTime, Ticker = ticker, Interval = interval)
+        # Serve from the unit cache if queried before with no changes to the database since (never for incomplete units)
+        cacheUnit = unitCache.enabled and self._unitValue(ticker, interval, month) != 2
+        if cacheUnit:
+            unitSource = self.backend().source
+            unitVersion = unitCache.generation(unitSource) # Before querying (so changes meanwhile are not cached as the new version)
+            cached = unitCache.get(unitSource, ticker, interval, month, unitVersion, options = (convert_DateTime, postProcess, meta, compact))
+            if cached is not None: return cached
+
+        sqlDF = ExtractData("stockData", month, month, self, fromSQL = True, postProcess=postProcess, convertDatetime=convert_DateTime, compact=compact, Ticker = ticker, Interval = interval)
+        output = sqlDF
         if meta:
             metaSQLDF = ExtractData("metaData", month, month, self, fromSQL = True, postProcess=postProcess, convertDatetime=convert_DateTime, condition=lambda df: (df['2. Symbol'] == ticker) & (df['4. Interval'] == f"{interval}min") )
-            return (sqlDF, metaSQLDF)
-        else: return sqlDF
+            output = (sqlDF, metaSQLDF)
+
+        if cacheUnit: unitCache.put(unitSource, ticker, interval, month, unitVersion, output, options = (convert_DateTime, postProcess, meta, compact))
+        return output
     
     # Method to save manifest data into file
     def saveManifest(self, saveTo = 'json', savePath = "", echo = True):
@@ -357,6 +721,8 @@ class DataManifest():
         or "", then raises error.
         - If saving to SQL, and no connection is possible, the method will skip SQL save but
         will raise a notice.
+        - The file formats of the units not stored as .csv files (see unitFormat) are saved next to the .json, in
+        "{fileName}_formats.json" (not saved to SQL).
         """
 
         # Guard function against bad path input
@@ -397,6 +763,15 @@ class DataManifest():
                 readableJSON = json.loads(manifestJSON)
                 json.dump(readableJSON, manifestSave, indent = 4)
                 if echo: print(f"JSON saved successfully to {filepath}")
+            self._manifestCache = None # The file has changed, the next load parses it
+
+            # File formats of the units not stored as .csv files (no file if all are)
+            formatsPath = rf"{savePath}{self.fileName}_formats.json"
+            if self.unitFormats:
+                with open(formatsPath, "w") as formatsSave:
+                    json.dump([[*unit, fileFormat] for unit, fileFormat in sorted(self.unitFormats.items())], formatsSave, indent = 4)
+            elif os.path.exists(formatsPath):
+                os.remove(formatsPath)
 
         # Saving to SQL database
         if saveTo.lower() == 'both' or saveTo.lower() == 'sql':
@@ -404,7 +779,7 @@ class DataManifest():
             # Save if the SQLengine is already established, if not try connect to SQL first
             # If run into errors, cancel this operation
             skipEngine = False
-            if self.SQLengine is None:
+            if self.SQLengine is None and self.storage is None:
                 try:
                     if echo: print('No SQL connection, attempting to create connection engine...')
                     self.connectSQL(echo = echo)
@@ -414,8 +789,7 @@ class DataManifest():
                     print(f"An error occurred, skipping connection engine creation: {e}")
                     
             if not skipEngine: # Run if engine already exists or just created 
-                from .SQLManager import SQLSave
-                SQLSave(self.DF, self.SQLengine, 'manifestTable', ignore_index = True, echo = False)
+                self.backend().save(self.DF, 'manifestTable')
                 if echo: print('Saved to SQL successfully')
         
         return
@@ -433,7 +807,11 @@ class DataManifest():
         - echo - Boolean indicating method verbosity
         Notes:
         - If the path is "" or None, then the method tries to use the DataManifest's self.directory attribute
-        - To load from 'database' the DataManifest must have a valid self.SQLengine connection engine
+        - To load from 'database' the DataManifest must have a valid self.SQLengine connection engine (or storage backend)
+        - A direct load keeps a parsed copy of the .json file, and the next direct load of the same file uses it (without
+        parsing the file again) if the file modification time and size are unchanged, or if its contents hash is unchanged
+        (e.g. file rewritten with the same data). Use refresh() to force a reload, and manifestCacheStats for hits/misses.
+        - A direct load also loads the file formats of the units (see unitFormat) from "{fileName}_formats.json" if it exists.
         """
         if echo: print('Loading Manifest Data')
 
@@ -441,15 +819,13 @@ class DataManifest():
 
         # Database load method
         if loadFrom == 'database':
-            if self.SQLengine is None:
+            if self.SQLengine is None and self.storage is None:
                 raise ValueError('You must provide a connection engine to use to load the manifest from.')
             
-            if echo: print(f'Loading manifest view from engine: {self.SQLengine}')
+            if echo: print(f'Loading manifest view from: {self.backend()}')
             
-            self.DF = pd.read_sql('SELECT * FROM "manifestData";', self.SQLengine, index_col=['Ticker','Interval'])
-
-            from .SQLManager import SQLtoDFFormat
-            self.DF = SQLtoDFFormat(self.DF, 'manifest', raiseError=False)
+            # Long manifestTable pivoted into the wide form (a column per month)
+            self.DF = self.backend().manifest()
 
             return
 
@@ -476,10 +852,32 @@ class DataManifest():
             filepath = path + self.fileName + '.json'
             if echo: print('Load path/name: ' + filepath) 
 
+            # File formats of the units not stored as .csv files
+            formatsPath = path + self.fileName + '_formats.json'
+            self.unitFormats = {}
+            if os.path.exists(formatsPath):
+                with open(formatsPath) as formatsLoad:
+                    self.unitFormats = {(ticker, int(interval), month): fileFormat for ticker, interval, month, fileFormat in json.load(formatsLoad)}
+
+            # Use the parsed copy of the last load if the file has not changed since
+            fileStat = os.stat(filepath)
+            cached = self._manifestCache
+            if cached is not None and cached['path'] == filepath and cached['size'] == fileStat.st_size:
+                if cached['mtime_ns'] != fileStat.st_mtime_ns: # Modified (or touched), compare contents
+                    with open(filepath, 'rb') as manifestLoad:
+                        fileBytes = manifestLoad.read()
+                    if hashlib.sha1(fileBytes).hexdigest() == cached['hash']: cached['mtime_ns'] = fileStat.st_mtime_ns
+                if cached['mtime_ns'] == fileStat.st_mtime_ns:
+                    self.DF = cached['DF'].copy()
+                    self.manifestCacheStats['hits'] += 1
+                    return
+            self.manifestCacheStats['misses'] += 1
+
             # Here we load the .json file before converting into MIDF
-            with open(filepath,) as manifestLoad: # Default is read mode
-                # Note: manifestJSON is the string version of loadJSON (dict form), difference is None is null in JSON form
-                loadJSON = json.load(manifestLoad)
+            with open(filepath, 'rb') as manifestLoad:
+                fileBytes = manifestLoad.read()
+            # Note: manifestJSON is the string version of loadJSON (dict form), difference is None is null in JSON form
+            loadJSON = json.loads(fileBytes)
 
             # After loading json (dict form and None) need to convert to json form (string form and null) to use in pandas
             stringJSON = json.dumps(loadJSON)
@@ -513,8 +911,22 @@ class DataManifest():
             # Convert all values to int (1 or 0)
             for column in self.DF.columns:
                 self.DF[column] = self.DF[column].astype(int)
+
+            # Keep a parsed copy for the next load
+            self._manifestCache = {'path': filepath, 'mtime_ns': fileStat.st_mtime_ns, 'size': fileStat.st_size,
+                                   'hash': hashlib.sha1(fileBytes).hexdigest(), 'DF': self.DF.copy()}
             return
 
+    def refresh(self, echo = True):
+        """
+        This method reloads the manifest from its .json file (in self.directory), discarding the parsed copy kept from the last
+        direct load, e.g. if the file was changed in a way its modification time and size do not show.
+        Input:
+        - echo - Boolean indicating method verbosity
+        """
+        self._manifestCache = None
+        self.loadManifest(path = self.directory if self.directory is not None else "", echo = echo)
+
 ##################################
 ##################################
 
@@ -1,7 +1,12 @@
+import io
+import os
+import re
+import hashlib
 import pandas as pd
 import sqlalchemy
 from typing import Iterable
 from .DataManifestManager import DataManifest
+from .CacheManager import unitCache, tickerCache, _engineSource
 
 class SQLManager():
     """Placeholder class for package-level structure or future use."""
@@ -12,16 +17,20 @@ class SQLManager():
 # - SQLSetup - Sets up SQL to be used by DataManifest
 # - SQLEstablish - Establishes the database by creating necessary tables/columns
 # - SQLRepair - Repairs SQL system by remaking all tables and keys, can even resync data
+# - SQLMigrate - Migrates a database established with the wide manifestTable (a column per month) to the long manifestTable
 # - SQLSync - Syncs all data in storage to DataManifest
+# - SQLLoad - Loads all data in SQL into storage (reverse of SQLSync)
 # - SQLClear - Clears all row data in SQL (excluding precomputed tables like date/time)
+# - SQLClearUnits - Clears the rows of a set of units (ticker, interval, month) in SQL
 # - SQLNuke - WIPES ALL DATA, keys, tables in the database (dangerous for only users who store only in SQL database!)
 # - SetKeysQuery - Provide (or execute) query for setting key(s)
+# - DDLPlan - Plan of the key statements of a schema not satisfied yet in a database, executed in one transaction
 # - DropKeysQuery - Provide (or execute) query for dropping key(s)
 # - ExecuteSQL - Executes provided SQL query (needs engine)
 
 
 # Set up database by creating tables/columns and necessary relations/keys
-def SQLSetup(connEngine: sqlalchemy.engine, new = True):
+def SQLSetup(connEngine: sqlalchemy.engine, new = True, partitionBy: str = None, rebuild = False, dryRun = False, concurrently = False) -> list[str]:
     """
     Sets up SQL to be used by DataManifest. Establishes the set of tables with SQLEstablish,
     then sets all the necessary keys, and creates the view to connect .csv and SQL storage forms.
@@ -30,14 +39,25 @@ def SQLSetup(connEngine: sqlalchemy.engine, new = True):
 
     Optional input:
     - new - Boolean indicating if first-time setup, if False, skips establishing relational tables
+    - partitionBy - String of the partitioning of the marketTable established (if new), see SQLEstablish
+    - rebuild - Boolean indicating to drop and set every key again, otherwise only the keys missing (or different) in the
+    database are set
+    - dryRun - Boolean indicating to only plan the key statements (nothing is established or executed)
+    - concurrently - Boolean indicating to build the secondary indexes concurrently (reads and writes of the tables continue)
+
+    Output:
+    - List of the key statements executed (or planned if dryRun)
 
     Note: Does not sync any data from .csv to SQL.
     Also, if first-time setup (new is True), also sets up testing infrastructure (testUser, testDatabase etc.)
+    The keys are set by the setupKeys plan (DDLPlan), in one transaction, so a populated database only rebuilds what is missing.
     """
 
+    if dryRun: return setupKeys.plan(connEngine, rebuild = rebuild)
+
     if new:
         print('Establishing tables and views...')
-        SQLEstablish(connEngine)
+        SQLEstablish(connEngine, partitionBy)
         print('Setting up test infrastructure...')
         testSetUpString = '''
                     DROP DATABASE IF EXISTS "testDatabase";
@@ -51,51 +71,32 @@ def SQLSetup(connEngine: sqlalchemy.engine, new = True):
         ExecuteSQL(testSetUpString, connEngine, transact=False)
         
     print('Setting all keys to complete the relational database...')
-    # TickerTable keys
-    SetKeysQuery('tickerTable', 'Ticker', 'primary', engine = connEngine)
-    SetKeysQuery('tickerTable', 'TickerID', 'unique', engine = connEngine)
-    
-    # DateTable keys
-    SetKeysQuery('dateTable', 'DateID', 'primary', engine = connEngine)
-    SetKeysQuery('dateTable', 'Date', 'unique', engine = connEngine)
-    SetKeysQuery('dateTable', 'DayOfWeek', 'secondary', engine = connEngine)
-    SetKeysQuery('dateTable', 'Day', 'secondary', engine = connEngine)
-    SetKeysQuery('dateTable', 'Month', 'secondary', engine = connEngine)
-    
-    # TimeTable keys
-    SetKeysQuery('timeTable', 'TimeID', 'primary', engine = connEngine)
-    SetKeysQuery('timeTable', 'Time', 'unique', engine = connEngine)
-    SetKeysQuery('timeTable', 'Hour', 'secondary', engine = connEngine)
-    SetKeysQuery('timeTable', 'Minute', 'secondary', engine = connEngine)
-    SetKeysQuery('timeTable', 'Second', 'secondary', engine = connEngine)
-    
-    # ManifestTable keys
-    SetKeysQuery('manifestTable', ('TickerID','Interval'), 'primary', engine = connEngine)
-    SetKeysQuery('manifestTable', 'TickerID', 'foreign', ref = ('tickerTable','TickerID'), engine = connEngine)
-    
-    # MarketTable keys
-    SetKeysQuery('marketTable', ('TickerID','Interval','DateID','TimeID'), 'primary', engine = connEngine)
-    SetKeysQuery('marketTable', ('TickerID','DateID','TimeID'), 'foreign', ref = ( ('tickerTable','TickerID'), ('dateTable','DateID'),
-                    ('timeTable','TimeID') ), engine = connEngine)
-    SetKeysQuery('marketTable', ('TickerID','Interval'), 'foreign', ref = ('manifestTable',['TickerID','Interval']), engine = connEngine)
-
-    # MetaTable keys
-    SetKeysQuery('metaTable', ('TickerID','4. Interval','7. Month'), 'primary', engine = connEngine)
-    SetKeysQuery('metaTable', ('TickerID','DateID','TimeID'), 'foreign', ref = ( ('tickerTable','TickerID'), ('dateTable','DateID'),
-                    ('timeTable','TimeID') ), engine = connEngine)
-    SetKeysQuery('metaTable', ('TickerID','4. Interval'), 'foreign', ref = ('manifestTable',['TickerID','Interval']), engine = connEngine)
-
-    # Can set extra indexes here (hour, or year etc.)
-    return
+    statements = setupKeys.execute(connEngine, rebuild = rebuild, concurrently = concurrently)
+    print(f"{len(statements)} key statements executed ({len(setupKeys.steps)} keys, the others already set).")
+    return statements
 
 # Establish database by creating necessary tables/columns.
-def SQLEstablish(engine: sqlalchemy.engine):
+def SQLEstablish(engine: sqlalchemy.engine, partitionBy: str = None, conn: sqlalchemy.engine.Connection = None):
     """
     Establishes the database by creating the necessary tables and columns. Does not create any relations 
     or additional columns.
     Input:
     - engine - SQL engine to connect to database
+
+    Optional input:
+    - partitionBy - String of the partitioning of the marketTable, None for a single table, 'month' for a partition per month
+    (range of DateID) or 'unit' for a partition per ticker/interval/month (range of TickerID, Interval and DateID)
+    - conn - Connection to establish in (the caller's transaction), otherwise all tables and views are established in one
+    transaction of a connection of the engine (committed)
+
+    Note:
+    - The partitions are created by SQLSave as the rows of new months (or units) are saved. Month partitions are pruned by
+    the time range of the market queries (as ExtractData). Unit partitions are only pruned by queries of a TickerID (their
+    leading key), but the units resynced by SQLSync are truncated (instead of deleting their rows).
     """
+    if partitionBy not in (None, 'month', 'unit'): raise ValueError("The partitionBy must be None, 'month' or 'unit'.")
+    if conn is None:
+        with engine.begin() as establishConn: return SQLEstablish(engine, partitionBy, establishConn)
     # First remove all tables directly via SQL (to remove all dependencies as well)
     clearstring = '''
                     DROP TABLE IF EXISTS "tickerTable" CASCADE;
@@ -104,8 +105,12 @@ def SQLEstablish(engine: sqlalchemy.engine):
                     DROP TABLE IF EXISTS "dateTable" CASCADE;
                     DROP TABLE IF EXISTS "timeTable" CASCADE;
                     DROP TABLE IF EXISTS "manifestTable" CASCADE;
+                    DROP TABLE IF EXISTS "syncLedger" CASCADE;
+                    DROP TABLE IF EXISTS "deferredKeys" CASCADE;
                 '''
-    ExecuteSQL(clearstring, engine)
+    ExecuteSQL(clearstring, engine, conn = conn)
+    tickerCache.invalidate(engine) # TickerIDs of the dropped tickerTable
+    _marketPartitions.pop(_engineSource(engine), None) # Partitions of the dropped marketTable
     from sqlalchemy import types as sqltype
     
     ### Creating TickerTable
@@ -118,14 +123,14 @@ def SQLEstablish(engine: sqlalchemy.engine):
             "TickerID": sqltype.SmallInteger(), 
             "Ticker": sqltype.String(10)
         }
-    tickerTable.to_sql('tickerTable', engine, if_exists='replace', index=True, dtype = datatypes)
+    tickerTable.to_sql('tickerTable', conn, if_exists='replace', index=True, dtype = datatypes)
     # Setting TickerID so that it is always not null and serial (so when new tickers added, gives correct ID)
     tickerSetString = """
                         ALTER TABLE "tickerTable"
                         ALTER COLUMN "TickerID" ADD GENERATED BY DEFAULT AS IDENTITY,
                         ALTER COLUMN "TickerID" SET NOT NULL;
                         """
-    ExecuteSQL(tickerSetString, engine)
+    ExecuteSQL(tickerSetString, engine, conn = conn)
 
     ### Creating MarketTable
     # Set columns and index
@@ -144,7 +149,13 @@ def SQLEstablish(engine: sqlalchemy.engine):
             "Volume": sqltype.BigInteger(),
             "Nominal": sqltype.Float()
         }
-    marketTable.to_sql('marketTable', engine, if_exists='replace', index=False, dtype = datatypes)
+    if partitionBy is None:
+        marketTable.to_sql('marketTable', conn, if_exists='replace', index=False, dtype = datatypes)
+    else: # Partitioned table (same columns), partitions created on save
+        partitionKeys = '"DateID"' if partitionBy == 'month' else '"TickerID", "Interval", "DateID"'
+        columnString = ', '.join(f'"{col}" {dtype.compile(dialect = engine.dialect)}' for col, dtype in datatypes.items())
+        ExecuteSQL(f'CREATE TABLE "marketTable" ({columnString}) PARTITION BY RANGE ({partitionKeys});', engine, conn = conn)
+    ExecuteSQL(marketDateTimeQuery, engine, conn = conn) # Stored DateTime (generated from DateID/TimeID)
 
     ### Creating MetaTable
     # Set columns and index
@@ -160,7 +171,7 @@ def SQLEstablish(engine: sqlalchemy.engine):
             "6. Time Zone": sqltype.VARCHAR(),
             "7. Month": sqltype.CHAR(7)
         }
-    metaTable.to_sql('metaTable', engine, if_exists='replace', index=False, dtype = datatypes)
+    metaTable.to_sql('metaTable', conn, if_exists='replace', index=False, dtype = datatypes)
 
     ### Creating DateTable and TimeTable (in one command using direct SQL queries)
     wallstring = ""
@@ -206,65 +217,20 @@ def SQLEstablish(engine: sqlalchemy.engine):
                     SELECT generate_series('1900-01-01 00:00:00'::TIMESTAMP, '1900-01-01 23:59:59'::TIMESTAMP, '1 second'::INTERVAL)::TIME;
                     """
 
-    ExecuteSQL(wallstring, engine)
+    ExecuteSQL(wallstring, engine, conn = conn)
 
-    ### Creating ManifestTable
-    # Set columns and index
-    manifestTable = pd.DataFrame(columns=['TickerID','Interval'])
-    manifestTable.rename_axis("Index",axis=0,inplace = True)
-    
-    # Set datatype of columns
-    datatypes = {  
-            "TickerID": sqltype.SmallInteger(),
-            "Interval": sqltype.SmallInteger()
-        }
-    manifestTable.to_sql('manifestTable', engine, if_exists='replace', index=False, dtype = datatypes)
+    ### Creating ManifestTable (long form, a row per ticker/interval/month)
+    ExecuteSQL(manifestTableQuery, engine, conn = conn)
 
-    # After tables are created, set up view(s) for extraction from SQL to pandas
-    # In order: stockData, manifestData, metaData
-    viewsquery = """
-        DROP VIEW IF EXISTS "stockData";
-        CREATE OR REPLACE VIEW "stockData" AS
-        SELECT
-            tickt."Ticker", -- from tickerTable
-            mt."Interval",  -- from marketTable
-        
-            -- Construct DateTime from Date + Time
-            -- Date must be DATE (from dateTable) and Time must be TIME (from timeTable)
-            (dt."Date" + tt."Time") AS "DateTime",
-        
-            -- Market data
-            mt."Open",
-            mt."High",
-            mt."Low",
-            mt."Close",
-            mt."Volume",
-            mt."Nominal"
-        FROM "marketTable" mt
-        JOIN "dateTable" dt ON dt."DateID" = mt."DateID"
-        JOIN "timeTable" tt ON tt."TimeID" = mt."TimeID"
-        JOIN "tickerTable" tickt ON tickt."TickerID" = mt."TickerID";
-        
+    ### Creating SyncLedger (units synced by SQLSync, with the version of their files)
+    ExecuteSQL(ledgerTableQuery, engine, conn = conn)
 
-        DO $$
-        DECLARE
-            col_list text;
-        BEGIN
-            SELECT string_agg('m."' || column_name || '"', ', ' ORDER BY ordinal_position)
-            INTO col_list
-            FROM information_schema.columns
-            WHERE table_name = 'manifestTable'
-              AND column_name NOT IN ('TickerID')
-              AND table_schema = 'public';
-        
-            EXECUTE format('
-                CREATE OR REPLACE VIEW "manifestData" AS
-                SELECT t."Ticker", %s
-                FROM "manifestTable" m
-                JOIN "tickerTable" t ON m."TickerID" = t."TickerID";
-            ', col_list);
-        END $$;
+    ### Creating DeferredKeys (keys dropped by a bulk load of SQLSync and not rebuilt yet)
+    ExecuteSQL(deferredTableQuery, engine, conn = conn)
 
+    # After tables are created, set up view(s) for extraction from SQL to pandas
+    # In order: stockData, manifestData, metaData
+    viewsquery = stockViewQuery + manifestViewQuery + """
         DROP VIEW IF EXISTS "metaData";
         CREATE OR REPLACE VIEW "metaData" AS 
         SELECT
@@ -289,15 +255,15 @@ def SQLEstablish(engine: sqlalchemy.engine):
         JOIN "timeTable" tt ON tt."TimeID" = mt."TimeID"
         JOIN "tickerTable" tickt ON tickt."TickerID" = mt."TickerID";
         """
-    # The second part of this query makes the manifest view (with Ticker instead of TickerID) in SQL with the
-    # columns in the manifestTable, here it has no month cols (as its a new manifestTable), but reusing this
-    # should add the new columns
-    ExecuteSQL(viewsquery, engine)
+    # The stockData view reads the stored DateTime of the marketTable, and the manifest view is in long form as its table
+    # (see SQLManifest for the wide form of DataManifest.DF)
+    ExecuteSQL(viewsquery, engine, conn = conn)
     
     return
 
 # Repair SQL table/keys/data
-def SQLRepair(dataManifest: DataManifest = None, connEngine: sqlalchemy.engine = None, deepRepair = False, dataRepair = True, echo = False):
+def SQLRepair(dataManifest: DataManifest = None, connEngine: sqlalchemy.engine = None, deepRepair = False, dataRepair = True, deferKeys = False,
+              concurrently = False, echo = False) -> dict:
     """
     Repairs SQL system by remaking all keys (and tables as needed) on a database, and resyncing data to SQL if possible.
     
@@ -307,7 +273,14 @@ def SQLRepair(dataManifest: DataManifest = None, connEngine: sqlalchemy.engine =
     - connEngine - Connection to SQL database to repair
     - dataRepair - Boolean indicating if the data also needs to be repaired (by deleting the SQL dataset and re-syncing
     from the .csv dataset)
+    - deferKeys - Boolean indicating to resync the data with the secondary indexes and foreign keys deferred (see SQLSync)
+    - concurrently - Boolean indicating to rebuild the missing secondary indexes concurrently (reads and writes continue)
     - echo - Echo output/actions from function
+
+    Output:
+    - Dictionary of the repair: the 'keys' set again ('table: name'), the 'deferred' keys rebuilt from the deferredKeys record
+    ('table: name') and their 'deferredErrors', the 'migrated' rows (see SQLMigrate) and the 'sync' statistics (see SQLSync,
+    None if no data repair)
     
     Note:
     - At least one of dataManifest or connEngine must be provided
@@ -318,6 +291,10 @@ def SQLRepair(dataManifest: DataManifest = None, connEngine: sqlalchemy.engine =
     database.
     If issues arise from syncing .csv data directly to SQL (due to existing data in SQL), enable dataRepair to clear (or
     clear manually using SQLDelete).
+    - The keys are compared to the catalog of the database (see DDLPlan), only the keys missing, different or not valid are
+    set again (a database with all its keys is not changed).
+    - The keys dropped by a bulk load (SQLSync deferKeys) and not rebuilt (recorded in the deferredKeys table) are rebuilt
+    first, with their recorded definitions.
     """
     import sqlalchemy.exc as sqlexc
     # Selecting engine to use
@@ -334,32 +311,137 @@ def SQLRepair(dataManifest: DataManifest = None, connEngine: sqlalchemy.engine =
         SQLNuke(connEngine = connEngine, ignoreWarn = True)
 
         print('Remaking the database from blank slate...')
-        SQLSetup(connEngine, new = True)
+        report = {'keys': setupKeys.describe(SQLSetup(connEngine, new = True)), 'deferred': [], 'deferredErrors': [], 'migrated': None, 'sync': None}
 
     # Normal repair operation (repair keys, if missing table also remake tables (not views))
     else:
         # Set all keys and establish relational database
         print(f'Repairing SQL database using connection engine {connEngine}...')
         try:
-            print('Attempting to drop and reset all keys to recreate the relational database without deleting tables')
-            SQLSetup(connEngine, new = False)
+            migrated = SQLMigrate(connEngine, echo) # Databases established with the wide manifestTable
+            # Keys dropped by a bulk load and not rebuilt (their recorded definitions)
+            recordedKeys = _recordedKeys(connEngine)
+            deferredErrors = _restoreKeys(connEngine, recordedKeys, echo = echo) if recordedKeys['index'] or recordedKeys['foreign'] else []
+            deferred = [f"{table}: {name}" for kind in ('index', 'foreign') for table, name, *_ in recordedKeys[kind]
+                        if not any(error.startswith(f"{table}: {name}: ") for error in deferredErrors)]
+            print('Attempting to reset the missing (or invalid) keys to recreate the relational database without deleting tables')
+            report = {'keys': setupKeys.describe(SQLSetup(connEngine, new = False, concurrently = concurrently)), 'deferred': deferred,
+                      'deferredErrors': deferredErrors, 'migrated': migrated, 'sync': None}
 
         except sqlexc.ProgrammingError: # If any table is missing (none should ever be missing), recreate all tables from scratch, then set keys
             if echo: print('Table(s) missing, recreating all tables before repair...')
-            SQLSetup(connEngine, new = True)
+            report = {'keys': setupKeys.describe(SQLSetup(connEngine, new = True)), 'deferred': [], 'deferredErrors': [], 'migrated': None, 'sync': None}
+        if echo: print(f"Keys set again: {', '.join(report['keys'] + report['deferred']) if report['keys'] or report['deferred'] else 'none'}")
 
         print('Primary repair complete.')
         # At the end, if data repair desired, sync SQL with .csv files (if dataManifest has a directory provided (i.e. a file storage location))
         if dataRepair and (dataManifest.directory != "" or dataManifest.directory != None):
             print('Repairing SQL data using directly stored data: {mode} sync mode.'.format(mode = "Full" if deepRepair else "Fast"))
-            SQLSync(dataManifest, not deepRepair, echo)
+            report['sync'] = SQLSync(dataManifest, not deepRepair, echo, deferKeys = deferKeys)
             print('Data repair complete.')
 
     
-    return
+    return report
+
+# Migrate a database established by an earlier version to the current tables
+def SQLMigrate(engine: sqlalchemy.engine, echo = False, conn: sqlalchemy.engine.Connection = None) -> dict:
+    """
+    Migrates a database established by an earlier version of SQLEstablish to the current tables, in a single transaction.
+    Migrates:
+    - The wide manifestTable (a SMALLINT column per month, added by SQLSave as new months are saved) to the long
+    manifestTable (a row per ticker/interval/month with its value). The values are copied, and the manifestData view and the
+    keys referencing the manifestTable are remade.
+    - The marketTable without the stored DateTime column. The column is added (generated from the DateID/TimeID of the rows,
+    so the table is rewritten), with its time range indexes replacing the DateID/TimeID index, and the stockData view is
+    remade to read it (without the dateTable/timeTable joins).
+
+    Input:
+    - engine - Connection engine to SQL database
+
+    Optional inputs:
+    - echo - Boolean indicating function verbosity
+    - conn - Connection to migrate in (the caller's transaction), otherwise a transaction of the engine is committed
+
+    Output:
+    - Dictionary of the number of 'manifestRows' and 'marketRows' migrated (0 for the tables already migrated or missing)
+
+    Note:
+    - The foreign keys of the metaTable and syncLedger reference the (TickerID, Interval, Month) of the long manifestTable, and
+    the marketTable no longer references the manifestTable (its (TickerID, Interval) is not unique in the long form).
+    """
+    if conn is None:
+        with engine.begin() as migrateConn: return SQLMigrate(engine, echo, migrateConn)
+
+    migrated = {'manifestRows': 0, 'marketRows': 0}
+    columnQuery = sqlalchemy.text('''SELECT column_name FROM information_schema.columns
+                                     WHERE table_name = :tableName AND table_schema = 'public';''')
+    manifestColumns = list(conn.execute(columnQuery, {'tableName': 'manifestTable'}).scalars())
+    marketColumns = list(conn.execute(columnQuery, {'tableName': 'marketTable'}).scalars())
+
+    if manifestColumns and 'Month' not in manifestColumns:
+        print('Migrating the wide manifestTable into the long manifestTable...')
+        wideDF = pd.read_sql('SELECT * FROM "manifestTable";', conn)
+        longDF = wideDF.melt(id_vars = ['TickerID', 'Interval'], var_name = 'Month', value_name = 'Value').dropna(subset = ['Value'])
+
+        # Replaced table (its view and the keys referencing it are dropped with it)
+        conn.execute(sqlalchemy.text('DROP TABLE "manifestTable" CASCADE;' + manifestTableQuery + manifestViewQuery))
+        longDF.astype({'Month': str, 'Value': 'int64'}).to_sql('manifestTable', conn, if_exists = 'append', index = False, method = postgres_copy_upsert)
+
+        # Keys referencing the manifestTable (as SQLSetup)
+        keysQuery = SetKeysQuery('manifestTable', 'TickerID', 'foreign', ref = ('tickerTable','TickerID'))
+        keysQuery += SetKeysQuery('manifestTable', 'Month', 'secondary')
+        for tableName, keys in [('syncLedger', ('TickerID','Interval','Month')), ('metaTable', ('TickerID','4. Interval','7. Month'))]:
+            if conn.execute(sqlalchemy.text('SELECT to_regclass(:tableName);'), {'tableName': f'"{tableName}"'}).scalar() is not None:
+                keysQuery += SetKeysQuery(tableName, keys, 'foreign', ref = ('manifestTable',['TickerID','Interval','Month']))
+        conn.execute(sqlalchemy.text(keysQuery))
+        migrated['manifestRows'] = len(longDF)
+        if echo: print(f'Migrated {len(longDF)} manifest rows ({wideDF.shape[1] - 2} months).')
+
+    if marketColumns and 'DateTime' not in marketColumns:
+        print('Adding the stored DateTime to the marketTable...')
+        keysQuery = 'DROP INDEX IF EXISTS "ix_marketTable_DateID-TimeID";'
+        keysQuery += SetKeysQuery('marketTable', ('TickerID','Interval','DateTime'), 'secondary')
+        keysQuery += SetKeysQuery('marketTable', 'DateTime', 'secondary')
+        conn.execute(sqlalchemy.text(marketDateTimeQuery + keysQuery + stockViewQuery))
+        migrated['marketRows'] = conn.execute(sqlalchemy.text('SELECT COUNT(*) FROM "marketTable";')).scalar()
+        if echo: print(f"Migrated {migrated['marketRows']} market rows.")
+
+    if echo and not any(migrated.values()): print('No tables to migrate.')
+    return migrated
+
+# Read the manifest in SQL in the wide form of DataManifest.DF
+def SQLManifest(engine: sqlalchemy.engine, startMonth: str = None, endMonth: str = None, conn: sqlalchemy.engine.Connection = None) -> pd.DataFrame:
+    """
+    Reads the manifest in SQL (the long manifestTable, through the manifestData view) and pivots it into the wide form of
+    DataManifest.DF, indexed by Ticker and Interval with a column per month (in order). The month range is a range query on
+    the month index of the manifestTable.
+
+    Input:
+    - engine - Connection engine to SQL database
+
+    Optional inputs:
+    - startMonth - String of the first month ('YYYY-MM') read, None for no limit
+    - endMonth - String of the last month ('YYYY-MM') read, None for no limit
+    - conn - Connection to read with (i.e. within a transaction), otherwise the engine is used
+    """
+    manifestQuery = sqlalchemy.text('''SELECT "Ticker", "Interval", "Month", "Value" FROM "manifestData"
+                                       WHERE "Month" BETWEEN :startMonth AND :endMonth
+                                       ORDER BY "Ticker", "Interval", "Month";''')
+    longDF = pd.read_sql(manifestQuery, conn if conn is not None else engine,
+                         params = {'startMonth': startMonth or '0000-00', 'endMonth': endMonth or '9999-99'})
+    return _wideManifest(longDF)
+
+# Pivots the long manifest rows (Ticker, Interval, Month, Value) into the wide form of DataManifest.DF
+def _wideManifest(longDF: pd.DataFrame) -> pd.DataFrame:
+    wideDF = longDF.pivot(index = ['Ticker', 'Interval'], columns = 'Month', values = 'Value')
+    if longDF.empty: # No rows (keep the index/column names of DataManifest.DF)
+        wideDF = pd.DataFrame(index = pd.MultiIndex(levels = [[],[]], codes = [[],[]], names = ['Ticker','Interval']), columns = pd.Index(data = [], name = 'Month'))
+    elif not wideDF.isna().any().any():
+        wideDF = wideDF.astype('int64')
+    return wideDF
 
 # Saves data into SQL in upsert. (Of Manifest data or Market data)
-def SQLSave(saveDF: pd.DataFrame, engine: sqlalchemy.engine, saveTable: str, ignore_index = True, echo = False):
+def SQLSave(saveDF: pd.DataFrame, engine: sqlalchemy.engine, saveTable: str, ignore_index = True, loadMethod = 'copy', conn: sqlalchemy.engine.Connection = None, echo = False):
     """
     Saves provided dataset into an SQL table (in an upsert - update-insert - format)
     Inputs:
@@ -369,11 +451,18 @@ def SQLSave(saveDF: pd.DataFrame, engine: sqlalchemy.engine, saveTable: str, ign
 
     Optional inputs:
     - ignore_index - Bool indicating to ignore the index of the inputted dataframe
+    - loadMethod - String of the upsert method, 'copy' (default) streams the rows with COPY into a temporary staging table then
+    merges them with a single INSERT ... SELECT ... ON CONFLICT DO UPDATE (see postgres_copy_upsert), 'insert' upserts the rows
+    with an INSERT ... VALUES ... ON CONFLICT DO UPDATE statement (see postgres_upsert)
+    - conn - Connection to save with (i.e. to save many datasets in a single transaction), the save is not committed (the
+    transaction of the connection is left to its owner). Otherwise the save (TickerIDs, partitions and rows) is made through one
+    connection of the engine, in one transaction (committed).
     - echo - output some information during execution
 
     Converts Ticker column into TickerID and breaks down DateTime into DateID and TimeID (with YY-mm-dd HH:MM:SS format) before
-    inserting into SQL tables. Also updates tickerTable in SQL if new ticker is detected, and adds new columns to manifestTable
-    if new columns detected. (Can potentially be used to add user-defined tables, not tested though.)
+    inserting into SQL tables. Also updates tickerTable in SQL if new ticker is detected, and saves manifest data (the wide
+    DataManifest.DF) as rows of the long manifestTable, so new months are new rows (no columns or views are changed). (Can
+    potentially be used to add user-defined tables, not tested though.)
     Note:
     - The DataFrame must be transformed (if needed) before being applied here, this function only modifies the input for ID based
     columns (Ticker/Symbol and DateTime columns)
@@ -400,6 +489,16 @@ def SQLSave(saveDF: pd.DataFrame, engine: sqlalchemy.engine, saveTable: str, ign
     elif "meta" in saveTable.lower():
         saveTable = "metaTable"
 
+    if conn is None: # One connection (and transaction) for the whole save
+        try:
+            with engine.begin() as saveConn: SQLSave(saveDF, engine, saveTable, ignore_index, loadMethod, saveConn, echo)
+        except Exception:
+            tickerCache.invalidate(engine) # TickerIDs inserted in the rolled back transaction
+            _marketPartitions.pop(_engineSource(engine), None) # Partitions created in the rolled back transaction
+            raise
+        if saveTable in ('marketTable', 'metaTable'): unitCache.invalidate(engine) # Units loaded before the commit are outdated
+        return
+
     # Convert index into cols (as we will use index = False, and need to access index values)
     saveDF = saveDF.reset_index()
     if ignore_index: saveDF.drop(columns = 'index', axis = 1, inplace = True, errors = 'ignore') # Delete the basic index if it exists (if desired)
@@ -411,93 +510,48 @@ def SQLSave(saveDF: pd.DataFrame, engine: sqlalchemy.engine, saveTable: str, ign
     # Break down certain columns (if they exist) to be used with relational tables in SQL (tickerTable, dateTable, timeTable etc.)
     # Ticker column
     if 'Ticker' in saveDF.columns:
-        # Get tickerTable from SQL, we will convert Ticker/Symbol into TickerID
-        tickerTable = pd.read_sql('SELECT "TickerID", "Ticker" FROM "tickerTable";', con = engine)
-
-        # First check if any tickers not in tickerTable (if so add into SQL table, then re-read)
-        newTicks = [tick for tick in list(saveDF.Ticker.unique()) if tick not in list(tickerTable['Ticker'])]
-        if len(newTicks) > 0:
-            addTicks = pd.DataFrame(columns = ['Ticker'], data = newTicks)
-            addTicks.to_sql('tickerTable', engine, if_exists='append', index=False, method = postgres_upsert, chunksize = 1000) # Add new tickers to SQL
-
-            tickerTable = pd.read_sql('SELECT "TickerID", "Ticker" FROM "tickerTable";', con = engine) # Re-read updated table
-
-        # Merge tickerID to data frame
-        saveDF = saveDF.merge(tickerTable, on = 'Ticker', how = 'left') # Note that the order doesn't technically matter as SQL matches based on column names
+        # Convert Ticker/Symbol into TickerID (from the ticker cache, new tickers are added into the tickerTable in SQL)
+        tickerIDs = tickerCache.resolve(engine, saveDF.Ticker.unique(), conn = conn)
+        saveDF['TickerID'] = saveDF.Ticker.astype(str).map(tickerIDs).astype('int64')
 
         # Drop Ticker/Symbol col after acquiring TickerID
         saveDF.drop(columns = 'Ticker', axis = 1, inplace = True)
 
     # DateTime column
     if 'DateTime' in saveDF.columns:
-        # Break DateTime into Date and Time, then reconstruct DateID and TimeIDs
-        saveDF['DateID'] = pd.to_datetime(saveDF.DateTime, format = '%Y-%m-%d %H:%M:%S').dt.date.astype(str).replace('-','', regex=True)
-        saveDF['TimeID'] = pd.to_datetime(saveDF.DateTime, format = '%Y-%m-%d %H:%M:%S').dt.time.astype(str).replace(':','', regex=True)        
+        # Break DateTime into DateID and TimeID
+        saveDF['DateID'], saveDF['TimeID'] = DateTimeIDs(saveDF.DateTime)
         saveDF.drop(columns = 'DateTime', axis = 1, inplace = True)
 
-    # Using a different method to save manifest table (as columns are actively added to SQL table)
+    # Partitions of the units saved (if the marketTable is partitioned), created before the rows are saved
+    if saveTable == 'marketTable':
+        partUnits = saveDF[['TickerID', 'Interval']].assign(MonthID = saveDF.DateID // 100).drop_duplicates()
+        partUnits = [(tickerID, interval, f"{monthID // 100:04d}-{monthID % 100:02d}") for tickerID, interval, monthID in partUnits.itertuples(index = False)]
+        _createPartitions(engine, conn, partUnits)
+
+    # Using a different method to save manifest table (from the wide DataManifest.DF, a column per month, to long rows)
     if saveTable == 'compressedManifestTable':
         print('To add compressed manifest functionality')
         pass # TODO: ADD IN CODE TO SAVE COMPRESSED MANIFEST (SIMILAR TO STANDARD MANIFEST)
         
     elif saveTable == 'manifestTable':
-        # Read existing manifest in SQL
-        manifestSQL = pd.read_sql(f'SELECT * FROM "{saveTable}"', engine)
-        excludeCol = list(manifestSQL.columns.values) # Get existing columns in last manifest
-        
-        # Drop already existing columns from manifest to-be-inserted (to get only new columns that will be inserted)
-        newColsDF = saveDF.drop(columns=excludeCol, inplace = False)
-        # Extract columns that did not exist in previous manifest (to add to SQL manually)
-        newCol = list(newColsDF.columns.values)
-
-        # Create new columns if needed
-        queryAddCol = f'''ALTER TABLE "{saveTable}"'''
-        for i in range(len(newCol)):
-            col = newCol[i]
-            queryAddCol += f'''
-                ADD COLUMN "{col}" SMALLINT'''
-            if i < len(newCol)-1:
-                queryAddCol += ','
-            else:
-                queryAddCol += ';'
-                
-        if echo:
-            print('Adding new columns to manifestTable')
-            print(queryAddCol)
-        
-        if not len(newCol) == 0: # If new columns to add
-            ExecuteSQL(queryAddCol, engine)
-
-        # Whenever saving manifest, update the view after to reflect the new cols (not necessary but good practice,
-        # as we update when loading too)
-        updateViewQuery = """
-        DO $$
-        DECLARE
-            col_list text;
-        BEGIN
-            SELECT string_agg('m."' || column_name || '"', ', ' ORDER BY ordinal_position)
-            INTO col_list
-            FROM information_schema.columns
-            WHERE table_name = 'manifestTable'
-              AND column_name NOT IN ('TickerID')
-              AND table_schema = 'public';
-        
-            EXECUTE format('
-                CREATE OR REPLACE VIEW "manifestData" AS
-                SELECT t."Ticker", %s
-                FROM "manifestTable" m
-                JOIN "tickerTable" t ON m."TickerID" = t."TickerID";
-            ', col_list);
-        END $$;
-        """
-        ExecuteSQL(updateViewQuery, engine)
+        # A row per ticker/interval/month with its value (cells without value are not saved)
+        monthCols = [col for col in saveDF.columns if col not in ('TickerID', 'Interval')]
+        saveDF = saveDF.melt(id_vars = ['TickerID', 'Interval'], value_vars = monthCols, var_name = 'Month', value_name = 'Value').dropna(subset = ['Value'])
+        saveDF = saveDF.astype({'Month': str, 'Value': 'int64'})
     
     if echo: print(f'Upserting data into table "{saveTable}" in SQL...')
-    saveDF.to_sql(saveTable, engine, if_exists='append', index = False, method = postgres_upsert, chunksize = 1000000) # Can optimise chunksize if needed
+    if loadMethod == 'copy':
+        saveDF.to_sql(saveTable, conn, if_exists='append', index = False, method = postgres_copy_upsert) # Streamed in batches by the method
+    elif loadMethod == 'insert':
+        saveDF.to_sql(saveTable, conn, if_exists='append', index = False, method = postgres_upsert, chunksize = 1000000) # Can optimise chunksize if needed
+    else: raise ValueError("The loadMethod must be either 'copy' or 'insert'.")
+    if saveTable in ('marketTable', 'metaTable'): unitCache.invalidate(engine) # Units cached from this database are outdated
     return
 
 # Sync SQL data by saving from direct storage to SQL form
-def SQLSync(dataManifest: DataManifest, fastSync = False, echo = False):
+def SQLSync(dataManifest: DataManifest, fastSync = False, echo = False, batchSize: int = 50, workers: int = None, incremental = True,
+            deferKeys = False) -> dict:
     """
     Syncs all data in storage indicated by dataManifest directory with SQL database (in upsert mode).
     The data is transferred from .csv to SQL (not the other way around).
@@ -507,13 +561,50 @@ def SQLSync(dataManifest: DataManifest, fastSync = False, echo = False):
 
     Optional inputs:
     - fastSync - Boolean indicating if fast syncing is to be used
-    - echo - Echo output/actions from function
+    - echo - Echo output/actions from function (and the progress of each batch)
+    - batchSize - Integer number of unit files (ticker, interval, month) saved together, in one staging load and merge of the
+    market data (and of the meta data)
+    - workers - Integer number of worker processes syncing the batches in parallel (each reading, formatting and saving its
+    batches through its own connection), None (or 1) syncs the batches in this process
+    - incremental - Boolean indicating to sync only the units not synced yet, or whose files changed since synced (as recorded
+    in the syncLedger table), and to remove the units synced before but no longer in the manifest. Otherwise all units are synced.
+    - deferKeys - Boolean indicating to bulk load with the secondary indexes and foreign keys of the marketTable and metaTable
+    dropped, then rebuilt once after the load (for large loads, as a full sync or a first sync)
+
+    Output:
+    - Dictionary of the sync statistics: the number of 'units', market 'rows' and 'metaRows' synced, the number of 'batches',
+    the units 'skipped' (unchanged) and 'removed', the 'seconds' taken (including the rebuild of deferred keys), the market
+    'rowsPerSec', the 'keySeconds' taken to rebuild the deferred keys and the 'keyErrors' of the deferred keys not rebuilt
+    ('table: name: error')
 
     Note:
     - fastSync uses fastValidate on validating manifest, and saves the .csv data (in relational form) to the
     SQL database. Not using fastSync conducts a full validation, and also deletes data from SQL before saving
     (to avoid potential clashes and errors).
+    - The manifest and all batches are saved through a single connection, in a single transaction (committed at the end, so
+    a failed sync leaves the database as it was, apart from the clearing of a full sync).
+    - With workers, this process (the coordinator) saves the manifest first (which adds any new tickers to the tickerTable), so
+    the workers only read the tickerTable. Each batch is then saved (and committed) in its own transaction by a worker, so a
+    failed sync keeps the batches already saved (sync again to complete it).
+    - The rows of a batch are upserted in unit order, so a row in more than one unit is saved from the last one (as when the
+    units were saved one by one).
+    - The syncLedger table records each unit synced with the size, modification time and hash of its files (.csv and meta
+    data) and its number of rows. A unit is unchanged if its files have the same size and modification time, or else the same
+    hash. The rows of a changed (or removed) unit are deleted before it is synced again, so rows removed from its file are also
+    removed from SQL. A full sync (fastSync False) clears the ledger with the data, so syncs every unit.
+    - Each unit is read in the file format it is stored in (see DataManifest.unitFormat). For a unit stored in a binary series
+    (see BinaryManager), its files are the series (size and modification time) and its meta data file, and its hash is of its
+    month of rows, so saving another month into the series only rehashes the unit.
+    - With deferKeys, the primary keys are kept (the upserts need them), the secondary indexes are rebuilt concurrently (one
+    connection each, up to workers, each build also using the parallel maintenance workers of the server), the foreign keys are
+    validated once (added NOT VALID then validated, or checked as added on a partitioned table) and the tables are analyzed. The
+    keys are rebuilt even if the sync fails. Other sessions reading the tables meanwhile are not served by the dropped indexes.
+    - The deferred keys are recorded in the deferredKeys table (in the transaction dropping them), and each key is rebuilt in its
+    own transaction (removing its record). A key that cannot be rebuilt (i.e. a foreign key the loaded rows do not satisfy) is
+    reported in 'keyErrors' (or attached as a note to the error of a failed sync, which is raised) and stays recorded, so
+    SQLRepair rebuilds it (also after a crash during the sync).
     """
+    import time
     print('Syncing SQL with all existing data in storage...')
     
     if echo: print('Verifying existence of files indicated to exist in DataManifest')
@@ -524,69 +615,676 @@ def SQLSync(dataManifest: DataManifest, fastSync = False, echo = False):
         if echo: print('Clearing all data before reload')
         SQLClear(dataManifest.SQLengine, echo)
 
-    if echo: print('Syncing data manifest into SQL database')
-    # No need to preprocess DataManifest before saving to SQL
-    SQLSave(dataManifest.DF, dataManifest.SQLengine, 'manifestTable', echo = echo)
-    
-    if echo: print('Loading each market and meta data file into SQL database')
-    # Sync market table based on dataManifest showing if data exists or not
-    # Unique values of ticker
-    tickerComponents = list(dataManifest.DF.index.get_level_values(0).unique().values)
-    # We get these now since it doesn't change across tickers or intervals
-    monthComponents = list(dataManifest.DF.columns.values)
-
-    for ticker in tickerComponents:
-        tickerSection = dataManifest.DF[(dataManifest.DF.index.get_level_values('Ticker') == ticker)]
-        # Will try for each interval list in each ticker set (to avoid having to catch errors)
-        intervalComponents = list(tickerSection.index.get_level_values(1).unique().values) 
-
-        for interval in intervalComponents:
-            for month in monthComponents:
-                # Key:
-                # 0 - No file exists
-                # 1 - File exists
-                # 2 - File exists but incomplete (as file covers current time or not updated after month ended)
-
-                datapointValue = dataManifest.DF.loc[((ticker,interval),month)]
-                # If file exists, save into SQL
-                if datapointValue == 1 or datapointValue == 2:
-                    # Load actual and meta data files
-                    fileRead, metaFileRead = dataManifest.loadData_fromcsv(ticker, interval, month, meta = True, echo = echo)
-
-                    # Add ticker/interval to fileRead before saving to SQL
-                    fileRead = DFtoSQLFormat(fileRead, 'market', dataContext=(ticker,interval))
-                    SQLSave(fileRead, dataManifest.SQLengine, 'marketTable', echo = echo)
-
-                    # Add month to metaFileRead before saving to SQL
-                    metaFileRead = DFtoSQLFormat(metaFileRead, 'meta', dataContext=month)
-                    SQLSave(metaFileRead, dataManifest.SQLengine, 'metaTable', echo = echo)
-    return
+    # Units in storage (key: 0 - No file exists, 1 - File exists, 2 - File exists but incomplete)
+    storedUnits = dataManifest.listUnits()
+    stats = {'units': 0, 'rows': 0, 'metaRows': 0, 'batches': 0, 'skipped': 0, 'removed': 0, 'seconds': 0.0, 'rowsPerSec': 0.0, 'keySeconds': 0.0,
+             'keyErrors': []}
+
+    # Units to sync, with the version of their files (units unchanged since synced are skipped, only updating their ledger
+    # version if their files were touched), and units synced before to delete (changed, or no longer in storage)
+    ExecuteSQL(ledgerTableQuery, dataManifest.SQLengine) # Databases established before the ledger
+    ledger = _readLedger(dataManifest.SQLengine) if incremental else {}
+    units, versions, touched, deleteUnits = [], {}, {}, []
+    for unit in storedUnits:
+        fileFormat = dataManifest.unitFormat(*unit)
+        size, mtime = _unitStat(dataManifest.directory, *unit, fileFormat)
+        synced = ledger.get(unit)
+        if synced is not None and (synced['Size'], synced['MTime']) == (size, mtime):
+            stats['skipped'] += 1
+            continue
+        version = {'Size': size, 'MTime': mtime, 'Hash': _unitHash(dataManifest.directory, *unit, fileFormat)}
+        if synced is not None and synced['Hash'] == version['Hash']:
+            touched[unit] = {**version, 'Rows': synced['Rows']}
+            stats['skipped'] += 1
+            continue
+        units.append(unit)
+        versions[unit] = version
+        if synced is not None: deleteUnits.append(unit)
+    storedSet = set(storedUnits)
+    removedUnits = [unit for unit in ledger if unit not in storedSet]
+    deleteUnits += removedUnits
+    stats['removed'] = len(removedUnits)
+    if echo: print(f"Units to sync: {len(units)} ({len(deleteUnits) - len(removedUnits)} changed), unchanged: {stats['skipped']}, removed: {len(removedUnits)}")
+
+    batches = [units[i:i + max(1, batchSize)] for i in range(0, len(units), max(1, batchSize))]
+
+    startTime = time.perf_counter()
+    deferredKeys = _deferKeys(dataManifest.SQLengine, deferTables, echo) if deferKeys else None
+    def progress(unitCount: int, rowCount: int, metaCount: int): # Adds a batch synced to the stats
+        stats['units'] += unitCount
+        stats['rows'] += rowCount
+        stats['metaRows'] += metaCount
+        stats['batches'] += 1
+        elapsed = time.perf_counter() - startTime
+        if echo: print(f"Synced batch {stats['batches']}/{len(batches)}: {stats['units']}/{len(units)} units, "
+                       f"{stats['rows']} rows ({stats['rows'] / max(elapsed, 1e-9):.0f} rows/s)")
+
+    try:
+        if workers is None or workers <= 1 or len(batches) <= 1:
+            with dataManifest.SQLengine.begin() as conn:
+                if echo: print('Syncing data manifest into SQL database')
+                # No need to preprocess DataManifest before saving to SQL
+                SQLSave(dataManifest.DF, dataManifest.SQLengine, 'manifestTable', conn = conn, echo = echo)
+                _updateLedger(dataManifest.SQLengine, conn, touched, deleteUnits)
+
+                if echo: print(f'Loading {len(units)} market and meta data files into SQL database, in {len(batches)} batches')
+                for batch in batches:
+                    progress(*_saveBatch(dataManifest, dataManifest.SQLengine, conn, batch, versions))
+        else:
+            from concurrent.futures import ProcessPoolExecutor, as_completed
+            import copy
+            # Coordinator: manifest (and new tickers) saved before the workers start
+            if echo: print('Syncing data manifest into SQL database')
+            with dataManifest.SQLengine.begin() as conn:
+                SQLSave(dataManifest.DF, dataManifest.SQLengine, 'manifestTable', conn = conn, echo = echo)
+                _updateLedger(dataManifest.SQLengine, conn, touched, deleteUnits)
+                # Partitions of all units (so workers do not create the same partition concurrently)
+                tickerIDs = tickerCache.resolve(dataManifest.SQLengine, [unit[0] for unit in units], conn = conn)
+                _createPartitions(dataManifest.SQLengine, conn, [(tickerIDs[ticker], interval, month) for ticker, interval, month in units])
+
+            # Send a detached copy, the connection engine cannot be sent to other processes (each worker connects itself)
+            syncManifest = copy.copy(dataManifest)
+            syncManifest.SQLengine = None
+            syncManifest.storage = None
+            syncManifest._manifestCache = None
+            dataManifest.SQLengine.dispose() # Connections of this process are not shared with the workers
+
+            if echo: print(f'Loading {len(units)} market and meta data files into SQL database, in {len(batches)} batches with {workers} workers')
+            with ProcessPoolExecutor(max_workers = min(workers, len(batches))) as pool:
+                futures = [pool.submit(_syncBatch, syncManifest, dataManifest.SQLengine.url, batch, {unit: versions[unit] for unit in batch})
+                           for batch in batches]
+                for future in as_completed(futures):
+                    progress(*future.result())
+    except Exception as syncError:
+        tickerCache.invalidate(dataManifest.SQLengine) # TickerIDs inserted in the rolled back transaction
+        _marketPartitions.pop(_engineSource(dataManifest.SQLengine), None) # Partitions created in the rolled back transaction
+        if deferredKeys is not None: # Keys rebuilt, their errors attached to the error of the sync (raised)
+            try:
+                for keyError in _restoreKeys(dataManifest.SQLengine, deferredKeys, 4 if workers is None else max(1, workers), echo):
+                    syncError.add_note(f'Deferred key not rebuilt (recorded in deferredKeys, see SQLRepair): {keyError}')
+            except Exception as restoreError: # i.e. the database is unreachable, the keys stay recorded
+                syncError.add_note(f'Deferred keys not rebuilt (recorded in deferredKeys, see SQLRepair): {restoreError}')
+            deferredKeys = None
+        raise
+    finally:
+        unitCache.invalidate(dataManifest.SQLengine) # Units loaded before the transaction ended are outdated
+        if deferredKeys is not None: # Keys rebuilt after the sync
+            keyStart = time.perf_counter()
+            stats['keyErrors'] = _restoreKeys(dataManifest.SQLengine, deferredKeys, 4 if workers is None else max(1, workers), echo)
+            stats['keySeconds'] = time.perf_counter() - keyStart
+            if stats['keyErrors']: print(f"⚠️ {len(stats['keyErrors'])} deferred keys not rebuilt (recorded in deferredKeys, see SQLRepair): {'; '.join(stats['keyErrors'])}")
+
+    stats['seconds'] = time.perf_counter() - startTime
+    stats['rowsPerSec'] = stats['rows'] / max(stats['seconds'], 1e-9)
+    print(f"Synced {stats['units']} units ({stats['rows']} rows) in {stats['seconds']:.2f} s, {stats['rowsPerSec']:.0f} rows/s.")
+    return stats
+
+# Market and meta data of a batch of units, in SQL acceptable format (rows repeated across units saved from the last unit,
+# as one upsert can only update a row once), with the number of rows of each unit
+def _syncFrames(dataManifest: DataManifest, batch: list[tuple[str, int, str]]) -> tuple[pd.DataFrame, pd.DataFrame, list[int]]:
+    marketParts, metaParts = [], []
+    for ticker, interval, month in batch:
+        # Load actual and meta data files (in the format the unit is stored in, each read once so not kept in the unitCache)
+        fileRead, metaFileRead = dataManifest.loadData_fromfile(ticker, interval, month, meta = True, echo = False, cache = False)
+        # Add ticker/interval to fileRead, and month to metaFileRead before saving to SQL
+        marketParts.append(DFtoSQLFormat(fileRead, 'market', dataContext = (ticker, interval)))
+        metaParts.append(DFtoSQLFormat(metaFileRead, 'meta', dataContext = month))
+
+    marketBatch = pd.concat(marketParts, ignore_index = True).drop_duplicates(['Ticker', 'Interval', 'DateTime'], keep = 'last')
+    metaBatch = pd.concat(metaParts, ignore_index = True).drop_duplicates(['2. Symbol', '4. Interval', '7. Month'], keep = 'last')
+    return marketBatch, metaBatch, [len(part) for part in marketParts]
+
+# Saves a batch of units (market and meta data, and their ledger rows) within a connection, returning the number of units,
+# market rows and meta rows saved
+def _saveBatch(dataManifest: DataManifest, engine: sqlalchemy.engine, conn: sqlalchemy.engine.Connection, batch: list[tuple[str, int, str]],
+               versions: dict) -> tuple[int, int, int]:
+    marketBatch, metaBatch, unitRows = _syncFrames(dataManifest, batch)
+    SQLSave(marketBatch, engine, 'marketTable', conn = conn)
+    SQLSave(metaBatch, engine, 'metaTable', conn = conn)
+    SQLSave(_ledgerFrame({unit: {**versions[unit], 'Rows': rows} for unit, rows in zip(batch, unitRows)}), engine, 'syncLedger', conn = conn)
+    return len(batch), len(marketBatch), len(metaBatch)
+
+# Connection engines of a worker process (by database URL), a single pooled connection each
+_syncEngines = {}
+
+# Syncs a batch of units in a worker process (in its own transaction), returning the number of units, market rows and meta rows
+def _syncBatch(dataManifest: DataManifest, url: sqlalchemy.engine.URL, batch: list[tuple[str, int, str]], versions: dict) -> tuple[int, int, int]:
+    engine = _syncEngines.get(url)
+    if engine is None:
+        engine = _syncEngines[url] = sqlalchemy.create_engine(url, pool_size = 1, max_overflow = 0)
+
+    with engine.begin() as conn:
+        return _saveBatch(dataManifest, engine, conn, batch, versions)
+
+# Tables loaded by SQLSync whose keys can be deferred (the primary keys are kept, as the upserts need them)
+deferTables = ('marketTable', 'metaTable')
+
+# Keys dropped by _deferKeys and not rebuilt yet (by _restoreKeys), with their definitions as read from the catalog
+deferredTableQuery = '''
+                    CREATE TABLE IF NOT EXISTS "deferredKeys" (
+                        "Kind" VARCHAR(7) NOT NULL,
+                        "TableName" TEXT NOT NULL,
+                        "KeyName" TEXT NOT NULL,
+                        "Definition" TEXT NOT NULL,
+                        "Partitioned" BOOLEAN NOT NULL,
+                        "DeferredAt" TIMESTAMP DEFAULT now(),
+                        CONSTRAINT "deferredKeys_pkey" PRIMARY KEY ("TableName", "KeyName")
+                    );
+                    '''
+
+# Drops the secondary indexes (not backing a constraint) and the foreign keys of the tables, returning their definitions (as
+# read from the catalog) to restore them after a bulk load. The definitions are recorded in the deferredKeys table (in the
+# transaction of the drops) until restored
+def _deferKeys(engine: sqlalchemy.engine, tables: Iterable[str], echo = False) -> dict:
+    keysQuery = '''
+        SELECT 'index', c.oid::regclass::TEXT, i.indexrelid::regclass::TEXT, pg_get_indexdef(i.indexrelid), c.relkind = 'p'
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indrelid
+        WHERE c.oid IN (SELECT to_regclass(quote_ident(t)) FROM unnest(CAST(:tables AS TEXT[])) AS t)
+          AND NOT i.indisprimary AND NOT i.indisunique AND NOT EXISTS (SELECT 1 FROM pg_constraint k WHERE k.conindid = i.indexrelid)
+        UNION ALL
+        SELECT 'foreign', c.oid::regclass::TEXT, quote_ident(k.conname), pg_get_constraintdef(k.oid), c.relkind = 'p'
+        FROM pg_constraint k
+        JOIN pg_class c ON c.oid = k.conrelid
+        WHERE c.oid IN (SELECT to_regclass(quote_ident(t)) FROM unnest(CAST(:tables AS TEXT[])) AS t)
+          AND k.contype = 'f' AND k.conparentid = 0;'''
+    keys = {'index': [], 'foreign': []}
+    with engine.begin() as conn:
+        for kind, table, name, definition, partitioned in conn.execute(sqlalchemy.text(keysQuery), {'tables': list(tables)}):
+            keys[kind].append((table, name, definition, partitioned))
+        conn.execute(sqlalchemy.text(deferredTableQuery))
+        recordQuery = sqlalchemy.text('''INSERT INTO "deferredKeys" ("Kind", "TableName", "KeyName", "Definition", "Partitioned")
+                                         VALUES (:kind, :table, :name, :definition, :partitioned)
+                                         ON CONFLICT ("TableName", "KeyName") DO UPDATE SET "Definition" = EXCLUDED."Definition";''')
+        for kind in ('index', 'foreign'):
+            for table, name, definition, partitioned in keys[kind]:
+                conn.execute(recordQuery, {'kind': kind, 'table': table, 'name': name, 'definition': definition, 'partitioned': partitioned})
+        for table, name, definition, partitioned in keys['foreign']:
+            conn.execute(sqlalchemy.text(f'ALTER TABLE {table} DROP CONSTRAINT {name};'))
+        for table, name, definition, partitioned in keys['index']:
+            conn.execute(sqlalchemy.text(f'DROP INDEX {name};'))
+    if echo: print(f"Deferred {len(keys['index'])} indexes and {len(keys['foreign'])} foreign keys of {', '.join(tables)}")
+    return keys
+
+# Rebuilds the keys deferred by _deferKeys: the indexes built concurrently (CREATE INDEX only takes a SHARE lock, so builds
+# on the same table do not block each other), then the foreign keys validated once, and the tables analyzed. Each key is
+# rebuilt in its own transaction (removing its record in deferredKeys), returning the errors of the keys not rebuilt
+# ('table: name: error', these stay recorded)
+def _restoreKeys(engine: sqlalchemy.engine, keys: dict, workers: int = 4, echo = False) -> list[str]:
+    from concurrent.futures import ThreadPoolExecutor
+    forgetQuery = sqlalchemy.text('DELETE FROM "deferredKeys" WHERE "TableName" = :table AND "KeyName" = :name;')
+    def restoreKey(kind: str, table: str, name: str, definition: str, partitioned: bool) -> str | None:
+        try:
+            with engine.begin() as conn:
+                if kind == 'index': # A partitioned index is built on all partitions
+                    conn.execute(sqlalchemy.text(definition.replace(' ON ONLY ', ' ON ', 1) + ';'))
+                else: # NOT VALID (no check on add) then validated, as NOT VALID foreign keys are not supported on partitioned tables these are checked on add
+                    conn.execute(sqlalchemy.text(f'ALTER TABLE {table} ADD CONSTRAINT {name} {definition}' + ('' if partitioned else ' NOT VALID') + ';'))
+                    if not partitioned: conn.execute(sqlalchemy.text(f'ALTER TABLE {table} VALIDATE CONSTRAINT {name};'))
+                conn.execute(forgetQuery, {'table': table, 'name': name})
+        except sqlalchemy.exc.DBAPIError as error:
+            return f"{table}: {name}: {str(error.orig).strip().splitlines()[0]}"
+        return None
+
+    errors = []
+    if keys['index']:
+        with ThreadPoolExecutor(max_workers = max(1, min(workers, len(keys['index'])))) as pool:
+            errors += pool.map(lambda key: restoreKey('index', *key), keys['index'])
+    errors += [restoreKey('foreign', *key) for key in keys['foreign']]
+    errors = [error for error in errors if error is not None]
+
+    tables = dict.fromkeys(table for kind in ('index', 'foreign') for table, name, definition, partitioned in keys[kind])
+    if tables:
+        with engine.begin() as conn: conn.execute(sqlalchemy.text(f'ANALYZE {", ".join(tables)};'))
+    if echo: print(f"Rebuilt {len(keys['index']) + len(keys['foreign']) - len(errors)} of {len(keys['index'])} indexes and {len(keys['foreign'])} foreign keys")
+    return errors
+
+# Keys recorded in deferredKeys (dropped by a bulk load and not rebuilt, i.e. after a failed rebuild or a crash), as returned
+# by _deferKeys. The records of keys already in the catalog again are removed
+def _recordedKeys(engine: sqlalchemy.engine) -> dict:
+    keys = {'index': [], 'foreign': []}
+    with engine.begin() as conn:
+        if conn.execute(sqlalchemy.text("""SELECT to_regclass('"deferredKeys"') IS NULL;""")).scalar(): return keys
+        conn.execute(sqlalchemy.text('''
+            DELETE FROM "deferredKeys" d
+            WHERE (d."Kind" = 'index' AND to_regclass(d."KeyName") IS NOT NULL)
+               OR (d."Kind" = 'foreign' AND EXISTS (SELECT 1 FROM pg_constraint k WHERE k.conrelid = to_regclass(d."TableName")
+                                                    AND quote_ident(k.conname) = d."KeyName"));'''))
+        for kind, table, name, definition, partitioned in conn.execute(sqlalchemy.text(
+                'SELECT "Kind", "TableName", "KeyName", "Definition", "Partitioned" FROM "deferredKeys" ORDER BY "DeferredAt";')):
+            keys[kind].append((table, name, definition, partitioned))
+    return keys
+
+# DateTime of the marketTable rows, stored (generated from the DateID and TimeID) so market reads need no date/time joins
+marketDateTimeQuery = '''
+                    ALTER TABLE "marketTable"
+                    ADD COLUMN IF NOT EXISTS "DateTime" TIMESTAMP GENERATED ALWAYS AS (
+                        make_timestamp("DateID" / 10000, "DateID" / 100 % 100, "DateID" % 100,
+                                       "TimeID" / 10000, "TimeID" / 100 % 100, "TimeID" % 100)
+                        ) STORED;
+                    '''
+
+# Market data view (with Ticker instead of TickerID), reading the stored DateTime of the marketTable
+stockViewQuery = """
+        DROP VIEW IF EXISTS "stockData";
+        CREATE OR REPLACE VIEW "stockData" AS
+        SELECT
+            tickt."Ticker", -- from tickerTable
+            mt."Interval",  -- from marketTable
+            mt."DateTime",  -- stored in marketTable (dateTable/timeTable are for calendar queries only)
+        
+            -- Market data
+            mt."Open",
+            mt."High",
+            mt."Low",
+            mt."Close",
+            mt."Volume",
+            mt."Nominal"
+        FROM "marketTable" mt
+        JOIN "tickerTable" tickt ON tickt."TickerID" = mt."TickerID";
+        """
+
+# Manifest view (with Ticker instead of TickerID), in long form as its table (see SQLManifest for the wide form)
+manifestViewQuery = """
+        DROP VIEW IF EXISTS "manifestData";
+        CREATE OR REPLACE VIEW "manifestData" AS
+        SELECT t."Ticker", m."Interval", m."Month", m."Value"
+        FROM "manifestTable" m
+        JOIN "tickerTable" t ON t."TickerID" = m."TickerID";
+        """
+
+# Manifest in long form (a row per ticker/interval/month with its value, 0 - No file exists, 1 - File exists, 2 - File exists
+# but incomplete)
+manifestTableQuery = '''
+                    CREATE TABLE "manifestTable" (
+                        "TickerID" SMALLINT NOT NULL,
+                        "Interval" SMALLINT NOT NULL,
+                        "Month" CHAR(7) NOT NULL,
+                        "Value" SMALLINT NOT NULL,
+                        CONSTRAINT "manifestTable_pkey" PRIMARY KEY ("TickerID", "Interval", "Month")
+                    );
+                    '''
+
+# Ledger of the units synced into SQL (by SQLSync), with the version of their files when synced
+ledgerTableQuery = '''
+                    CREATE TABLE IF NOT EXISTS "syncLedger" (
+                        "TickerID" SMALLINT NOT NULL,
+                        "Interval" SMALLINT NOT NULL,
+                        "Month" CHAR(7) NOT NULL,
+                        "Size" BIGINT,
+                        "MTime" BIGINT,
+                        "Hash" CHAR(40),
+                        "Rows" INT,
+                        "SyncedAt" TIMESTAMP,
+                        CONSTRAINT "syncLedger_pkey" PRIMARY KEY ("TickerID", "Interval", "Month")
+                    );
+                    '''
+
+# Units in the ledger (ticker, interval, month) with their version when synced (Size, MTime, Hash) and Rows
+def _readLedger(engine: sqlalchemy.engine) -> dict:
+    ledgerDF = pd.read_sql('''SELECT t."Ticker", l."Interval", l."Month", l."Size", l."MTime", l."Hash", l."Rows"
+                              FROM "syncLedger" l JOIN "tickerTable" t ON t."TickerID" = l."TickerID";''', engine)
+    return {(tick, int(interv), month): {'Size': size, 'MTime': mtime, 'Hash': fileHash, 'Rows': rows}
+            for tick, interv, month, size, mtime, fileHash, rows in ledgerDF.itertuples(index = False)}
+
+# Ledger rows (to save with SQLSave) of units with their version and rows
+def _ledgerFrame(unitVersions: dict) -> pd.DataFrame:
+    return pd.DataFrame([{'Ticker': tick, 'Interval': interv, 'Month': month, **version, 'SyncedAt': pd.Timestamp.now()}
+                         for (tick, interv, month), version in unitVersions.items()],
+                        columns = ['Ticker', 'Interval', 'Month', 'Size', 'MTime', 'Hash', 'Rows', 'SyncedAt'])
+
+# Updates the ledger version of touched (unchanged) units, and deletes the rows (market, meta and ledger) of the given units
+def _updateLedger(engine: sqlalchemy.engine, conn: sqlalchemy.engine.Connection, touched: dict, deleteUnits: list[tuple[str, int, str]]):
+    if touched:
+        SQLSave(_ledgerFrame(touched), engine, 'syncLedger', conn = conn)
+    if deleteUnits: _clearUnits(engine, conn, deleteUnits)
+
+# Clears the rows of the units (ticker, interval, month) in the marketTable (range deletes, or truncating/dropping the unit
+# partitions), metaTable and syncLedger (and sets them missing in the manifestTable if 'manifest'). Returns the number of
+# market rows cleared and of partitions truncated/dropped
+def _clearUnits(engine: sqlalchemy.engine, conn: sqlalchemy.engine.Connection, units: list[tuple[str, int, str]],
+                dropPartitions = False, manifest = False) -> tuple[int, int]:
+    partitionRows, unitPartitions = 0, []
+    if _partitioning(engine, conn)['keys'] == 3: # Unit partitions truncated/dropped (rather than deleting their rows)
+        # Read only (units of tickers not in the tickerTable have nothing to clear, and are not added to it)
+        tickerQuery = sqlalchemy.text('SELECT "Ticker", "TickerID" FROM "tickerTable" WHERE "Ticker" = ANY(CAST(:tickers AS VARCHAR[]));')
+        tickerIDs = dict(conn.execute(tickerQuery, {'tickers': list({str(unit[0]) for unit in units})}).all())
+        unitPartitions = [_partitionName(3, tickerIDs[ticker], interval, month) for ticker, interval, month in units if ticker in tickerIDs]
+        unitPartitions = [name for name in unitPartitions if name in _partitioning(engine, conn)['partitions']]
+    if unitPartitions:
+        partitionList = ', '.join(f'"{name}"' for name in unitPartitions)
+        countQuery = 'SELECT ' + ' + '.join(f'(SELECT COUNT(*) FROM "{name}")' for name in unitPartitions) + ';'
+        partitionRows = conn.execute(sqlalchemy.text(countQuery)).scalar()
+        if dropPartitions:
+            conn.execute(sqlalchemy.text(f'DROP TABLE {partitionList};'))
+            _partitioning(engine, conn)['partitions'].difference_update(unitPartitions)
+        else: conn.execute(sqlalchemy.text(f'TRUNCATE {partitionList};'))
+
+    manifestQuery = ''', manifest AS (
+                UPDATE "manifestTable" ma SET "Value" = 0 FROM units
+                WHERE ma."TickerID" = units."TickerID" AND ma."Interval" = units."Interval" AND ma."Month" = units."Month"
+            )''' if manifest else ''
+    deleteQuery = sqlalchemy.text(f'''
+            WITH units AS (
+                SELECT t."TickerID", u."Interval", u."Month", replace(u."Month", '-', '')::INT * 100 AS "MonthID"
+                FROM unnest(CAST(:tickers AS VARCHAR[]), CAST(:intervals AS INT[]), CAST(:months AS VARCHAR[])) AS u("Ticker", "Interval", "Month")
+                JOIN "tickerTable" t ON t."Ticker" = u."Ticker"
+            ), market AS (
+                DELETE FROM "marketTable" mt USING units
+                WHERE mt."TickerID" = units."TickerID" AND mt."Interval" = units."Interval"
+                  AND mt."DateID" BETWEEN units."MonthID" AND units."MonthID" + 99
+                RETURNING 1
+            ), meta AS (
+                DELETE FROM "metaTable" me USING units
+                WHERE me."TickerID" = units."TickerID" AND me."4. Interval" = units."Interval" AND me."7. Month" = units."Month"
+            ), ledger AS (
+                DELETE FROM "syncLedger" l USING units
+                WHERE l."TickerID" = units."TickerID" AND l."Interval" = units."Interval" AND l."Month" = units."Month"
+            ){manifestQuery}
+            SELECT COUNT(*) FROM market;''')
+    marketRows = conn.execute(deleteQuery, {'tickers': [str(unit[0]) for unit in units], 'intervals': [int(unit[1]) for unit in units],
+                                            'months': [str(unit[2]) for unit in units]}).scalar()
+    return partitionRows + marketRows, len(unitPartitions)
+
+# Partitioning of the marketTable per database: the number of partition 'keys' (0 if not partitioned, 1 by month, 3 by unit)
+# and the names of the 'partitions' created (read once, then kept as partitions are created)
+_marketPartitions = {}
+
+def _partitioning(engine: sqlalchemy.engine, conn: sqlalchemy.engine.Connection) -> dict:
+    source = _engineSource(engine)
+    if source not in _marketPartitions:
+        partitionQuery = '''SELECT p.partnatts, array_remove(array_agg(c.relname::TEXT), NULL)
+                              FROM pg_partitioned_table p
+                              LEFT JOIN pg_inherits i ON i.inhparent = p.partrelid
+                              LEFT JOIN pg_class c ON c.oid = i.inhrelid
+                              WHERE p.partrelid = to_regclass('"marketTable"')
+                              GROUP BY p.partnatts;'''
+        row = conn.execute(sqlalchemy.text(partitionQuery)).first()
+        _marketPartitions[source] = {'keys': row[0], 'partitions': set(row[1])} if row else {'keys': 0, 'partitions': set()}
+    return _marketPartitions[source]
+
+# Name of the marketTable partition of a month (1 key), or of a unit (3 keys)
+def _partitionName(keys: int, tickerID: int, interval: int, month: str) -> str:
+    return f"marketTable_{month}" if keys == 1 else f"marketTable_{tickerID}_{interval}_{month}"
+
+# Creates the marketTable partitions of the units (TickerID, Interval, month) not created yet (if partitioned)
+def _createPartitions(engine: sqlalchemy.engine, conn: sqlalchemy.engine.Connection, units: Iterable[tuple[int, int, str]]):
+    partitioning = _partitioning(engine, conn)
+    if not partitioning['keys']: return
+
+    createQuery, created = '', set()
+    for tickerID, interval, month in units:
+        name = _partitionName(partitioning['keys'], tickerID, interval, month)
+        if name in partitioning['partitions'] or name in created: continue
+        # DateID range of the month [YYYYMM00, next YYYYMM00)
+        lower, upper = [int(period.strftime("%Y%m")) * 100 for period in (pd.Period(month, 'M'), pd.Period(month, 'M') + 1)]
+        bounds = f"({lower}) TO ({upper})" if partitioning['keys'] == 1 else f"({int(tickerID)}, {int(interval)}, {lower}) TO ({int(tickerID)}, {int(interval)}, {upper})"
+        createQuery += f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "marketTable" FOR VALUES FROM {bounds};\n'
+        created.add(name)
+
+    if createQuery:
+        conn.execute(sqlalchemy.text(createQuery))
+        partitioning['partitions'] |= created
+
+# Paths of the files of a unit (market data and meta data), the .csv file or the binary series of the market data
+def _unitFiles(directory: str, ticker: str, interval: int, month: str, fileFormat = 'csv') -> list[str]:
+    metaPath = rf"{directory}{ticker}/{ticker}_{interval}_{month}_meta.csv"
+    if fileFormat == 'binary':
+        from .BinaryManager import _binaryPath
+        return [_binaryPath(directory, ticker, interval), metaPath]
+    return [rf"{directory}{ticker}/{ticker}_{interval}_{month}.csv", metaPath]
+
+# Size (total bytes) and modification time (latest, in ns) of the files of a unit
+def _unitStat(directory: str, ticker: str, interval: int, month: str, fileFormat = 'csv') -> tuple[int, int]:
+    fileStats = [os.stat(path) for path in _unitFiles(directory, ticker, interval, month, fileFormat)]
+    return sum(fileStat.st_size for fileStat in fileStats), max(fileStat.st_mtime_ns for fileStat in fileStats)
+
+# SHA-1 hash of the contents of the files of a unit (of the rows of its month for a binary series)
+def _unitHash(directory: str, ticker: str, interval: int, month: str, fileFormat = 'csv') -> str:
+    unitHash = hashlib.sha1()
+    dataPath, metaPath = _unitFiles(directory, ticker, interval, month, fileFormat)
+    if fileFormat == 'binary':
+        from .BinaryManager import _readSeries
+        index, records = _readSeries(directory, ticker, interval)
+        start, stop = index['months'].get(month, (0, 0))
+        unitHash.update(records[start:stop].tobytes())
+    else:
+        with open(dataPath, 'rb') as unitFile:
+            unitHash.update(unitFile.read())
+    with open(metaPath, 'rb') as unitFile:
+        unitHash.update(unitFile.read())
+    return unitHash.hexdigest()
+
+# Load SQL data into direct storage (reverse of SQLSync)
+def SQLLoad(dataManifest: DataManifest, fileFormat = 'csv', workers: int = 4, skipExisting = True, echo = False) -> dict:
+    """
+    Loads all data in the SQL database (the units in its manifest) into the direct storage of the dataManifest directory,
+    the reverse of SQLSync. The market data of each unit (ticker, interval, month) is streamed out of marketTable with
+    COPY ... TO STDOUT (selecting the unit by its key range, served by the primary key), and written as a .csv file (with its
+    meta data file), or into the binary series of its ticker/interval. The manifest (.json) is updated once at the end.
+
+    Input:
+    - dataManifest - DataManifest with a valid directory (the files are written to) and SQL engine (the data is read from)
+
+    Optional inputs:
+    - fileFormat - String of the format written, 'csv' for the "{ticker}_{interval}_{month}.csv" files or 'binary' for the
+    binary series "{ticker}_{interval}.bin" (see BinaryManager). The meta data is written as "_meta.csv" files for both.
+    - workers - Integer number of threads exporting units concurrently (each through its own connection)
+    - skipExisting - Boolean indicating to skip the units already in storage with the same number of rows as in SQL
+    - echo - Boolean indicating function verbosity
+
+    Output:
+    - Dictionary of the load statistics: the number of 'units' and market 'rows' loaded, the units 'skipped' (already in
+    storage), the 'seconds' taken and the market 'rowsPerSec'
+
+    Note:
+    - The .csv files are written as downloaded (rows in descending time order, without the Nominal column), each to a
+    temporary file then swapped in. A binary series is saved once with all of its months loaded.
+    - The manifest values of the units loaded (or skipped) are set as in the SQL manifest (1, or 2 for incomplete units),
+    with the fileFormat recorded as their format (see DataManifest.unitFormat), other units are left as they are.
+    """
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    if fileFormat not in ('csv', 'binary'): raise ValueError("The fileFormat must be either 'csv' or 'binary'.")
+    if ( not isinstance(dataManifest.directory, str) ) or dataManifest.directory == "":
+        raise TypeError('The data manifest directory pointer must be a string pointing to a valid path/folder.')
+    print('Loading all data in SQL database into storage...')
+    startTime = time.perf_counter()
+
+    # Units in SQL (from its manifest) with their TickerID and number of rows (counted per unit over its key range of the
+    # primary key, only the units of the manifest are read)
+    sqlManifest = DataManifest()
+    sqlManifest.SQLengine = dataManifest.SQLengine
+    sqlManifest.loadManifest('database', echo = False)
+    manifestUnits = sqlManifest.listUnits()
+    countQuery = sqlalchemy.text('''
+            WITH units AS (
+                SELECT t."Ticker", t."TickerID", u."Interval", u."Month", replace(u."Month", '-', '')::INT * 100 AS "MonthID"
+                FROM unnest(CAST(:tickers AS VARCHAR[]), CAST(:intervals AS INT[]), CAST(:months AS VARCHAR[])) AS u("Ticker", "Interval", "Month")
+                JOIN "tickerTable" t ON t."Ticker" = u."Ticker"
+            )
+            SELECT units."Ticker", units."TickerID", units."Interval", units."Month", unitCount."Rows" FROM units
+            CROSS JOIN LATERAL (SELECT COUNT(*) AS "Rows" FROM "marketTable" mt
+                                WHERE mt."TickerID" = units."TickerID" AND mt."Interval" = units."Interval"
+                                  AND mt."DateID" BETWEEN units."MonthID" AND units."MonthID" + 99) unitCount
+            WHERE unitCount."Rows" > 0;''')
+    countDF = pd.read_sql(countQuery, dataManifest.SQLengine, params = {'tickers': [str(unit[0]) for unit in manifestUnits],
+                                                                         'intervals': [int(unit[1]) for unit in manifestUnits],
+                                                                         'months': [str(unit[2]) for unit in manifestUnits]})
+    tickerIDs = dict(zip(countDF.Ticker, countDF.TickerID))
+    unitRows = {(tick, int(interv), month): int(rows) for tick, interv, month, rows in countDF[['Ticker', 'Interval', 'Month', 'Rows']].itertuples(index = False)}
+    metaDF = pd.read_sql('SELECT * FROM "metaData";', dataManifest.SQLengine)
+    metaRows = {(row['2. Symbol'], int(row['4. Interval'].split('m')[0]), row['7. Month']): row for _, row in metaDF.iterrows()}
+
+    # Units to load (in the SQL manifest with market data), skipping those already in storage with the same rows
+    units, skipped = [], []
+    for unit in manifestUnits:
+        if unit not in unitRows: continue
+        if skipExisting and _storedRows(dataManifest.directory, *unit, fileFormat) == unitRows[unit]: skipped.append(unit)
+        else: units.append(unit)
+    if echo: print(f'Units to load: {len(units)}, already in storage: {len(skipped)}')
+
+    # Exports a group of units (a unit for .csv files, the months of a ticker/interval for a binary series)
+    def exportGroup(group: list[tuple[str, int, str]]) -> int:
+        conn = dataManifest.SQLengine.raw_connection()
+        try:
+            cursor = conn.cursor()
+            if fileFormat == 'csv':
+                for ticker, interval, month in group:
+                    csvPath = rf"{dataManifest.directory}{ticker}/{ticker}_{interval}_{month}.csv"
+                    os.makedirs(os.path.dirname(csvPath), exist_ok = True)
+                    with open(f"{csvPath}.{os.getpid()}.tmp", 'w', newline = '') as csvFile:
+                        cursor.copy_expert(_unitCopyQuery(tickerIDs[ticker], interval, month), csvFile)
+                    os.replace(f"{csvPath}.{os.getpid()}.tmp", csvPath)
+            else:
+                from .BinaryManager import SaveBinary
+                buffers = []
+                for ticker, interval, month in group:
+                    buffers.append(io.StringIO())
+                    cursor.copy_expert(_unitCopyQuery(tickerIDs[ticker], interval, month), buffers[-1])
+                    buffers[-1].seek(0)
+                ticker, interval, _ = group[0]
+                SaveBinary(pd.concat([pd.read_csv(buffer) for buffer in buffers], ignore_index = True), dataManifest.directory,
+                           ticker, interval, months = [month for *_, month in group])
+        finally:
+            conn.close()
+
+        for unit in group:
+            _writeMeta(dataManifest.directory, *unit, metaRows.get(unit))
+        rowCount = sum(unitRows[unit] for unit in group)
+        if echo: print(f"Loaded {group[0][0]} ({group[0][1]} min) {', '.join(month for *_, month in group)}: {rowCount} rows")
+        return rowCount
+
+    if fileFormat == 'csv':
+        groups = [[unit] for unit in units]
+    else:
+        seriesUnits = {}
+        for unit in units: seriesUnits.setdefault(unit[:2], []).append(unit)
+        groups = list(seriesUnits.values())
+    with ThreadPoolExecutor(max_workers = max(1, workers)) as pool:
+        rows = sum(pool.map(exportGroup, groups))
+
+    # Manifest updated once (units loaded or already in storage, as in the SQL manifest)
+    for ticker, interval, month in units + skipped:
+        dataManifest.setValue(ticker, interval, month, int(sqlManifest.DF.loc[(ticker, interval), month]), sort = False, fileFormat = fileFormat)
+    dataManifest.saveManifest(echo = echo)
+
+    seconds = time.perf_counter() - startTime
+    stats = {'units': len(units), 'rows': rows, 'skipped': len(skipped), 'seconds': seconds, 'rowsPerSec': rows / seconds if seconds else 0.0}
+    print(f"Loaded {stats['units']} units ({stats['rows']} rows, {stats['rowsPerSec']:.0f} rows/s), skipped {stats['skipped']} units already in storage.")
+    return stats
+
+# COPY query streaming the market data of a unit as a .csv file (as downloaded: descending time, no Nominal column)
+def _unitCopyQuery(tickerID: int, interval: int, month: str) -> str:
+    monthID = int(month.replace('-', '')) * 100
+    return f'''COPY (SELECT to_char("DateTime", 'YYYY-MM-DD HH24:MI:SS') AS "DateTime", "Open", "High", "Low", "Close", "Volume"
+                  FROM "marketTable"
+                  WHERE "TickerID" = {int(tickerID)} AND "Interval" = {int(interval)} AND "DateID" BETWEEN {monthID} AND {monthID + 99}
+                  ORDER BY "DateID" DESC, "TimeID" DESC) TO STDOUT WITH (FORMAT csv, HEADER);'''
+
+# Number of market data rows of a unit in storage (None if the unit or its meta data file is not in storage)
+def _storedRows(directory: str, ticker: str, interval: int, month: str, fileFormat = 'csv') -> int | None:
+    csvPath, metaPath = _unitFiles(directory, ticker, interval, month)
+    if not os.path.exists(metaPath): return None
+    if fileFormat == 'binary':
+        from .BinaryManager import BinaryIndex
+        try: start, stop = BinaryIndex(directory, ticker, interval)['months'].get(month, (0, 0))
+        except FileNotFoundError: return None
+        return stop - start
+    if not os.path.exists(csvPath): return None
+    with open(csvPath, 'rb') as csvFile:
+        return sum(1 for line in csvFile if line.strip()) - 1 # Excluding the header
+
+# Writes the meta data file of a unit (as downloaded) from its metaData row
+def _writeMeta(directory: str, ticker: str, interval: int, month: str, metaRow: pd.Series = None):
+    if metaRow is None:
+        print(f"No meta data in SQL for {ticker} ({interval} min) {month}, meta data file not written.")
+        return
+    metaPath = _unitFiles(directory, ticker, interval, month)[1]
+    metaDF = pd.DataFrame({'Meta Data': [metaRow['1. Information'], metaRow['2. Symbol'], pd.Timestamp(metaRow['3. Last Refreshed']).strftime("%Y-%m-%d %H:%M:%S"),
+                                         metaRow['4. Interval'], metaRow['5. Output Size'], metaRow['6. Time Zone']]},
+                          index = ['1. Information', '2. Symbol', '3. Last Refreshed', '4. Interval', '5. Output Size', '6. Time Zone'])
+    metaDF.to_csv(f"{metaPath}.{os.getpid()}.tmp")
+    os.replace(f"{metaPath}.{os.getpid()}.tmp", metaPath)
 
 # Clear all row data in SQL (excluding precomputed tables like date/time)
-def SQLClear(connEngine: sqlalchemy.engine, echo = False):
+def SQLClear(connEngine: sqlalchemy.engine, echo = False, conn: sqlalchemy.engine.Connection = None):
     """
     Clears all data rows in SQL (excluding precomputed date/time dimension tables).
     Inputs:
     - connEngine - Connection to SQL database to repair
     - echo - Echo output/actions from function
+    - conn - Connection to clear in (the caller's transaction), otherwise a connection of the engine is used and committed
+
+    Note:
+    - The tables are truncated in one statement (no row by row deletes, no dead rows left to vacuum), and the TickerID
+    identity restarts (TickerIDs are given again from 1 by the next sync). Partitions of the marketTable are kept (empty).
     """
-    if echo: print('Clearing all datasets in SQL') # TEST THIS FUNCTION
+    if echo: print('Clearing all datasets in SQL')
 
     delQuery = '''
-    DELETE FROM "marketTable";
-    DELETE FROM "metaTable";
-    DELETE FROM "manifestTable";
-    DELETE FROM "tickerTable";
+    DO $$ BEGIN
+        EXECUTE 'TRUNCATE "marketTable", "metaTable", "manifestTable", "tickerTable"'
+                || CASE WHEN to_regclass('"syncLedger"') IS NOT NULL THEN ', "syncLedger"' ELSE '' END
+                || ' RESTART IDENTITY CASCADE';
+    END $$;
     '''
 
-    ExecuteSQL(delQuery, connEngine)
+    ExecuteSQL(delQuery, connEngine, conn = conn)
+    unitCache.invalidate(connEngine)
+    tickerCache.invalidate(connEngine)
     return
 
+# Clear the rows of a set of units (ticker, interval, month) in SQL
+def SQLClearUnits(connEngine: sqlalchemy.engine, units: Iterable[tuple[str, int, str]], vacuum = False,
+                  conn: sqlalchemy.engine.Connection = None, echo = False) -> dict:
+    """
+    Clears the rows of a set of units (ticker, interval, month) in SQL: their market rows, meta data rows and sync ledger
+    rows, and sets them as missing (0) in the manifestTable. The other units are left untouched.
+    Inputs:
+    - connEngine - Connection to SQL database
+    - units - Iterable of (ticker, interval, month) tuples of the units to clear (as DataManifest.listUnits)
+
+    Optional inputs:
+    - vacuum - Boolean to VACUUM ANALYZE the cleared tables after (reclaims the deleted rows and updates the planner statistics)
+    - conn - Connection to clear the units in (the caller's transaction), a new transaction is committed if None
+    - echo - Echo output/actions from function
+
+    Output:
+    - Dictionary of the statistics of the clear: 'units' cleared, market 'rows' cleared and 'partitions' dropped
+
+    Note:
+    - The market rows are deleted by range on the primary key (TickerID, Interval, DateID), except if the marketTable is
+    partitioned by unit (see SQLEstablish), where the partitions of the units are dropped instead (no rows deleted).
+    - VACUUM cannot run in a transaction, so vacuum cannot be used with conn (vacuum after the caller commits).
+    - Units of tickers not in the tickerTable have nothing to clear.
+    """
+    if vacuum and conn is not None: raise ValueError("VACUUM cannot run inside the transaction of conn, vacuum after it is committed.")
+    units = list(dict.fromkeys((str(ticker), int(interval), str(month)) for ticker, interval, month in units))
+    stats = {'units': len(units), 'rows': 0, 'partitions': 0}
+    if not units: return stats
+
+    if conn is not None: stats['rows'], stats['partitions'] = _clearUnits(connEngine, conn, units, dropPartitions = True, manifest = True)
+    else:
+        with connEngine.begin() as clearConn:
+            stats['rows'], stats['partitions'] = _clearUnits(connEngine, clearConn, units, dropPartitions = True, manifest = True)
+    unitCache.invalidate(connEngine)
+    if echo: print(f"Cleared {stats['units']} units ({stats['rows']} rows, {stats['partitions']} partitions dropped).")
+
+    if vacuum:
+        if echo: print('Vacuuming the cleared tables...')
+        with connEngine.connect().execution_options(isolation_level = 'AUTOCOMMIT') as vacuumConn:
+            vacuumConn.execute(sqlalchemy.text('VACUUM ANALYZE "marketTable", "metaTable", "syncLedger", "manifestTable";'))
+    return stats
+
 # Wipes all data and tables from database, unsafe for SQL users unless saved elsewhere
-def SQLNuke(connEngine: sqlalchemy.engine, ignoreWarn = False):
+def SQLNuke(connEngine: sqlalchemy.engine, ignoreWarn = False, conn: sqlalchemy.engine.Connection = None):
     """
     Wipes all data and tables/views from SQL database. Use with caution!
 
+    Optional input:
+    - conn - Connection to wipe in (the caller's transaction), otherwise a connection of the engine is used and committed
+
     Note:
     - ignoreWarn used by deepRepair from SQLRepair (as it already warns), advised against setting to True
     """
@@ -616,11 +1314,15 @@ def SQLNuke(connEngine: sqlalchemy.engine, ignoreWarn = False):
         END LOOP;
     END $$;
     """
-    ExecuteSQL(nukeQuery,connEngine)
+    ExecuteSQL(nukeQuery, connEngine, conn = conn)
+    unitCache.invalidate(connEngine)
+    tickerCache.invalidate(connEngine)
+    _marketPartitions.pop(_engineSource(connEngine), None)
     return
 
 # Provide (or execute) query for setting key(s) for a table (after dropping existing one first) # 
-def SetKeysQuery(tableName, keys: str | Iterable[str], kType = 'primary', ref: tuple[str,Iterable[str]] | Iterable[Iterable[str]] = None, engine: sqlalchemy.engine = None, echo = False):
+def SetKeysQuery(tableName, keys: str | Iterable[str], kType = 'primary', ref: tuple[str,Iterable[str]] | Iterable[Iterable[str]] = None, engine: sqlalchemy.engine = None, echo = False,
+                 conn: sqlalchemy.engine.Connection = None):
     """
     Provides query to set the keys of a table (from a column(s)) in an SQL database. You must specify the sort of key being set
     (default is primary) and the and the key name (column(s)) and additional reference data, if applicable. Uses postgreSQL dialect.
@@ -637,6 +1339,7 @@ def SetKeysQuery(tableName, keys: str | Iterable[str], kType = 'primary', ref: t
     columns). More details provided below. Required for foreign keys, NoneType for all else.
     - engine - SQL engine to connect to database to execute query, if provided
     - echo - Echo output/actions from function
+    - conn - Connection to execute the query in (the caller's transaction, with engine), otherwise a connection of the engine is used
 
     Type of keys/constraints settable:
     - Primary (kType = 'primary', using one key)
@@ -854,12 +1557,13 @@ def SetKeysQuery(tableName, keys: str | Iterable[str], kType = 'primary', ref: t
     # Execute alteration
     if engine:
         if echo: print('Committing key set')
-        ExecuteSQL(wallstring, engine)
+        ExecuteSQL(wallstring, engine, conn = conn)
             
     return wallstring
 
 # Provide (or execute) query for dropping key(s) for a table (without replacing with another one)
-def DropKeysQuery(tableName, keys: str | Iterable[str] = None, kType = 'primary', ref: tuple[str,Iterable[str]] | Iterable[Iterable[str]] = None, engine: sqlalchemy.engine = None, echo = False):
+def DropKeysQuery(tableName, keys: str | Iterable[str] = None, kType = 'primary', ref: tuple[str,Iterable[str]] | Iterable[Iterable[str]] = None, engine: sqlalchemy.engine = None, echo = False,
+                  conn: sqlalchemy.engine.Connection = None):
     """
     Provides query to delete the keys of a table in an SQL database. You must specify the sort of key being dropped
     (default is primary) and the key name (column(s)) and additional reference data, if applicable. Uses postgreSQL dialect.
@@ -875,6 +1579,7 @@ def DropKeysQuery(tableName, keys: str | Iterable[str] = None, kType = 'primary'
     in form (refTable,refCol). Required for foreign keys, NoneType for all else
     - engine - SQL engine to connect to database to execute query, if provided
     - echo - Echo output/actions from function
+    - conn - Connection to execute the query in (the caller's transaction, with engine), otherwise a connection of the engine is used
 
     Type of keys/constraints that can be dropped:
     - Primary/Composite (kType = 'primary', does not require keys/key names)
@@ -1038,27 +1743,217 @@ def DropKeysQuery(tableName, keys: str | Iterable[str] = None, kType = 'primary'
     
     if engine:
         if echo: print('Committing key drop')
-        ExecuteSQL(wallstring, engine)
+        ExecuteSQL(wallstring, engine, conn = conn)
 
     return wallstring
 
+# Plan of key statements (as set by SetKeysQuery) checked against the catalog of the database
+class DDLPlan():
+    """
+    DDLPlan collects the key statements of a schema (primary, foreign, unique keys and secondary indexes, each added with the
+    inputs of SetKeysQuery), then checks them against the catalog of a database, so only the keys missing (or different, or
+    not valid) are set again. The statements planned are executed in one connection and one transaction.
+    Note:
+    - A key is satisfied if a constraint (or index) of the same table and name exists with the same definition (or columns),
+    and is valid. A primary/unique key set again drops its dependent foreign keys (CASCADE), so these are set again too.
+    - The keys are set in the order added (referenced keys must be added before the foreign keys referencing them).
+    - Secondary indexes can be built concurrently (CREATE INDEX CONCURRENTLY, after the transaction of the other keys), so the
+    table stays writable while they are built. Indexes of partitioned tables (not supported concurrently) are built in the transaction.
+    ___________________________________
+    Method List:
+    > add - Adds a key (inputs of SetKeysQuery) to the plan
+    > plan - Gives the statements of the keys not satisfied in a database (dry run)
+    > execute - Executes the statements of the keys not satisfied in a database, in one transaction
+    > describe - Gives the table and name of the keys of planned statements
+    """
+
+    def __init__(self):
+        self.steps = [] # (statements, target) of each key, target as read from the statements
+
+    def __repr__(self):
+        return f'DDLPlan(). Keys: {len(self.steps)}'
+
+    def add(self, tableName: str, keys: str | Iterable[str], kType = 'primary', ref: tuple[str,Iterable[str]] | Iterable[Iterable[str]] = None) -> 'DDLPlan':
+        """
+        This method adds the key(s) set by SetKeysQuery with the same inputs to the plan (one step per key), returning the plan.
+        """
+        statement = ''
+        for part in SetKeysQuery(tableName, keys, kType, ref).split(';'):
+            if not part.strip(): continue
+            statement += part.strip() + ';\n'
+            target = _keyTarget(tableName, part)
+            if target is not None: # The statements up to (and including) the one adding a key are its step
+                self.steps.append((statement, target))
+                statement = ''
+        return self
+
+    def plan(self, engine: sqlalchemy.engine, rebuild = False, conn: sqlalchemy.engine.Connection = None) -> list[str]:
+        """
+        This method gives the statements of the keys not satisfied in the database (all keys if rebuild), without executing them.
+        Optional inputs:
+        - rebuild - Boolean indicating to plan every key (drop and set again)
+        - conn - Connection to read the catalog in, a connection of the engine is used if None
+        """
+        if not rebuild:
+            if conn is None:
+                with engine.connect() as readConn: catalog = _keyCatalog(readConn)
+            else: catalog = _keyCatalog(conn)
+
+        planned, rebuiltKeys = [], set()
+        for statement, target in self.steps:
+            # Foreign keys referencing a key set again are dropped with it (CASCADE)
+            dependent = target['reference'] is not None and target['reference'] in rebuiltKeys
+            if rebuild or dependent or catalog.get((target['table'], target['name'])) != target['definition']:
+                planned.append(statement)
+                if target['columns'] is not None: rebuiltKeys.add((target['table'], target['columns']))
+        return planned
+
+    def execute(self, engine: sqlalchemy.engine, rebuild = False, dryRun = False, conn: sqlalchemy.engine.Connection = None,
+                concurrently = False) -> list[str]:
+        """
+        This method executes the statements of the keys not satisfied in the database (all keys if rebuild) in one transaction,
+        returning the statements executed (only planned if dryRun).
+        Optional inputs:
+        - rebuild - Boolean indicating to set every key again
+        - dryRun - Boolean indicating to only plan the statements
+        - conn - Connection to execute in (the caller's transaction), a new transaction is committed if None
+        - concurrently - Boolean indicating to build the secondary indexes concurrently after the transaction (not with conn)
+        """
+        if conn is None and not dryRun:
+            with engine.begin() as planConn: statements, concurrent = self._execute(engine, rebuild, planConn, concurrently)
+            # Indexes built concurrently once the other keys are committed (each in its own autocommit statement)
+            if concurrent:
+                with engine.connect().execution_options(isolation_level = 'AUTOCOMMIT') as indexConn:
+                    for statement in concurrent: indexConn.execute(sqlalchemy.text(statement))
+            return statements
+        if dryRun: return self.plan(engine, rebuild, conn)
+        return self._execute(engine, rebuild, conn)[0]
+
+    def _execute(self, engine: sqlalchemy.engine, rebuild, conn: sqlalchemy.engine.Connection, concurrently = False) -> tuple[list[str], list[str]]:
+        statements = self.plan(engine, rebuild, conn)
+        partitioned = set(conn.execute(sqlalchemy.text('''SELECT relname FROM pg_class WHERE relkind = 'p'
+                                                           AND relnamespace = current_schema()::regnamespace;''')).scalars()) if concurrently else set()
+        targets = {statement: target for statement, target in self.steps}
+        transact, concurrent = [], []
+        for statement in statements:
+            target = targets[statement]
+            if concurrently and target['definition'][0] == 'index' and target['table'] not in partitioned:
+                concurrent += [f'DROP INDEX CONCURRENTLY IF EXISTS "{target["name"]}";',
+                               re.search(r'CREATE INDEX .*;', statement, re.S).group(0).replace('CREATE INDEX ', 'CREATE INDEX CONCURRENTLY ', 1)]
+            else: transact.append(statement)
+        if transact: conn.execute(sqlalchemy.text(''.join(transact)))
+        return statements, concurrent
+
+    def describe(self, statements: Iterable[str]) -> list[str]:
+        """
+        This method gives the 'table: name' of the key of each planned statement (as returned by plan/execute).
+        """
+        targets = {statement: target for statement, target in self.steps}
+        return [f"{targets[statement]['table']}: {targets[statement]['name']}" for statement in statements]
+
+# Key added by a statement of SetKeysQuery (None if it adds none): its table, name and definition (whitespace and quotes
+# removed, the columns for an index), with the columns of a primary/unique key and the (table, columns) a foreign key references
+def _keyTarget(tableName: str, statement: str) -> dict | None:
+    normalise = lambda definition: re.sub(r'[\s"]', '', definition)
+    columns = lambda columnList: tuple(re.findall(r'"([^"]+)"', columnList))
+    if (match := re.search(r'ADD PRIMARY KEY\s*(\([^)]*\))', statement)):
+        name, definition = f'{tableName}_pkey', 'PRIMARY KEY' + match.group(1)
+    elif (match := re.search(r'ADD CONSTRAINT "([^"]+)"\s*((FOREIGN KEY|UNIQUE).*)', statement, re.S)):
+        name, definition = match.group(1), match.group(2)
+    elif (match := re.search(r'CREATE INDEX "([^"]+)" ON "[^"]+"\s*(\([^)]*\))', statement)):
+        return {'table': tableName, 'name': match.group(1).encode()[:63].decode(errors = 'ignore'), 'definition': ('index', columns(match.group(2))), 'columns': None, 'reference': None}
+    else: return None
+    name = name.encode()[:63].decode(errors = 'ignore') # Names truncated by the database (63 bytes)
+
+    keyColumns = re.match(r'(PRIMARY KEY|UNIQUE)\s*(\([^)]*\))', definition)
+    reference = re.search(r'REFERENCES\s*"([^"]+)"\s*(\([^)]*\))', definition)
+    return {'table': tableName, 'name': name, 'definition': normalise(definition), 'columns': columns(keyColumns.group(2)) if keyColumns else None,
+            'reference': (reference.group(1), columns(reference.group(2))) if reference else None}
+
+# Keys in the catalog of the current schema, (table, name) to definition (as _keyTarget), only valid keys
+def _keyCatalog(conn: sqlalchemy.engine.Connection) -> dict:
+    catalogQuery = '''
+        SELECT t.relname, k.conname, pg_get_constraintdef(k.oid), NULL
+        FROM pg_constraint k
+        JOIN pg_class t ON t.oid = k.conrelid
+        WHERE t.relnamespace = current_schema()::regnamespace AND k.contype IN ('p', 'u', 'f') AND k.conparentid = 0 AND k.convalidated
+        UNION ALL
+        SELECT t.relname, i.relname, NULL, ARRAY(SELECT a.attname::TEXT FROM unnest(x.indkey::INT2[]) WITH ORDINALITY AS c(attnum, ord)
+                                                 JOIN pg_attribute a ON a.attrelid = x.indrelid AND a.attnum = c.attnum ORDER BY c.ord)
+        FROM pg_index x
+        JOIN pg_class i ON i.oid = x.indexrelid
+        JOIN pg_class t ON t.oid = x.indrelid
+        WHERE t.relnamespace = current_schema()::regnamespace AND x.indisvalid AND NOT x.indisunique;'''
+    return {(table, name): re.sub(r'[\s"]', '', definition) if definition is not None else ('index', tuple(columns))
+            for table, name, definition, columns in conn.execute(sqlalchemy.text(catalogQuery))}
+
+# Keys of the database set by SQLSetup (in order, referenced keys before the foreign keys referencing them)
+setupKeys = (DDLPlan()
+    # TickerTable keys
+    .add('tickerTable', 'Ticker', 'primary')
+    .add('tickerTable', 'TickerID', 'unique')
+
+    # DateTable keys
+    .add('dateTable', 'DateID', 'primary')
+    .add('dateTable', 'Date', 'unique')
+    .add('dateTable', 'DayOfWeek', 'secondary')
+    .add('dateTable', 'Day', 'secondary')
+    .add('dateTable', 'Month', 'secondary')
+
+    # TimeTable keys
+    .add('timeTable', 'TimeID', 'primary')
+    .add('timeTable', 'Time', 'unique')
+    .add('timeTable', 'Hour', 'secondary')
+    .add('timeTable', 'Minute', 'secondary')
+    .add('timeTable', 'Second', 'secondary')
+
+    # ManifestTable keys (month index for the month ranges of all tickers/intervals)
+    .add('manifestTable', ('TickerID','Interval','Month'), 'primary')
+    .add('manifestTable', 'TickerID', 'foreign', ref = ('tickerTable','TickerID'))
+    .add('manifestTable', 'Month', 'secondary')
+
+    # MarketTable keys
+    .add('marketTable', ('TickerID','Interval','DateID','TimeID'), 'primary')
+    .add('marketTable', ('TickerID','DateID','TimeID'), 'foreign', ref = ( ('tickerTable','TickerID'), ('dateTable','DateID'), ('timeTable','TimeID') ))
+    # Time range indexes on the stored DateTime (for time ranges of given tickers/intervals, and of all tickers/intervals)
+    .add('marketTable', ('TickerID','Interval','DateTime'), 'secondary')
+    .add('marketTable', 'DateTime', 'secondary')
+
+    # SyncLedger keys (primary key declared on creation, as SQLSync creates it in databases established before it)
+    .add('syncLedger', ('TickerID','Interval','Month'), 'foreign', ref = ('manifestTable',['TickerID','Interval','Month']))
+
+    # MetaTable keys
+    .add('metaTable', ('TickerID','4. Interval','7. Month'), 'primary')
+    .add('metaTable', ('TickerID','DateID','TimeID'), 'foreign', ref = ( ('tickerTable','TickerID'), ('dateTable','DateID'), ('timeTable','TimeID') ))
+    .add('metaTable', ('TickerID','4. Interval','7. Month'), 'foreign', ref = ('manifestTable',['TickerID','Interval','Month']))
+    # Can set extra indexes here (hour, or year etc.)
+)
+
 # Execute SQL query
-def ExecuteSQL(query: str, engine: sqlalchemy.engine, fetch = False, transact = True):
+def ExecuteSQL(query: str, engine: sqlalchemy.engine, fetch = False, transact = True, conn: sqlalchemy.engine.Connection = None):
     """
     Executes a given query (in string) in SQL using the given connection engine.
     Enabling fetching provides the output from SQL (in whatever format it may be).
     Note that if fetch is enabled but no output is obtained it will raise an error.
     Note that if transact is False, nothing is fetched (use only for deleting databases).
+    Note that if a connection (conn) is given, the query is executed in it and not committed (the transaction of the connection
+    is left to its owner), and transact is ignored.
     """
     from sqlalchemy import text
 
-    # If no transaction use autocommit option in psycopg2 (query must be split into lines to avoid a bug)
+    # Executed within the given connection (its transaction is committed by its owner)
+    if conn is not None:
+        result = conn.execute( text( query ) )
+        if fetch: return result.fetchall()
+        return
+
+    # If no transaction use autocommit option in psycopg2 (query must be split into lines to avoid a bug), all lines executed
+    # through one autocommit connection
     if not transact:
         stripQuery = query.strip().split('\n') # Split into individual lines
-        for line in stripQuery:
-            if line.strip() == '': continue # Skip empty lines
-
-            with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            for line in stripQuery:
+                if line.strip() == '': continue # Skip empty lines
                 conn.execute(text(line))
         return
 
@@ -1075,6 +1970,27 @@ def ExecuteSQL(query: str, engine: sqlalchemy.engine, fetch = False, transact =
                 conn.commit()  # Required for Data Definiton Language (DDL) statements
                 return
 
+# Converts DateTime into DateID and TimeID
+def DateTimeIDs(dateTimes: pd.Series) -> tuple[pd.Series, pd.Series]:
+    """
+    Converts DateTime values into the DateID (YYYYMMDD) and TimeID (HHMMSS) integers used by the dateTable/timeTable relations.
+    Input:
+    - dateTimes - Series of DateTime, either datetime64 (used as is) or strings in '%Y-%m-%d %H:%M:%S' format (parsed once)
+
+    Output:
+    - Tuple of the DateID and TimeID Series (int64, same index as dateTimes)
+
+    Note:
+    - The IDs are computed with integer arithmetic on the datetime components (no intermediate date/time objects or strings).
+    - Time zone aware DateTimes are converted on their local (wall) time.
+    """
+    if not pd.api.types.is_datetime64_any_dtype(dateTimes):
+        dateTimes = pd.to_datetime(dateTimes, format = '%Y-%m-%d %H:%M:%S')
+    dateTimes = dateTimes.dt
+    dateIDs = dateTimes.year.astype('int64') * 10000 + dateTimes.month * 100 + dateTimes.day
+    timeIDs = dateTimes.hour.astype('int64') * 10000 + dateTimes.minute * 100 + dateTimes.second
+    return dateIDs, timeIDs
+
 # Convert dataset from DataFrame to SQL acceptable format
 def DFtoSQLFormat(dataFrame: pd.DataFrame, dfType: str, dataContext: tuple[str, int] | str) -> pd.DataFrame:
     """
@@ -1127,7 +2043,7 @@ def DFtoSQLFormat(dataFrame: pd.DataFrame, dfType: str, dataContext: tuple[str,
     return dataFrame
 
 # Convert dataset from DataFrame to SQL acceptable format
-def SQLtoDFFormat(dataFrame: pd.DataFrame, dfType: str, convertDatetime = False, raiseError = False) -> pd.DataFrame: # CAHNGE INPUT PARAMS
+def SQLtoDFFormat(dataFrame: pd.DataFrame, dfType: str, convertDatetime = False, raiseError = False, compact = False) -> pd.DataFrame: # CAHNGE INPUT PARAMS
     """
     Converts a given DataFrame (recieved from the output of a SQL query using pd.read_sql()) into a format acceptable
     by the ArcaneQuant ecosystem. Provide only dataset for one group, e.g. data for a single Ticker, in a single
@@ -1147,6 +2063,8 @@ def SQLtoDFFormat(dataFrame: pd.DataFrame, dfType: str, convertDatetime = False,
     - convertDatetime - Boolean indicating to convert any Date/Time columns to datetime64[ns] format. If False, converts to string instead.
     - raiseError - Boolean indicating if error should be raised if failure of operation (otherwise return original input
     on failure)
+    - compact - Boolean indicating to convert stock data into compact datatypes (see CompactFormat), with the DateTime column
+    as datetime64[ns] (whatever convertDatetime is).
         
     Note:
     - The relevant columns must use their default names:
@@ -1172,12 +2090,13 @@ def SQLtoDFFormat(dataFrame: pd.DataFrame, dfType: str, convertDatetime = False,
             dataFrame.drop(columns=['Ticker', 'Interval'], inplace = True)
 
         # If convertDatetime, change to datetime (no actual change), else convert to string.
-        if convertDatetime:
+        if convertDatetime or compact:
             dataFrame['DateTime'] = pd.to_datetime(dataFrame['DateTime'], format = "%Y-%m-%d %H:%M:%S")
         else:
             dataFrame['DateTime'] = dataFrame['DateTime'].astype(str)
         # Reset index as index taken from SQL (does not always start at 0)
         dataFrame.reset_index(drop=True, inplace=True)
+        if compact: dataFrame = CompactFormat(dataFrame)
     
     elif dfType.lower() == "manifest":
         # Guard against if already done/no cols
@@ -1229,6 +2148,60 @@ def SQLtoDFFormat(dataFrame: pd.DataFrame, dfType: str, convertDatetime = False,
 
     return dataFrame
 
+def CompactFormat(dataFrame: pd.DataFrame, checkPrecision = True, priceDecimals: int = 4, echo = False) -> pd.DataFrame:
+    """
+    Converts a DataFrame of stock (market) data into compact datatypes, using a fraction of the memory of the default ones
+    (object strings, float64 and int64). Columns not present are skipped, and columns already compact are left as they are.
+    The compact datatypes are:
+        > 'Ticker' - category
+        > 'Interval' - int16
+        > 'DateTime' - datetime64[ns] (strings are parsed with the "%Y-%m-%d %H:%M:%S" format)
+        > 'Open', 'High', 'Low', 'Close' - float32 (if precise enough, see checkPrecision)
+        > 'Volume' - int32 (int64 if any volume does not fit in int32)
+
+    Inputs:
+    - dataFrame - DataFrame of stock data to be converted (not modified, a converted DataFrame is returned)
+
+    Optional inputs:
+    - checkPrecision - Boolean indicating to check that float32 keeps the prices exactly, to priceDecimals decimal places,
+    otherwise the price column stays float64
+    - priceDecimals - Integer number of decimal places of the prices (the API gives prices to 4 decimal places)
+    - echo - Boolean indicating to print the price columns kept as float64
+
+    Note:
+    - The float32 precision check: float32 has a 24-bit significand (about 7 significant digits), so a price is kept exactly
+    to 4 decimal places up to about 800. The check rounds the float32 prices (as float64) back to priceDecimals decimal
+    places and compares them with the original prices (NaN equal to NaN); if any differs, the column stays float64.
+    - Without the check, prices above that are rounded (relative error up to 6e-8).
+    - Concatenating compact DataFrames with different Ticker categories gives an object column, use CompactFormat again after.
+    """
+    import numpy as np
+    dataFrame = dataFrame.copy(deep = False) # New columns are assigned (the input is not modified)
+
+    if 'Ticker' in dataFrame.columns and not isinstance(dataFrame['Ticker'].dtype, pd.CategoricalDtype):
+        dataFrame['Ticker'] = dataFrame['Ticker'].astype('category')
+    if 'Interval' in dataFrame.columns and dataFrame['Interval'].dtype != 'int16':
+        dataFrame['Interval'] = dataFrame['Interval'].astype('int16')
+    if 'DateTime' in dataFrame.columns and not pd.api.types.is_datetime64_any_dtype(dataFrame['DateTime']):
+        dataFrame['DateTime'] = pd.to_datetime(dataFrame['DateTime'], format = "%Y-%m-%d %H:%M:%S")
+
+    for col in ['Open', 'High', 'Low', 'Close']:
+        if col not in dataFrame.columns or dataFrame[col].dtype != 'float64': continue
+        prices = dataFrame[col].to_numpy()
+        compactPrices = prices.astype('float32')
+        if checkPrecision and not np.array_equal(np.round(compactPrices.astype('float64'), priceDecimals), prices, equal_nan = True):
+            if echo: print(f"Column '{col}' kept as float64 (float32 does not keep its prices to {priceDecimals} decimal places).")
+            continue
+        dataFrame[col] = compactPrices
+
+    if 'Volume' in dataFrame.columns and dataFrame['Volume'].dtype == 'int64':
+        volumes = dataFrame['Volume'].to_numpy()
+        int32 = np.iinfo('int32')
+        if len(volumes) == 0 or (volumes.min() >= int32.min and volumes.max() <= int32.max):
+            dataFrame['Volume'] = volumes.astype('int32')
+
+    return dataFrame
+
 # Applying upsert (update-insert) in postgres database
 def postgres_upsert(table, conn, keys, data_iter):
     from sqlalchemy.dialects.postgresql import insert
@@ -1244,6 +2217,42 @@ def postgres_upsert(table, conn, keys, data_iter):
     )
     conn.execute(upsert_statement)
 
+# Upsert (pandas to_sql method) streaming the rows with COPY into a temporary staging table (in batches of copyBatch rows), then
+# merging the staging table into the table with a single INSERT ... SELECT ... ON CONFLICT DO UPDATE (same upsert as postgres_upsert)
+def postgres_copy_upsert(table, conn, keys, data_iter, copyBatch: int = 100000):
+    import io
+    import csv
+    from itertools import islice
+
+    conststr = f"{table.table.name}_pkey"
+    stageName = f"stage_{table.table.name}"
+    colSeq = ', '.join(f'"{key}"' for key in keys)
+    setSeq = ', '.join(f'"{key}" = EXCLUDED."{key}"' for key in keys)
+
+    with conn.connection.cursor() as cursor:
+        # Staging table with the columns (and types) of the data, in the transaction of the save
+        colDefs = ', '.join(f'"{col.name}" {col.type.compile(dialect = conn.dialect)}' for col in table.table.columns if col.name in keys)
+        cursor.execute(f'CREATE TEMPORARY TABLE "{stageName}" ({colDefs}) ON COMMIT DROP;')
+        # Types of the columns of the table (the data is cast to them when merged, as when inserted with values)
+        cursor.execute('''SELECT attname, format_type(atttypid, atttypmod) FROM pg_attribute
+                          WHERE attrelid = %s::regclass AND attnum > 0 AND NOT attisdropped;''', (f'"{table.table.name}"',))
+        colTypes = dict(cursor.fetchall())
+        castSeq = ', '.join(f'"{key}"::{colTypes[key]}' for key in keys)
+
+        # Rows streamed as CSV, NULL written as \N (so empty strings stay empty strings)
+        while batch := list(islice(data_iter, copyBatch)):
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows([['\\N' if val is None else val for val in row] for row in batch])
+            buffer.seek(0)
+            cursor.copy_expert(f'''COPY "{stageName}" ({colSeq}) FROM STDIN WITH (FORMAT csv, NULL '\\N')''', buffer)
+
+        cursor.execute(f'''INSERT INTO "{table.table.name}" ({colSeq})
+                           SELECT {castSeq} FROM "{stageName}"
+                           ON CONFLICT ON CONSTRAINT "{conststr}" DO UPDATE SET {setSeq};''')
+        rowCount = cursor.rowcount
+        cursor.execute(f'DROP TABLE pg_temp."{stageName}";')
+    return rowCount
+
 # Every ticker is unique as alphavantage only provides US-based equities
 # Note: for upsert to be applied, the table must have a primary key
  
\ No newline at end of file
@@ -0,0 +1,468 @@
+import os
+import abc
+import threading
+import pandas as pd
+import sqlalchemy
+from typing import Iterable, Iterator
+from .DataManifestManager import DataManifest
+from .CacheManager import unitCache, _engineSource
+from .SQLManager import SQLSave, SQLManifest, _wideManifest
+from .DataManager import _marketQuery
+
+class StorageManager():
+    """Placeholder class for package-level structure or future use."""
+    pass
+
+
+# Functions in this file:
+# - StorageBackend - Interface of the storage of the database form of the data (save, market, manifest, meta and query operations)
+# - PostgresBackend - Storage backend of a PostgreSQL database (through SQLManager, the default of a DataManifest with a SQLengine)
+# - DuckDBBackend - Storage backend of an embedded DuckDB database (a single file, in-process, no server), with queries over the files
+
+# Orders of the market rows: 'unit' by ticker, interval and month (as the direct data of ExtractData), 'month' by month then
+# ticker and interval (as the units streamed by ExtractDataUnits), with the rows of each unit in descending DateTime (as the files)
+marketOrders = ('unit', 'month')
+
+
+##################################
+##################################
+# Storage Backend Class
+class StorageBackend(abc.ABC):
+    """
+    StorageBackend is the interface of the storage of the database form of the data (market data, meta data and manifest), as
+    used by the 'database' save mode of DownloadIntraday, ExtractData/ExtractDataUnits (fromSQL) and DataManifest (loadManifest,
+    saveManifest and loadData_fromsql). A DataManifest uses its linked storage (DataManifest.storage), or else the PostgreSQL
+    database of its SQLengine (see DataManifest.backend).
+    Note:
+    - The frames saved and returned are in the forms of SQLManager (market/meta data as DFtoSQLFormat gives, market rows with
+    the Ticker, Interval, DateTime, Open, High, Low, Close, Volume and Nominal columns, meta rows as the metaData view, and the
+    manifest in the wide form of DataManifest.DF), so the same post-processing (SQLtoDFFormat) applies to every backend.
+    - Queries (query method) are in the SQL dialect of the backend, over its tables and views (stockData, metaData, manifestData).
+    - A backend must implement every method below (a backend missing any cannot be instantiated).
+    ___________________________________
+    Method List:
+    > save - Saves (upserts) market data, meta data or a manifest into the storage
+    > market - Reads the market rows of a time range (of the tickers/intervals selected)
+    > marketChunks - Streams the market rows of a time range in chunks of rows (ordered by month, then unit)
+    > manifest - Reads the manifest in the wide form of DataManifest.DF (of a month range)
+    > meta - Reads the meta data rows of a month range (as the metaData view)
+    > query - Runs a query (i.e. a range or aggregate query) in the storage, returning a DataFrame
+    > source - Source identifier of the storage (as used by the unitCache)
+    """
+
+    @abc.abstractmethod
+    def save(self, saveDF: pd.DataFrame, saveTable: str):
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def market(self, startDT: pd.Timestamp, endDT: pd.Timestamp, tickers: list = None, intervals: list = None, order = 'unit') -> pd.DataFrame:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def marketChunks(self, startDT: pd.Timestamp, endDT: pd.Timestamp, tickers: list = None, intervals: list = None, fetchSize: int = 100000) -> Iterator[pd.DataFrame]:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def manifest(self, startMonth: str = None, endMonth: str = None) -> pd.DataFrame:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def meta(self, startMonth: str = None, endMonth: str = None) -> pd.DataFrame:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def query(self, query: str, params: dict = None) -> pd.DataFrame:
+        raise NotImplementedError
+
+    @property
+    @abc.abstractmethod
+    def source(self) -> tuple:
+        raise NotImplementedError
+
+
+##################################
+##################################
+# PostgreSQL Backend Class
+class PostgresBackend(StorageBackend):
+    """
+    PostgresBackend is the storage backend of a PostgreSQL database established by SQLSetup (through its connection engine),
+    saving with SQLSave and reading the marketTable (by its stored DateTime), the manifestTable (SQLManifest) and the metaData view.
+    Note:
+    - A DataManifest with a SQLengine (and no other storage linked) uses it, so nothing changes for existing databases.
+    - Queries take named parameters (:name), as sqlalchemy.text.
+    """
+
+    def __init__(self, engine: sqlalchemy.engine.Engine):
+        self.engine = engine
+
+    def __repr__(self):
+        return f'PostgresBackend(engine = {self.engine})'
+
+    def save(self, saveDF: pd.DataFrame, saveTable: str, conn: sqlalchemy.engine.Connection = None):
+        """
+        This method saves (upserts) market data, meta data or a manifest into the database (see SQLSave), in one transaction
+        (or in the transaction of conn).
+        """
+        SQLSave(saveDF, self.engine, saveTable, ignore_index = True, conn = conn)
+
+    def market(self, startDT: pd.Timestamp, endDT: pd.Timestamp, tickers: list = None, intervals: list = None, order = 'unit') -> pd.DataFrame:
+        """
+        This method reads the market rows between the start/end datetimes (of the tickers/intervals selected, None for all),
+        in the given order ('unit' or 'month', see marketOrders).
+        """
+        marketQuery, queryParams = _marketQuery(startDT, endDT, tickers, intervals, orderBy = _postgresOrder(order))
+        return pd.read_sql(marketQuery, self.engine, params = queryParams)
+
+    def marketChunks(self, startDT: pd.Timestamp, endDT: pd.Timestamp, tickers: list = None, intervals: list = None, fetchSize: int = 100000) -> Iterator[pd.DataFrame]:
+        """
+        This method streams the market rows between the start/end datetimes (ordered by month, then unit) from a server-side
+        cursor, in chunks of up to fetchSize rows (a unit can be split across chunks).
+        """
+        marketQuery, queryParams = _marketQuery(startDT, endDT, tickers, intervals, orderBy = _postgresOrder('month'))
+        with self.engine.connect().execution_options(stream_results = True, max_row_buffer = fetchSize) as conn:
+            yield from pd.read_sql(marketQuery, conn, params = queryParams, chunksize = fetchSize)
+
+    def manifest(self, startMonth: str = None, endMonth: str = None) -> pd.DataFrame:
+        """
+        This method reads the manifest (of the months in range, None for no limit) in the wide form of DataManifest.DF.
+        """
+        return SQLManifest(self.engine, startMonth, endMonth)
+
+    def meta(self, startMonth: str = None, endMonth: str = None) -> pd.DataFrame:
+        """
+        This method reads the meta data rows of the months in range (None for no limit), as the metaData view.
+        """
+        metaQuery = sqlalchemy.text('SELECT * FROM "metaData" WHERE "7. Month" BETWEEN :startMonth AND :endMonth;')
+        return pd.read_sql(metaQuery, self.engine, params = {'startMonth': startMonth or '0000-00', 'endMonth': endMonth or '9999-99'})
+
+    def query(self, query: str, params: dict = None) -> pd.DataFrame:
+        """
+        This method runs a query (PostgreSQL, with named :parameters) in the database, returning its rows as a DataFrame.
+        """
+        return pd.read_sql(sqlalchemy.text(query), self.engine, params = params)
+
+    @property
+    def source(self) -> tuple:
+        return _engineSource(self.engine)
+
+
+##################################
+##################################
+# DuckDB Backend Class
+class DuckDBBackend(StorageBackend):
+    """
+    DuckDBBackend is the storage backend of an embedded DuckDB database: a single database file (or in memory) queried in the
+    process, with no server to run (i.e. on laptops or CI runners without PostgreSQL). Its tables are columnar, so range and
+    aggregate queries only read the columns (and row groups) they need.
+    Tables:
+    - marketTable - Market rows (Ticker, Interval, DateTime, Open, High, Low, Close, Volume, Nominal), primary key on (Ticker,
+    Interval, DateTime)
+    - metaTable - Meta data rows (a row per ticker/interval/month), primary key on (Ticker, 4. Interval, 7. Month)
+    - manifestTable - Manifest in long form (Ticker, Interval, Month, Value), primary key on the first three
+    - Views stockData, metaData and manifestData, with the columns of the views of the PostgreSQL database
+    Note:
+    - Requires duckdb to be installed.
+    - The Ticker is stored as is (no tickerTable or date/time tables), as the columnar storage compresses repeated values.
+    - Saving upserts (INSERT OR REPLACE) by the primary keys, as SQLSave does. Rows repeated within a save must be removed first.
+    - sync loads the .csv files of a DataManifest into the tables (read by DuckDB itself, not pandas), and fileView exposes
+    the files of a directory as a view, so range and aggregate queries can run directly over the files (nothing loaded).
+    - A database file can only be opened for writing by one process at a time. The methods are thread-safe (a cursor each).
+    - Queries take named parameters ($name).
+    ___________________________________
+    Method List:
+    > save, market, marketChunks, manifest, meta, query, source - The operations of a StorageBackend
+    > sync - Loads (replaces) the units of a DataManifest from its .csv files, with their meta data and the manifest
+    > fileView - Creates a view over the market data files of a directory (.csv or parquet), queried without loading
+    > close - Closes the database
+    """
+
+    def __init__(self, path: str = ':memory:'):
+        import duckdb
+        self.path = path if path == ':memory:' else os.path.abspath(path)
+        self.conn = duckdb.connect(self.path)
+        self._memoryID = id(self) # Source of an in-memory database (not shared by other backends)
+        self._lock = threading.Lock() # Cursors are created from the connection one at a time
+        self.conn.execute(duckdbSchema)
+
+    def __repr__(self):
+        return f'DuckDBBackend(path = {self.path})'
+
+    def _cursor(self):
+        with self._lock:
+            return self.conn.cursor()
+
+    def save(self, saveDF: pd.DataFrame, saveTable: str):
+        """
+        This method saves (upserts, by the primary key) market data, meta data or a manifest (the wide DataManifest.DF) into
+        the database, in one transaction. The frames are as for SQLSave: market data with the Ticker, Interval and DateTime
+        columns, meta data as DFtoSQLFormat gives (the 2. Symbol, 3. Last Refreshed, 4. Interval and 7. Month columns).
+        """
+        saveTable = _tableName(saveTable)
+        saveDF = saveDF.reset_index()
+        saveDF = saveDF.drop(columns = 'index', errors = 'ignore')
+
+        if saveTable == 'marketTable':
+            saveFrame = saveDF.reindex(columns = marketColumns)
+            saveFrame['DateTime'] = pd.to_datetime(saveFrame['DateTime'])
+        elif saveTable == 'metaTable':
+            saveFrame = saveDF.rename(columns = {'2. Symbol': 'Ticker'}).reindex(columns = metaColumns)
+            saveFrame['3. Last Refreshed'] = pd.to_datetime(saveFrame['3. Last Refreshed'])
+        elif saveTable == 'manifestTable': # A row per ticker/interval/month with its value (cells without value are not saved)
+            monthCols = [col for col in saveDF.columns if col not in ('Ticker', 'Interval')]
+            saveFrame = saveDF.melt(id_vars = ['Ticker', 'Interval'], value_vars = monthCols, var_name = 'Month', value_name = 'Value').dropna(subset = ['Value'])
+            saveFrame = saveFrame.astype({'Month': str, 'Value': 'int64'})[['Ticker', 'Interval', 'Month', 'Value']]
+        else: raise ValueError(f"The saveTable must be the marketTable, metaTable or manifestTable (not {saveTable}).")
+
+        cursor = self._cursor()
+        try:
+            cursor.register('saveFrame', saveFrame)
+            columnList = ', '.join(f'"{col}"' for col in saveFrame.columns)
+            cursor.execute(f'INSERT OR REPLACE INTO "{saveTable}" ({columnList}) SELECT {columnList} FROM saveFrame;')
+        finally:
+            cursor.close()
+        if saveTable in ('marketTable', 'metaTable'): unitCache.invalidate(self.source) # Units cached from this database are outdated
+
+    def market(self, startDT: pd.Timestamp, endDT: pd.Timestamp, tickers: list = None, intervals: list = None, order = 'unit') -> pd.DataFrame:
+        """
+        This method reads the market rows between the start/end datetimes (of the tickers/intervals selected, None for all),
+        in the given order ('unit' or 'month', see marketOrders).
+        """
+        marketQuery, queryParams = _duckdbMarketQuery(startDT, endDT, tickers, intervals, order)
+        cursor = self._cursor()
+        try:
+            return _marketFrame(cursor.execute(marketQuery, queryParams).df())
+        finally:
+            cursor.close()
+
+    def marketChunks(self, startDT: pd.Timestamp, endDT: pd.Timestamp, tickers: list = None, intervals: list = None, fetchSize: int = 100000) -> Iterator[pd.DataFrame]:
+        """
+        This method streams the market rows between the start/end datetimes (ordered by month, then unit) in chunks of about
+        fetchSize rows (whole vectors of 2048 rows, a unit can be split across chunks).
+        """
+        marketQuery, queryParams = _duckdbMarketQuery(startDT, endDT, tickers, intervals, 'month')
+        cursor = self._cursor()
+        try:
+            cursor.execute(marketQuery, queryParams)
+            while True:
+                chunkDF = cursor.fetch_df_chunk(max(1, fetchSize // 2048))
+                if chunkDF.empty: break
+                yield _marketFrame(chunkDF)
+        finally:
+            cursor.close()
+
+    def manifest(self, startMonth: str = None, endMonth: str = None) -> pd.DataFrame:
+        """
+        This method reads the manifest (of the months in range, None for no limit) in the wide form of DataManifest.DF.
+        """
+        longDF = self.query('''SELECT "Ticker", "Interval", "Month", "Value" FROM "manifestData"
+                               WHERE "Month" BETWEEN $startMonth AND $endMonth ORDER BY "Ticker", "Interval", "Month";''',
+                           {'startMonth': startMonth or '0000-00', 'endMonth': endMonth or '9999-99'})
+        return _wideManifest(longDF.astype({'Interval': 'int64', 'Value': 'int64'})) # As read from PostgreSQL
+
+    def meta(self, startMonth: str = None, endMonth: str = None) -> pd.DataFrame:
+        """
+        This method reads the meta data rows of the months in range (None for no limit), as the metaData view.
+        """
+        return self.query('SELECT * FROM "metaData" WHERE "7. Month" BETWEEN $startMonth AND $endMonth;',
+                          {'startMonth': startMonth or '0000-00', 'endMonth': endMonth or '9999-99'})
+
+    def query(self, query: str, params: dict = None) -> pd.DataFrame:
+        """
+        This method runs a query (DuckDB, with named $parameters) in the database, returning its rows as a DataFrame.
+        """
+        cursor = self._cursor()
+        try:
+            return cursor.execute(query, params).df()
+        finally:
+            cursor.close()
+
+    def sync(self, dataManifest: DataManifest, echo = False) -> dict:
+        """
+        This method loads the units indicated in a DataManifest (values 1 or 2) from its .csv files into the database, replacing
+        the rows of these units, then saves their meta data and the manifest. The market rows are read from the files by DuckDB
+        (a single parallel scan of all files, in one transaction), not through pandas, keeping the rows within the month of each unit.
+        Only the small meta data files are read with pandas (the unitCache is not used, so it is not evicted by a bulk load).
+        The units stored in binary series (see DataManifest.unitFormat) are read from their series (memory-mapped) instead, in
+        the same transaction.
+        Input:
+        - dataManifest - DataManifest with a valid directory
+
+        Optional input:
+        - echo - Boolean indicating method verbosity
+
+        Output:
+        - Dictionary of the number of 'units', market 'rows' and 'metaRows' loaded
+        """
+        if ( not isinstance(dataManifest.directory, str) ) or dataManifest.directory == "":
+            raise TypeError('The data manifest directory pointer must be a string pointing to a valid path/folder.')
+        from .SQLManager import DFtoSQLFormat
+
+        units = dataManifest.listUnits()
+        stats = {'units': len(units), 'rows': 0, 'metaRows': 0}
+        if echo: print(f'Loading {len(units)} units into {self}')
+        # Only the meta data files read in pandas (the market files are read once, by DuckDB, and not through the unitCache)
+        metaParts = [DFtoSQLFormat(pd.read_csv(f"{dataManifest.directory}{ticker}/{ticker}_{interval}_{month}_meta.csv", index_col = 0), 'meta', dataContext = month)
+                     for ticker, interval, month in units]
+        unitFrame = pd.DataFrame(units, columns = ['Ticker', 'Interval', 'Month'])
+        files = [f"{dataManifest.directory}{ticker}/{ticker}_{interval}_{month}.csv" for ticker, interval, month in dataManifest.listUnits(fileFormat = 'csv')]
+        binaryParts = [dataManifest.loadData_frombin(ticker, interval, month, convert_DateTime = True, echo = False).assign(Ticker = ticker, Interval = interval)
+                       for ticker, interval, month in dataManifest.listUnits(fileFormat = 'binary')]
+
+        cursor = self._cursor()
+        try:
+            cursor.execute('BEGIN TRANSACTION;')
+            cursor.register('unitFrame', unitFrame)
+            # Rows of the units replaced (including the rows no longer in their files)
+            cursor.execute('''DELETE FROM "marketTable" WHERE ("Ticker", "Interval", strftime("DateTime", '%Y-%m')) IN
+                              (SELECT ("Ticker", "Interval", "Month") FROM unitFrame);''')
+            if files: # Only the rows of the month of each unit (the rows of a file past its month belong to the next unit)
+                stats['rows'] = cursor.execute(f'''INSERT INTO "marketTable" ("Ticker", "Interval", "DateTime", "Open", "High", "Low", "Close", "Volume")
+                                                   SELECT "Ticker", "Interval", "DateTime", "Open", "High", "Low", "Close", "Volume" FROM ({_fileQuery(files, 'csv')})
+                                                   WHERE strftime("DateTime", '%Y-%m') = "Month";''').fetchone()[0]
+            if binaryParts:
+                cursor.register('binaryFrame', pd.concat(binaryParts, ignore_index = True))
+                stats['rows'] += cursor.execute('''INSERT INTO "marketTable" ("Ticker", "Interval", "DateTime", "Open", "High", "Low", "Close", "Volume")
+                                                   SELECT "Ticker", "Interval", "DateTime", "Open", "High", "Low", "Close", "Volume" FROM binaryFrame;''').fetchone()[0]
+            cursor.execute('COMMIT;')
+        except Exception:
+            cursor.execute('ROLLBACK;')
+            raise
+        finally:
+            cursor.close()
+
+        if metaParts:
+            metaBatch = pd.concat(metaParts, ignore_index = True).drop_duplicates(['2. Symbol', '4. Interval', '7. Month'], keep = 'last')
+            self.save(metaBatch, 'metaTable')
+            stats['metaRows'] = len(metaBatch)
+        self.save(dataManifest.DF, 'manifestTable')
+        unitCache.invalidate(self.source)
+        if echo: print(f"Loaded {stats['units']} units ({stats['rows']} rows).")
+        return stats
+
+    def fileView(self, directory: str, fileFormat = 'csv', name: str = 'fileData'):
+        """
+        This method creates (or replaces) a view over all the market data files of a directory (as DataManifest.directory,
+        ending with '/'), with the columns of the stockData view (Ticker, Interval, DateTime, Open, High, Low, Close, Volume,
+        with the Ticker and Interval from the file names, and a Month column). Queries of the view read the files directly (no
+        load), i.e. query('SELECT "Ticker", avg("Close") FROM "fileData" WHERE "DateTime" >= $start GROUP BY "Ticker";', ...).
+        Inputs:
+        - directory - String of the directory of the data files
+
+        Optional inputs:
+        - fileFormat - String of the files read, 'csv' (the .csv files) or 'parquet' (the columnar cache of DataManifest.buildCache)
+        - name - String of the name of the view
+
+        Note:
+        - The files are listed when the view is queried, so files added later are read too.
+        """
+        if fileFormat not in ('csv', 'parquet'): raise ValueError("The fileFormat must be 'csv' or 'parquet'.")
+        pattern = os.path.join(os.path.abspath(directory), '*', f'*_*_????-??.{fileFormat}') # Not the meta files (_meta.csv)
+        cursor = self._cursor()
+        try:
+            cursor.execute(f'CREATE OR REPLACE VIEW "{name}" AS {_fileQuery([pattern], fileFormat)};')
+        finally:
+            cursor.close()
+
+    def close(self):
+        """
+        This method closes the database (the backend cannot be used after).
+        """
+        self.conn.close()
+
+    @property
+    def source(self) -> tuple:
+        return ('duckdb', self.path if self.path != ':memory:' else f':memory:{self._memoryID}')
+
+
+# Columns of the market and meta rows (as the stockData and metaTable of the PostgreSQL database)
+marketColumns = ['Ticker', 'Interval', 'DateTime', 'Open', 'High', 'Low', 'Close', 'Volume', 'Nominal']
+metaColumns = ['1. Information', 'Ticker', '3. Last Refreshed', '4. Interval', '5. Output Size', '6. Time Zone', '7. Month']
+
+# Tables and views of a DuckDB database (created if they do not exist)
+duckdbSchema = '''
+    CREATE TABLE IF NOT EXISTS "marketTable" (
+        "Ticker" VARCHAR NOT NULL,
+        "Interval" SMALLINT NOT NULL,
+        "DateTime" TIMESTAMP NOT NULL,
+        "Open" DOUBLE,
+        "High" DOUBLE,
+        "Low" DOUBLE,
+        "Close" DOUBLE,
+        "Volume" BIGINT,
+        "Nominal" DOUBLE,
+        PRIMARY KEY ("Ticker", "Interval", "DateTime")
+    );
+    CREATE TABLE IF NOT EXISTS "metaTable" (
+        "1. Information" VARCHAR,
+        "Ticker" VARCHAR NOT NULL,
+        "3. Last Refreshed" TIMESTAMP,
+        "4. Interval" SMALLINT NOT NULL,
+        "5. Output Size" VARCHAR,
+        "6. Time Zone" VARCHAR,
+        "7. Month" VARCHAR NOT NULL,
+        PRIMARY KEY ("Ticker", "4. Interval", "7. Month")
+    );
+    CREATE TABLE IF NOT EXISTS "manifestTable" (
+        "Ticker" VARCHAR NOT NULL,
+        "Interval" SMALLINT NOT NULL,
+        "Month" VARCHAR NOT NULL,
+        "Value" SMALLINT NOT NULL,
+        PRIMARY KEY ("Ticker", "Interval", "Month")
+    );
+    CREATE OR REPLACE VIEW "stockData" AS
+    SELECT "Ticker", "Interval", "DateTime", "Open", "High", "Low", "Close", "Volume", "Nominal" FROM "marketTable";
+    CREATE OR REPLACE VIEW "metaData" AS
+    SELECT "1. Information", "Ticker" AS "2. Symbol", "3. Last Refreshed", CAST("4. Interval" AS VARCHAR) || 'min' AS "4. Interval",
+           "5. Output Size", "6. Time Zone", "7. Month"
+    FROM "metaTable";
+    CREATE OR REPLACE VIEW "manifestData" AS
+    SELECT "Ticker", "Interval", "Month", "Value" FROM "manifestTable";
+    '''
+
+# Table name of a save (as SQLSave, names close to the default table names are changed to them)
+def _tableName(saveTable: str) -> str:
+    if "manif" in saveTable.lower(): return "manifestTable"
+    elif "stock" in saveTable.lower() or "market" in saveTable.lower(): return "marketTable"
+    elif "meta" in saveTable.lower(): return "metaTable"
+    return saveTable
+
+# ORDER BY of the PostgreSQL market query (see _marketQuery) for an order of marketOrders
+def _postgresOrder(order: str) -> str:
+    if order not in marketOrders: raise ValueError(f"The order must be one of {marketOrders}.")
+    if order == 'unit': return 'tickt."Ticker", mt."Interval", date_trunc(\'month\', mt."DateTime"), mt."DateTime" DESC'
+    return 'date_trunc(\'month\', mt."DateTime"), tickt."Ticker", mt."Interval", mt."DateTime" DESC'
+
+# Query of the DuckDB market data between the start/end datetimes, with the Ticker/Interval filters (as list parameters)
+def _duckdbMarketQuery(startDT: pd.Timestamp, endDT: pd.Timestamp, tickers: list = None, intervals: list = None, order = 'unit') -> tuple[str, dict]:
+    if order not in marketOrders: raise ValueError(f"The order must be one of {marketOrders}.")
+    marketQuery = f'''SELECT {', '.join(f'"{col}"' for col in marketColumns)} FROM "marketTable"
+                      WHERE "DateTime" BETWEEN $startDT AND $endDT'''
+    # Whole seconds (the resolution of the stored DateTime), inside the start/end datetimes
+    queryParams = {'startDT': startDT.ceil('s').to_pydatetime(), 'endDT': endDT.floor('s').to_pydatetime()}
+    if tickers is not None:
+        marketQuery += ' AND list_contains(CAST($tickers AS VARCHAR[]), "Ticker")'
+        queryParams['tickers'] = [str(tick) for tick in tickers]
+    if intervals is not None:
+        marketQuery += ' AND list_contains(CAST($intervals AS SMALLINT[]), "Interval")'
+        queryParams['intervals'] = [int(interv) for interv in intervals]
+    if order == 'unit': marketQuery += ' ORDER BY "Ticker", "Interval", date_trunc(\'month\', "DateTime"), "DateTime" DESC'
+    else: marketQuery += ' ORDER BY date_trunc(\'month\', "DateTime"), "Ticker", "Interval", "DateTime" DESC'
+    return marketQuery + ';', queryParams
+
+# Market rows read from DuckDB with the datatypes of the rows read from PostgreSQL (DateTime in nanoseconds, as pd.read_sql)
+def _marketFrame(marketDF: pd.DataFrame) -> pd.DataFrame:
+    return marketDF.astype({'DateTime': 'datetime64[ns]', 'Interval': 'int64'})
+
+# Query of the market data files (paths or glob patterns) of a format, with the Ticker, Interval and Month from the file names
+def _fileQuery(files: Iterable[str], fileFormat = 'csv') -> str:
+    fileList = '[' + ', '.join("'" + str(file).replace("'", "''") + "'" for file in files) + ']'
+    if fileFormat == 'csv': # Layout of the files given (the dialect sniffed from each file costs more than reading it)
+        reader = (f'''read_csv({fileList}, header = true, filename = true, auto_detect = false, delim = ',', columns = {{'DateTime': 'TIMESTAMP',
+                      'Open': 'DOUBLE', 'High': 'DOUBLE', 'Low': 'DOUBLE', 'Close': 'DOUBLE', 'Volume': 'BIGINT'}})''')
+    else: reader = f'read_parquet({fileList}, filename = true)'
+    namePattern = r"'([^/\\]+)_(\d+)_(\d{4}-\d{2})\.[a-z]+$'"
+    return f'''SELECT regexp_extract(filename, {namePattern}, 1) AS "Ticker",
+                      CAST(regexp_extract(filename, {namePattern}, 2) AS SMALLINT) AS "Interval",
+                      CAST("DateTime" AS TIMESTAMP) AS "DateTime", "Open", "High", "Low", "Close", CAST("Volume" AS BIGINT) AS "Volume",
+                      regexp_extract(filename, {namePattern}, 3) AS "Month"
+               FROM {reader}'''
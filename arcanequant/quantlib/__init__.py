@@ -2,10 +2,16 @@ import pandas as pd
 
 # For when 'from quantlib import *' is used
 __all__ = ["DataManifest",
-           "DownloadIntraday", "ExtractData",
-           "SQLSetup", "SQLEstablish", "SQLRepair", "SQLSave", "SQLSync", "SQLClear", "SQLNuke", "SetKeysQuery", "DropKeysQuery", "ExecuteSQL", "DFtoSQLFormat", "SQLtoDFFormat"]
+           "DownloadIntraday", "ExtractData", "ExtractDataUnits", "ExtractDataChunks",
+           "UnitCache", "unitCache", "TickerCache", "tickerCache", "PoolMetrics", "poolMetrics",
+           "SaveBinary", "LoadBinary", "BinaryIndex", "CSVtoBinary",
+           "SQLSetup", "SQLEstablish", "SQLRepair", "SQLMigrate", "SQLManifest", "SQLSave", "SQLSync", "SQLLoad", "SQLClear", "SQLClearUnits", "SQLNuke", "SetKeysQuery", "DropKeysQuery", "DDLPlan", "ExecuteSQL", "DFtoSQLFormat", "SQLtoDFFormat", "CompactFormat", "DateTimeIDs",
+           "StorageBackend", "PostgresBackend", "DuckDBBackend"]
 
 # Relative imports (i.e. from quantlib import DataManifest)
 from .DataManifestManager import DataManifest
-from .DataManager import DownloadIntraday, ExtractData
-from .SQLManager import SQLSetup, SQLEstablish, SQLRepair, SQLSave, SQLSync, SQLClear, SQLNuke, SetKeysQuery, DropKeysQuery, ExecuteSQL, DFtoSQLFormat, SQLtoDFFormat
\ No newline at end of file
+from .DataManager import DownloadIntraday, ExtractData, ExtractDataUnits, ExtractDataChunks
+from .CacheManager import UnitCache, unitCache, TickerCache, tickerCache, PoolMetrics, poolMetrics
+from .BinaryManager import SaveBinary, LoadBinary, BinaryIndex, CSVtoBinary
+from .SQLManager import SQLSetup, SQLEstablish, SQLRepair, SQLMigrate, SQLManifest, SQLSave, SQLSync, SQLLoad, SQLClear, SQLClearUnits, SQLNuke, SetKeysQuery, DropKeysQuery, DDLPlan, ExecuteSQL, DFtoSQLFormat, SQLtoDFFormat, CompactFormat, DateTimeIDs
+from .StorageManager import StorageBackend, PostgresBackend, DuckDBBackend
\ No newline at end of file
@@ -0,0 +1,52 @@
+# Benchmark of the DateID/TimeID derivation of SQLSave, against the number of rows. Compares the previous derivation (parsing
+# the DateTime strings twice, through date/time objects and strings with a regex replace) with DateTimeIDs (one parse, integer
+# arithmetic on the datetime components), from DateTime strings and from already parsed datetime64 values.
+#
+# Run from the repository root (no database needed):
+#   python -m benchmarks.bench_DateTimeIDs
+#   python -m benchmarks.bench_DateTimeIDs --rows 100000 1000000 --repeat 3
+
+# Packages
+import argparse
+import pandas as pd
+
+# My packages
+from arcanequant import DateTimeIDs
+from benchmarks.bench_ExtractData import timeIt
+
+
+# The derivation used previously by SQLSave
+def stringIDs(dateTimes: pd.Series) -> tuple[pd.Series, pd.Series]:
+    dateIDs = pd.to_datetime(dateTimes, format = '%Y-%m-%d %H:%M:%S').dt.date.astype(str).replace('-','', regex=True)
+    timeIDs = pd.to_datetime(dateTimes, format = '%Y-%m-%d %H:%M:%S').dt.time.astype(str).replace(':','', regex=True)
+    return dateIDs, timeIDs
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'DateID/TimeID derivation benchmark')
+    parser.add_argument('--rows', type = int, nargs = '+', default = [100000, 1000000])
+    parser.add_argument('--repeat', type = int, default = 3)
+    args = parser.parse_args()
+
+    results = []
+    for rows in args.rows:
+        parsed = pd.Series(pd.date_range('2000-01-03', periods = rows, freq = '15min'))
+        strings = parsed.dt.strftime("%Y-%m-%d %H:%M:%S")
+
+        # Same IDs (as integers)
+        for previous, current in zip(stringIDs(strings), DateTimeIDs(strings)):
+            assert (previous.astype('int64') == current).all()
+
+        row = {'Rows': rows}
+        row['Strings (s)'] = timeIt(lambda: stringIDs(strings), args.repeat)
+        row['DateTimeIDs strings (s)'] = timeIt(lambda: DateTimeIDs(strings), args.repeat)
+        row['DateTimeIDs datetime64 (s)'] = timeIt(lambda: DateTimeIDs(parsed), args.repeat)
+        row['Speedup strings'] = row['Strings (s)'] / row['DateTimeIDs strings (s)']
+        row['Speedup datetime64'] = row['Strings (s)'] / row['DateTimeIDs datetime64 (s)']
+        results.append(row)
+
+    print(pd.DataFrame(results).set_index('Rows').round(3).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# Benchmark of direct (.csv) extraction with ExtractData, against the number of unit files (ticker, interval, month) read.
+# Compares the previous stitching method (concatenating every unit onto the result inside the loop) with the current
+# single concatenation, read sequentially and with thread/process pools of workers. The last columns are full ExtractData
+# calls (manifest load, stitching and time filtering) with the default sequential read, from the .csv files, from the
+# columnar (parquet/feather) cache, and from the in-memory unit cache (unitCache, disabled for all other columns). The last
+# column reads the same data from the binary series (LoadBinary of every ticker/interval, converted with CSVtoBinary).
+#
+# Run from the repository root (uses a temporary directory of generated data, nothing is written in ./data):
+#   python -m benchmarks.bench_ExtractData
+#   python -m benchmarks.bench_ExtractData --units 12 48 192 --rows 2000 --workers 2 4 8
+
+# Packages
+import argparse
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+# My packages
+from arcanequant import DataManifest, ExtractData, unitCache, LoadBinary, CSVtoBinary
+from arcanequant.quantlib.DataManager import _loadUnits
+
+
+# Creates a direct data directory of random unit files with a manifest indicating them
+def makeDataTree(directory: str, nUnits: int, rows: int) -> DataManifest:
+    manifest = DataManifest()
+    manifest.directory = directory
+
+    tickers = [f"T{i:03d}" for i in range(max(1, nUnits // 24) + 1)]
+    months = list(pd.date_range('2022-01', periods = 24, freq = 'MS').strftime("%Y-%m"))
+    rng = np.random.default_rng(0)
+
+    count = 0
+    for tick in tickers:
+        for month in months:
+            if count == nUnits: break
+            # Descending DateTime (as given by the API)
+            dateTimes = pd.date_range(month, periods = rows, freq = '15min')[::-1].strftime("%Y-%m-%d %H:%M:%S")
+            prices = rng.uniform(100, 200, size = (rows, 4)).round(4)
+            unitDF = pd.DataFrame({'DateTime': dateTimes, 'Open': prices[:,0], 'High': prices[:,1], 'Low': prices[:,2],
+                                   'Close': prices[:,3], 'Volume': rng.integers(1000, 100000, size = rows)})
+            unitPath = f"{directory}{tick}/"
+            Path(unitPath).mkdir(parents = True, exist_ok = True)
+            unitDF.to_csv(f"{unitPath}{tick}_15_{month}.csv", index = False)
+            manifest.setValue(tick, 15, month, 1, sort = False)
+            count += 1
+
+    manifest.saveManifest(savePath = directory, echo = False)
+    return manifest
+
+# The stitching method used previously (concatenation inside the loop, copying the growing result every time)
+def loopConcat(manifest: DataManifest) -> pd.DataFrame:
+    resultDF = pd.DataFrame()
+    for tick, interv, month in manifest.listUnits():
+        addDF = manifest.loadData_fromcsv(tick, interv, month, echo = False)
+        addDF.insert(0, 'Ticker', tick)
+        addDF.insert(1, 'Interval', interv)
+        resultDF = pd.concat([resultDF, addDF], axis = 0, ignore_index = True)
+    return resultDF
+
+# The current stitching method (all units read first, then a single concatenation)
+def singleConcat(manifest: DataManifest, workers: int = None, poolType = 'thread') -> pd.DataFrame:
+    parts = _loadUnits(manifest, manifest.listUnits(), workers = workers, poolType = poolType)
+    return pd.concat(parts, axis = 0, ignore_index = True)
+
+def timeIt(function, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'ExtractData direct loading benchmark')
+    parser.add_argument('--units', type = int, nargs = '+', default = [6, 24, 96, 192])
+    parser.add_argument('--rows', type = int, default = 1500, help = 'Rows per unit file')
+    parser.add_argument('--workers', type = int, nargs = '+', default = [2, 4])
+    parser.add_argument('--repeat', type = int, default = 3)
+    args = parser.parse_args()
+
+    unitCacheBytes = unitCache.maxBytes
+    unitCache.maxBytes = 0 # Disabled, except for its own column
+
+    results = []
+    for nUnits in args.units:
+        with tempfile.TemporaryDirectory() as tmp:
+            manifest = makeDataTree(tmp + "/", nUnits, args.rows)
+
+            row = {'Units': nUnits, 'Rows': nUnits * args.rows}
+            row['Loop concat (s)'] = timeIt(lambda: loopConcat(manifest), args.repeat)
+            row['Single concat (s)'] = timeIt(lambda: singleConcat(manifest), args.repeat)
+            for workers in args.workers:
+                for poolType in ('thread', 'process'):
+                    row[f'{workers} {poolType} (s)'] = timeIt(lambda: singleConcat(manifest, workers, poolType), args.repeat)
+            row['ExtractData (s)'] = timeIt(lambda: ExtractData('market', 'all', 'all', manifest, postProcess = False), args.repeat)
+            for cacheFormat in ('parquet', 'feather'):
+                manifest.buildCache(cacheFormat, echo = False)
+                row[f'ExtractData {cacheFormat} (s)'] = timeIt(lambda: ExtractData('market', 'all', 'all', manifest, postProcess = False), args.repeat)
+            manifest.cacheFormat = None
+
+            unitCache.maxBytes = unitCacheBytes
+            ExtractData('market', 'all', 'all', manifest, postProcess = False) # Warm up
+            row['ExtractData unit cache (s)'] = timeIt(lambda: ExtractData('market', 'all', 'all', manifest, postProcess = False), args.repeat)
+            unitCache.maxBytes = 0
+            unitCache.clear()
+
+            CSVtoBinary(manifest, echo = False)
+            series = list(dict.fromkeys((tick, interv) for tick, interv, _ in manifest.listUnits()))
+            row['LoadBinary (s)'] = timeIt(lambda: pd.concat([LoadBinary(manifest.directory, tick, interv) for tick, interv in series]), args.repeat)
+            results.append(row)
+
+    print(pd.DataFrame(results).set_index('Units').round(3).to_string())
+
+
+if __name__ == "__main__":
+    main()
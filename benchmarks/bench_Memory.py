@@ -0,0 +1,52 @@
+# Memory report of the market data returned by ExtractData (direct, .csv), against the number of unit files read.
+# Compares the default output (DateTime as strings), the output with convertDatetime and the compact output (compact, see
+# CompactFormat), giving the deep memory usage of each (and per row) with the time taken to extract it.
+#
+# Run from the repository root (uses a temporary directory of generated data, nothing is written in ./data):
+#   python -m benchmarks.bench_Memory
+#   python -m benchmarks.bench_Memory --units 24 96 --rows 2000
+
+# Packages
+import argparse
+import tempfile
+import time
+import pandas as pd
+
+# My packages
+from arcanequant import ExtractData, unitCache
+from benchmarks.bench_ExtractData import makeDataTree
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'ExtractData memory report')
+    parser.add_argument('--units', type = int, nargs = '+', default = [24, 96])
+    parser.add_argument('--rows', type = int, default = 1500, help = 'Rows per unit file')
+    args = parser.parse_args()
+
+    unitCache.maxBytes = 0 # Read the files every time
+
+    modes = {'Default': {}, 'convertDatetime': {'convertDatetime': True}, 'Compact': {'compact': True}}
+    results = []
+    for nUnits in args.units:
+        with tempfile.TemporaryDirectory() as tmp:
+            manifest = makeDataTree(tmp + "/", nUnits, args.rows)
+
+            for mode, options in modes.items():
+                start = time.perf_counter()
+                resultDF = ExtractData('market', 'all', 'all', manifest, **options)
+                elapsed = time.perf_counter() - start
+
+                memory = resultDF.memory_usage(index = True, deep = True)
+                results.append({'Units': nUnits, 'Mode': mode, 'Rows': len(resultDF), 'Memory (MB)': memory.sum() / 1024**2,
+                                'Bytes/row': memory.sum() / max(1, len(resultDF)), 'Time (s)': elapsed,
+                                'Dtypes': ', '.join(f"{col}:{dtype}" for col, dtype in resultDF.dtypes.items())})
+
+    report = pd.DataFrame(results).set_index(['Units', 'Mode'])
+    print(report.drop(columns = 'Dtypes').round(3).to_string())
+    print()
+    for mode, dtypes in report['Dtypes'].xs(args.units[-1], level = 'Units').items():
+        print(f"{mode}: {dtypes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# Benchmark of market reads from SQL, against the number of rows read. Compares the previous read (the DateTime of each row
+# rebuilt by joining the marketTable with the dateTable and timeTable, as the stockData view did) with the read of the stored
+# DateTime of the marketTable (as ExtractData does), both over the whole time range and over one month of all units.
+#
+# Needs a database to connect to (a login file as used by DataManifest.connectSQL). ⚠️ The tables of the database are
+# established (SQLEstablish, dropping any existing ones) and dropped at the end, only use a test database. Run from the
+# repository root (uses a temporary directory of generated data, nothing is written in ./data):
+#   python -m benchmarks.bench_SQLExtract
+#   python -m benchmarks.bench_SQLExtract --units 48 --rows 5000 --repeat 3
+
+# Packages
+import argparse
+import tempfile
+import pandas as pd
+
+# My packages
+from arcanequant import SQLEstablish, SQLSetup, SQLSync, ExecuteSQL, unitCache
+from arcanequant.quantlib.DataManager import _marketQuery, _periodBounds
+from benchmarks.bench_ExtractData import makeDataTree, timeIt
+from benchmarks.bench_SQLSync import makeMetaFiles
+
+# The previous read (DateTime from the date/time dimension tables)
+joinQuery = '''SELECT tickt."Ticker", mt."Interval", (dt."Date" + tt."Time") AS "DateTime",
+                   mt."Open", mt."High", mt."Low", mt."Close", mt."Volume", mt."Nominal"
+               FROM "marketTable" mt
+               JOIN "dateTable" dt ON dt."DateID" = mt."DateID"
+               JOIN "timeTable" tt ON tt."TimeID" = mt."TimeID"
+               JOIN "tickerTable" tickt ON tickt."TickerID" = mt."TickerID"
+               WHERE (dt."Date" + tt."Time") BETWEEN %(startDT)s AND %(endDT)s;'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'SQL market read benchmark')
+    parser.add_argument('--units', type = int, default = 24)
+    parser.add_argument('--rows', type = int, default = 5000, help = 'Rows per unit file')
+    parser.add_argument('--repeat', type = int, default = 3)
+    parser.add_argument('--login', default = 'testSQLlogin', help = 'Login file name (as DataManifest.connectSQL)')
+    args = parser.parse_args()
+
+    unitCache.maxBytes = 0 # Read the files every time
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest = makeDataTree(tmp + "/", args.units, args.rows)
+        makeMetaFiles(manifest)
+        manifest.connectSQL(args.login)
+        SQLEstablish(manifest.SQLengine)
+        SQLSetup(manifest.SQLengine, new = False)
+
+        try:
+            SQLSync(manifest, fastSync = True)
+            ExecuteSQL('ANALYZE "marketTable";', manifest.SQLengine)
+            firstMonth = manifest.DF.columns[0]
+            for label, (start, end) in {'All': ('all', 'all'), 'Month': (firstMonth, firstMonth)}.items():
+                startDT, endDT = _periodBounds(start, end)
+                marketQuery, queryParams = _marketQuery(startDT, endDT)
+                joinParams = {'startDT': startDT.ceil('s').to_pydatetime(), 'endDT': endDT.floor('s').to_pydatetime()}
+
+                rows = len(pd.read_sql(marketQuery, manifest.SQLengine, params = queryParams))
+                assert rows == len(pd.read_sql(joinQuery, manifest.SQLengine, params = joinParams))
+                row = {'Range': label, 'Rows': rows}
+                row['Joins (s)'] = timeIt(lambda: pd.read_sql(joinQuery, manifest.SQLengine, params = joinParams), args.repeat)
+                row['Stored DateTime (s)'] = timeIt(lambda: pd.read_sql(marketQuery, manifest.SQLengine, params = queryParams), args.repeat)
+                row['Speedup'] = row['Joins (s)'] / row['Stored DateTime (s)']
+                results.append(row)
+        finally:
+            ExecuteSQL('''
+                        DROP TABLE IF EXISTS "tickerTable" CASCADE;
+                        DROP TABLE IF EXISTS "marketTable" CASCADE;
+                        DROP TABLE IF EXISTS "metaTable" CASCADE;
+                        DROP TABLE IF EXISTS "dateTable" CASCADE;
+                        DROP TABLE IF EXISTS "timeTable" CASCADE;
+                        DROP TABLE IF EXISTS "manifestTable" CASCADE;
+                        DROP TABLE IF EXISTS "syncLedger" CASCADE;
+                        DROP TABLE IF EXISTS "deferredKeys" CASCADE;
+                        ''', manifest.SQLengine)
+
+    print(pd.DataFrame(results).set_index('Range').round(3).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# Benchmark of SQLSave upserts into a market-like table (primary key of TickerID, Interval, DateID, TimeID), against the
+# number of rows saved. Compares the INSERT ... VALUES upsert (loadMethod = 'insert', postgres_upsert) with the COPY into a
+# staging table then INSERT ... SELECT upsert (loadMethod = 'copy', postgres_copy_upsert), both for new rows (insert) and
+# for rows that all exist already (update), giving the rows per second of each.
+#
+# Needs a database to connect to (a login file as used by DataManifest.connectSQL), the benchmark table is created and
+# dropped in it (nothing else is changed). Run from the repository root:
+#   python -m benchmarks.bench_SQLSave
+#   python -m benchmarks.bench_SQLSave --rows 10000 100000 500000 --login testSQLlogin
+
+# Packages
+import argparse
+import time
+import numpy as np
+import pandas as pd
+
+# My packages
+from arcanequant import DataManifest, SQLSave, ExecuteSQL
+
+benchTable = 'benchSaveTable'
+
+
+# Creates random market rows (as saved by SQLSync, with TickerID instead of Ticker)
+def makeRows(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    prices = rng.uniform(100, 200, size = (rows, 4)).round(4)
+    return pd.DataFrame({'TickerID': 1, 'Interval': 15,
+                         'DateTime': pd.date_range('2000-01-03', periods = rows, freq = '15min').strftime("%Y-%m-%d %H:%M:%S"),
+                         'Open': prices[:,0], 'High': prices[:,1], 'Low': prices[:,2], 'Close': prices[:,3],
+                         'Volume': rng.integers(1000, 100000, size = rows), 'Nominal': np.nan})
+
+def resetTable(engine):
+    ExecuteSQL(f'''
+                DROP TABLE IF EXISTS "{benchTable}";
+                CREATE TABLE "{benchTable}" (
+                    "DateID" INT NOT NULL, "TimeID" INT NOT NULL, "TickerID" SMALLINT NOT NULL, "Interval" SMALLINT NOT NULL,
+                    "Open" FLOAT, "High" FLOAT, "Low" FLOAT, "Close" FLOAT, "Volume" BIGINT, "Nominal" FLOAT,
+                    CONSTRAINT "{benchTable}_pkey" PRIMARY KEY ("TickerID", "Interval", "DateID", "TimeID")
+                );''', engine)
+
+def timeSave(saveDF: pd.DataFrame, engine, loadMethod: str) -> float:
+    start = time.perf_counter()
+    SQLSave(saveDF, engine, benchTable, loadMethod = loadMethod)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'SQLSave upsert benchmark')
+    parser.add_argument('--rows', type = int, nargs = '+', default = [10000, 100000])
+    parser.add_argument('--login', default = 'testSQLlogin', help = 'Login file name (as DataManifest.connectSQL)')
+    args = parser.parse_args()
+
+    manifest = DataManifest()
+    manifest.connectSQL(args.login)
+    engine = manifest.SQLengine
+
+    results = []
+    try:
+        for rows in args.rows:
+            saveDF = makeRows(rows)
+            row = {'Rows': rows}
+            for loadMethod in ('insert', 'copy'):
+                resetTable(engine)
+                insertTime = timeSave(saveDF, engine, loadMethod) # New rows
+                updateTime = timeSave(saveDF, engine, loadMethod) # All rows conflict (updated)
+                row[f'{loadMethod} insert (rows/s)'] = rows / insertTime
+                row[f'{loadMethod} update (rows/s)'] = rows / updateTime
+            row['Speedup insert'] = row['copy insert (rows/s)'] / row['insert insert (rows/s)']
+            row['Speedup update'] = row['copy update (rows/s)'] / row['insert update (rows/s)']
+            results.append(row)
+    finally:
+        ExecuteSQL(f'DROP TABLE IF EXISTS "{benchTable}";', engine)
+
+    print(pd.DataFrame(results).set_index('Rows').round(1).to_string())
+
+
+if __name__ == "__main__":
+    main()
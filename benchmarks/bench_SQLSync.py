@@ -0,0 +1,79 @@
+# Benchmark of SQLSync of a generated .csv data tree into SQL, against the number of worker processes, with the keys kept
+# during the load and with the keys deferred (deferKeys, secondary indexes and foreign keys rebuilt after the load). Each run
+# clears the database and syncs every unit (ticker, interval, month) again, giving the rows per second (including the rebuild
+# of deferred keys) and the speedup over the sync in this process with the keys kept (workers = 1, batches in a single
+# transaction). The scaling is bounded by the cores of the machine (and of the database server, if on the same machine).
+#
+# Needs a database to connect to (a login file as used by DataManifest.connectSQL). ⚠️ The tables of the database are
+# established (SQLEstablish, dropping any existing ones) and dropped at the end, only use a test database. Run from the
+# repository root (uses a temporary directory of generated data, nothing is written in ./data):
+#   python -m benchmarks.bench_SQLSync
+#   python -m benchmarks.bench_SQLSync --units 96 --rows 2000 --workers 1 2 4 8 --batch 8 --deferKeys 0 1
+
+# Packages
+import argparse
+import os
+import tempfile
+import pandas as pd
+
+# My packages
+from arcanequant import SQLEstablish, SQLSetup, SQLSync, ExecuteSQL, unitCache
+from benchmarks.bench_ExtractData import makeDataTree
+
+
+# Writes the meta data file of every unit of the manifest (as downloaded, needed by the sync)
+def makeMetaFiles(manifest):
+    for tick, interv, month in manifest.listUnits():
+        lastRefresh = (pd.Period(month).end_time.floor('D') + pd.Timedelta(hours = 19, minutes = 45)).strftime("%Y-%m-%d %H:%M:%S")
+        metaDF = pd.DataFrame({'Meta Data': [f'Intraday ({interv}min) open, high, low, close prices and volume', tick, lastRefresh,
+                                             f'{interv}min', 'Full size', 'US/Eastern']},
+                              index = ['1. Information', '2. Symbol', '3. Last Refreshed', '4. Interval', '5. Output Size', '6. Time Zone'])
+        metaDF.to_csv(f"{manifest.directory}{tick}/{tick}_{interv}_{month}_meta.csv")
+
+
+def main():
+    parser = argparse.ArgumentParser(description = 'SQLSync workers benchmark')
+    parser.add_argument('--units', type = int, default = 48)
+    parser.add_argument('--rows', type = int, default = 1500, help = 'Rows per unit file')
+    parser.add_argument('--workers', type = int, nargs = '+', default = [1, 2, 4])
+    parser.add_argument('--batch', type = int, default = 4, help = 'Units per batch')
+    parser.add_argument('--deferKeys', type = int, nargs = '+', default = [0, 1], help = 'Keys kept (0) and/or deferred (1)')
+    parser.add_argument('--login', default = 'testSQLlogin', help = 'Login file name (as DataManifest.connectSQL)')
+    args = parser.parse_args()
+
+    unitCache.maxBytes = 0 # Read the files every time
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest = makeDataTree(tmp + "/", args.units, args.rows)
+        makeMetaFiles(manifest)
+        manifest.connectSQL(args.login)
+        SQLEstablish(manifest.SQLengine)
+        SQLSetup(manifest.SQLengine, new = False)
+
+        try:
+            for workers in args.workers:
+                for deferKeys in args.deferKeys:
+                    stats = SQLSync(manifest, fastSync = False, batchSize = args.batch, workers = workers, deferKeys = bool(deferKeys))
+                    results.append({'Workers': workers, 'Deferred keys': bool(deferKeys), 'Units': stats['units'], 'Rows': stats['rows'],
+                                    'Time (s)': stats['seconds'], 'Keys (s)': stats['keySeconds'], 'Rows/s': stats['rowsPerSec']})
+        finally:
+            ExecuteSQL('''
+                        DROP TABLE IF EXISTS "tickerTable" CASCADE;
+                        DROP TABLE IF EXISTS "marketTable" CASCADE;
+                        DROP TABLE IF EXISTS "metaTable" CASCADE;
+                        DROP TABLE IF EXISTS "dateTable" CASCADE;
+                        DROP TABLE IF EXISTS "timeTable" CASCADE;
+                        DROP TABLE IF EXISTS "manifestTable" CASCADE;
+                        DROP TABLE IF EXISTS "syncLedger" CASCADE;
+                        DROP TABLE IF EXISTS "deferredKeys" CASCADE;
+                        ''', manifest.SQLengine)
+
+    report = pd.DataFrame(results).set_index(['Workers', 'Deferred keys'])
+    report['Speedup'] = report['Rows/s'] / report['Rows/s'].iloc[0]
+    print(f'Cores: {os.cpu_count()}')
+    print(report.round(2).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# Benchmark of the storage backends, for a range query (the market rows of one month, of all units) and an aggregate query
+# (row count, mean Close and total Volume per ticker/interval over the whole range). Compares the direct data (ExtractData
+# of the .csv files, aggregated in pandas), the PostgreSQL database (ExtractData fromSQL, aggregated by the server), the
+# embedded DuckDB database (ExtractData fromSQL through DataManifest.storage, aggregated in the process) and DuckDB queries
+# directly over the .csv files (DuckDBBackend.fileView, nothing loaded). Also gives the time to load the data into each database.
+#
+# The PostgreSQL part needs a database to connect to (a login file as used by DataManifest.connectSQL). ⚠️ The tables of
+# the database are established (SQLEstablish, dropping any existing ones) and dropped at the end, only use a test database
+# (or skip it with --skipPostgres). Needs duckdb installed. Run from the repository root (uses a temporary directory of
+# generated data, nothing is written in ./data):
+#   python -m benchmarks.bench_Storage
+#   python -m benchmarks.bench_Storage --units 48 --rows 2000 --repeat 3 --skipPostgres
+
+# Packages
+import argparse
+import copy
+import tempfile
+import time
+import pandas as pd
+
+# My packages
+from arcanequant import ExtractData, SQLEstablish, SQLSetup, SQLSync, ExecuteSQL, unitCache
+from benchmarks.bench_ExtractData import makeDataTree, timeIt
+from benchmarks.bench_SQLSync import makeMetaFiles
+
+# Aggregate query (of the stockData view in the databases, of the file view over the .csv files)
+aggregateQuery = '''SELECT "Ticker", "Interval", COUNT(*) AS "rows", avg("Close") AS "meanClose", sum("Volume") AS "volume"
+                    FROM "{view}" GROUP BY "Ticker", "Interval";'''
+# Range query over the .csv files (the rows of a month)
+fileRangeQuery = '''SELECT "Ticker", "Interval", "DateTime", "Open", "High", "Low", "Close", "Volume" FROM "fileData"
+                    WHERE "DateTime" >= $start AND "DateTime" < $end;'''
+
+
+def pandasAggregate(manifest) -> pd.DataFrame:
+    marketDF = ExtractData('market', 'all', 'all', manifest)
+    return marketDF.groupby(['Ticker', 'Interval'], as_index = False).agg(rows = ('Close', 'size'), meanClose = ('Close', 'mean'), volume = ('Volume', 'sum'))
+
+def main():
+    parser = argparse.ArgumentParser(description = 'Storage backend benchmark')
+    parser.add_argument('--units', type = int, default = 24)
+    parser.add_argument('--rows', type = int, default = 2000, help = 'Rows per unit file (at most 2976 to stay within a month)')
+    parser.add_argument('--repeat', type = int, default = 3)
+    parser.add_argument('--login', default = 'testSQLlogin', help = 'Login file name (as DataManifest.connectSQL)')
+    parser.add_argument('--skipPostgres', action = 'store_true', help = 'Do not benchmark the PostgreSQL database')
+    args = parser.parse_args()
+
+    unitCache.maxBytes = 0 # Read the data every time
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest = makeDataTree(tmp + "/", args.units, args.rows)
+        makeMetaFiles(manifest)
+        month = manifest.DF.columns[0]
+        monthBounds = {'start': pd.Timestamp(month).to_pydatetime(), 'end': (pd.Timestamp(month) + pd.offsets.MonthBegin(1)).to_pydatetime()}
+        rangeRows = len(ExtractData('market', month, month, manifest))
+        results['CSV (pandas)'] = {'Load (s)': 0.0,
+                                   'Range (s)': timeIt(lambda: ExtractData('market', month, month, manifest), args.repeat),
+                                   'Aggregate (s)': timeIt(lambda: pandasAggregate(manifest), args.repeat)}
+
+        # Embedded DuckDB database (loaded from the .csv files), and DuckDB over the .csv files
+        duckManifest = copy.copy(manifest)
+        duckManifest.connectDuckDB(echo = False)
+        loadStart = time.perf_counter()
+        duckManifest.storage.sync(duckManifest)
+        loadSeconds = time.perf_counter() - loadStart
+        assert len(ExtractData('market', month, month, duckManifest, fromSQL = True)) == rangeRows
+        results['DuckDB'] = {'Load (s)': loadSeconds,
+                             'Range (s)': timeIt(lambda: ExtractData('market', month, month, duckManifest, fromSQL = True), args.repeat),
+                             'Aggregate (s)': timeIt(lambda: duckManifest.storage.query(aggregateQuery.format(view = 'stockData')), args.repeat)}
+        duckManifest.storage.fileView(manifest.directory)
+        assert len(duckManifest.storage.query(fileRangeQuery, monthBounds)) == rangeRows
+        results['DuckDB (files)'] = {'Load (s)': 0.0,
+                                     'Range (s)': timeIt(lambda: duckManifest.storage.query(fileRangeQuery, monthBounds), args.repeat),
+                                     'Aggregate (s)': timeIt(lambda: duckManifest.storage.query(aggregateQuery.format(view = 'fileData')), args.repeat)}
+        duckManifest.storage.close()
+
+        if not args.skipPostgres:
+            manifest.connectSQL(args.login)
+            SQLEstablish(manifest.SQLengine)
+            SQLSetup(manifest.SQLengine, new = False)
+            try:
+                loadStart = time.perf_counter()
+                SQLSync(manifest, fastSync = True)
+                ExecuteSQL('ANALYZE "marketTable";', manifest.SQLengine)
+                loadSeconds = time.perf_counter() - loadStart
+                assert len(ExtractData('market', month, month, manifest, fromSQL = True)) == rangeRows
+                results['PostgreSQL'] = {'Load (s)': loadSeconds,
+                                         'Range (s)': timeIt(lambda: ExtractData('market', month, month, manifest, fromSQL = True), args.repeat),
+                                         'Aggregate (s)': timeIt(lambda: pd.read_sql(aggregateQuery.format(view = 'stockData'), manifest.SQLengine), args.repeat)}
+            finally:
+                ExecuteSQL('''
+                            DROP TABLE IF EXISTS "tickerTable" CASCADE;
+                            DROP TABLE IF EXISTS "marketTable" CASCADE;
+                            DROP TABLE IF EXISTS "metaTable" CASCADE;
+                            DROP TABLE IF EXISTS "dateTable" CASCADE;
+                            DROP TABLE IF EXISTS "timeTable" CASCADE;
+                            DROP TABLE IF EXISTS "manifestTable" CASCADE;
+                            DROP TABLE IF EXISTS "syncLedger" CASCADE;
+                            DROP TABLE IF EXISTS "deferredKeys" CASCADE;
+                            ''', manifest.SQLengine)
+
+    resultDF = pd.DataFrame.from_dict(results, orient = 'index')
+    resultDF.index.name = f'Storage ({rangeRows} range rows)'
+    print(resultDF.round(3).to_string())
+
+
+if __name__ == "__main__":
+    main()
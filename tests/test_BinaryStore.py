@@ -0,0 +1,98 @@
+# Testing of the binary store (BinaryManager), converting the test directory .csv files into binary series and comparing
+# the data read back from the series with the data read from the .csv files, and downloading the test units in binary form.
+
+# Packages
+import pytest
+from pathlib import Path
+import numpy as np
+import pandas as pd
+
+# My packages
+from arcanequant import DataManifest, ExtractData, SaveBinary, LoadBinary, BinaryIndex, CSVtoBinary, DownloadIntraday
+from arcanequant.quantlib import DataManager
+from arcanequant.quantlib.BinaryManager import _readSeries
+from test_ExtractData import setup_directManifest, testTickers, testMonths
+
+################################################################
+###################### BINARY STORE TEST #######################
+################################################################
+# Test by:
+# Converting the test directory into binary series, then reading every unit (and a time range) from the series and from the
+# .csv files, and replacing a month of a series. Then downloading the test units in binary form (API responses made from the
+# test files), and extracting them as from the .csv files
+
+######################### TEST FUNCTION ########################
+@pytest.mark.parametrize("convertDatetime", [False, True])
+def test_BinaryStore(convertDatetime, setup_directManifest: DataManifest):
+    manifest = setup_directManifest
+    assert CSVtoBinary(manifest, echo = False) == len(testTickers)
+
+    for ticker, interval, month in manifest.listUnits():
+        binDF, binMetaDF = manifest.loadData_frombin(ticker, interval, month, convert_DateTime = convertDatetime, meta = True, echo = False)
+        csvDF, csvMetaDF = manifest.loadData_fromcsv(ticker, interval, month, convert_DateTime = convertDatetime, meta = True, echo = False)
+        pd.testing.assert_frame_equal(binDF, csvDF)
+        pd.testing.assert_frame_equal(binMetaDF, csvMetaDF)
+
+    # A time range is a slice of the memory-mapped series
+    records = LoadBinary(manifest.directory, 'MSFT', 15, '2022-01-15', '2022-03', asFrame = False)
+    assert isinstance(records, np.memmap)
+    expected = ExtractData('market', '2022-01-15', '2022-03', manifest, convertDatetime = True, Ticker = 'MSFT')
+    pd.testing.assert_frame_equal(LoadBinary(manifest.directory, 'MSFT', 15, '2022-01-15', '2022-03'),
+                                  expected.sort_values('DateTime', ignore_index = True))
+
+    manifest.validateManifest(source = 'binary', echo = False)
+    assert (manifest.DF[testMonths] == 1).all().all()
+
+def test_SaveBinary(setup_directManifest: DataManifest):
+    manifest = setup_directManifest
+    CSVtoBinary(manifest, echo = False)
+    before = BinaryIndex(manifest.directory, 'NVDA', 15)
+    beforeIndex, beforeRecords = _readSeries(manifest.directory, 'NVDA', 15)
+
+    # Replace a month with its first two rows, and clear another month
+    monthDF = manifest.loadData_fromcsv('NVDA', 15, '2022-02', echo = False).iloc[:2]
+    index = SaveBinary(monthDF, manifest.directory, 'NVDA', 15, months = '2022-04')
+    # A reader of the series before the save keeps its index with its records (the index is in the series file)
+    assert beforeIndex == before and len(beforeRecords) == before['rows']
+    assert not list(Path(manifest.directory).glob('*/*_index.json'))
+    assert list(index['months']) == ['2022-01', '2022-02', '2022-03']
+    assert index['months']['2022-01'] == before['months']['2022-01']
+    assert index['rows'] == before['months']['2022-03'][1] - (before['months']['2022-03'][0] - before['months']['2022-02'][0]) + 2
+    pd.testing.assert_frame_equal(manifest.loadData_frombin('NVDA', 15, '2022-02', echo = False), monthDF)
+    with pytest.raises(FileNotFoundError):
+        manifest.loadData_frombin('NVDA', 15, '2022-04', echo = False)
+
+    # A file without the header of a series (i.e. records only) is not read as a series
+    Path(f"{manifest.directory}NVDA/NVDA_30.bin").write_bytes(beforeRecords.tobytes())
+    with pytest.raises(ValueError):
+        BinaryIndex(manifest.directory, 'NVDA', 30)
+
+#########################
+
+# Units downloaded in binary form are recorded as such, and read from their series (ExtractData, validateManifest)
+def test_DownloadIntraday_binary(setup_directManifest: DataManifest, tmp_path, monkeypatch):
+    csvManifest = setup_directManifest
+
+    # API response of a unit, made from its test files
+    def apiResponse(url: str):
+        query = dict(part.split('=') for part in url.split('?')[1].strip().split('&'))
+        ticker, interval, month = query['symbol'], int(query['interval'].removesuffix('min')), query['month']
+        dataDF, metaDF = csvManifest.loadData_fromcsv(ticker, interval, month, meta = True, echo = False)
+        series = {row['DateTime']: {'1. open': str(row['Open']), '2. high': str(row['High']), '3. low': str(row['Low']),
+                                    '4. close': str(row['Close']), '5. volume': str(row['Volume'])} for _, row in dataDF.iterrows()}
+        return type('Response', (), {'json': lambda self: {'Meta Data': metaDF['Meta Data'].to_dict(), f'Time Series ({interval}min)': series}})()
+    monkeypatch.setattr(DataManager.requests, 'get', apiResponse)
+
+    DownloadIntraday(testTickers, [15], testMonths, 'testKey', saveMode = 'binary', savePath = f"{tmp_path}/")
+    assert not list(tmp_path.glob('*/*_15_2022-0?.csv')) # Only the meta data files
+    manifest = DataManifest()
+    manifest.loadManifest(path = f"{tmp_path}/", echo = False)
+    assert manifest.listUnits(fileFormat = 'binary') == csvManifest.listUnits()
+
+    for start, end, filters in [('all', 'all', {}), ('2022-01-15', '2022-03', {'Ticker': 'MSFT'})]:
+        expected = ExtractData('market', start, end, csvManifest, convertDatetime = True, **filters)
+        pd.testing.assert_frame_equal(ExtractData('market', start, end, manifest, convertDatetime = True, **filters), expected)
+    pd.testing.assert_frame_equal(ExtractData('meta', 'all', 'all', manifest), ExtractData('meta', 'all', 'all', csvManifest))
+
+    manifest.validateManifest(fastValidate = False, echo = False)
+    assert (manifest.DF[testMonths] == 1).all().all()
@@ -0,0 +1,176 @@
+# Testing of ExtractData with direct data (.csv files and .json manifest), using a copy of part of the stored data.
+# Tests that the different ways of loading the data all give the same output.
+
+# Packages
+import pytest
+import shutil
+from pathlib import Path
+import pandas as pd
+
+# My packages
+from arcanequant import DataManifest, ExtractData, ExtractDataUnits, ExtractDataChunks, unitCache, CompactFormat
+
+################################################################
+#################### DIRECT EXTRACTION TEST ####################
+################################################################
+# Test by:
+# Extracting market and meta data for ranges in the test directory, with the default (sequential) read and comparing
+# the output to the output with the workers read in parallel, and to the output read from the columnar cache
+
+################ TEST INPUTS ###############
+dataDirectory = Path(__file__).resolve().parents[1] / 'data' / 'StockHistData'
+testTickers = ['MSFT', 'NVDA']
+testMonths = ['2022-01', '2022-02', '2022-03', '2022-04']
+
+# (targetData, start, end)
+testRanges = [('market', '2022-01-15', '2022-03'), ('stock', 'all', 'all'), ('meta', '2022-02', '2022-04')]
+# (workers, poolType)
+testPools = [(4, 'thread'), (2, 'process')]
+# (filters given as kwargs, filterSpec)
+testFilters = [({'Ticker': 'MSFT'}, None), ({'Interval': 15}, {'Ticker': ['NVDA']}), ({}, {'Ticker': ('MSFT', 'NVDA'), 'Interval': [15]}),
+               ({'Ticker': 'AAPL'}, None), ({'Interval': 30}, None)]
+
+######################### TEST FUNCTION ########################
+@pytest.mark.parametrize("targetData,start,end", testRanges)
+@pytest.mark.parametrize("workers,poolType", testPools)
+def test_ExtractData_parallel(targetData, start, end, workers, poolType, setup_directManifest: DataManifest):
+    expected = ExtractData(targetData, start, end, setup_directManifest)
+    result = ExtractData(targetData, start, end, setup_directManifest, workers = workers, poolType = poolType)
+
+    assert not expected.empty
+    pd.testing.assert_frame_equal(result, expected)
+
+@pytest.mark.parametrize("cacheFormat", ['parquet', 'feather'])
+@pytest.mark.parametrize("convertDatetime", [False, True])
+def test_ExtractData_cache(cacheFormat, convertDatetime, setup_directManifest: DataManifest, monkeypatch):
+    monkeypatch.setattr(unitCache, 'maxBytes', 0) # Read the files (not the units kept in memory)
+    expected = ExtractData('market', '2022-01-15', '2022-03', setup_directManifest, convertDatetime = convertDatetime)
+
+    cacheManifest = DataManifest()
+    cacheManifest.loadManifest(path = setup_directManifest.directory, echo = False)
+    assert cacheManifest.buildCache(cacheFormat, rebuild = True, echo = False) == len(cacheManifest.listUnits())
+    assert cacheManifest.buildCache(echo = False) == 0 # All fresh
+
+    result = ExtractData('market', '2022-01-15', '2022-03', cacheManifest, convertDatetime = convertDatetime)
+    pd.testing.assert_frame_equal(result, expected)
+
+    # Changing a .csv file makes its cache stale (read from the .csv again)
+    csvPath = f"{cacheManifest.directory}MSFT/MSFT_15_2022-02.csv"
+    staleDF = pd.read_csv(csvPath)
+    staleDF.iloc[:1].to_csv(csvPath, index = False)
+    try:
+        pd.testing.assert_frame_equal(cacheManifest.loadData_fromcsv('MSFT', 15, '2022-02', echo = False), staleDF.iloc[:1])
+    finally:
+        staleDF.to_csv(csvPath, index = False)
+
+# Ticker/Interval filters are used before reading, the output is the same as filtering after reading everything (condition)
+@pytest.mark.parametrize("kwargFilters,filterSpec", testFilters)
+def test_ExtractData_pushdown(kwargFilters, filterSpec, setup_directManifest: DataManifest, monkeypatch):
+    selected = {**(filterSpec or {}), **kwargFilters}
+    def isSelected(col, value) -> bool:
+        val = selected.get(col, value)
+        return value in (val if isinstance(val, (list, tuple)) else [val])
+    expected = ExtractData('market', '2022-01-15', '2022-03', setup_directManifest,
+                           condition = lambda df: df.Ticker.map(lambda tick: isSelected('Ticker', tick)) & df.Interval.map(lambda interv: isSelected('Interval', interv)))
+
+    # Record the units read
+    unitsRead = []
+    loadData_fromcsv = DataManifest.loadData_fromcsv
+    def recordRead(self, ticker, interval, month, *args, **kwargs):
+        unitsRead.append((ticker, interval, month))
+        return loadData_fromcsv(self, ticker, interval, month, *args, **kwargs)
+    monkeypatch.setattr(DataManifest, 'loadData_fromcsv', recordRead)
+
+    result = ExtractData('market', '2022-01-15', '2022-03', setup_directManifest, filterSpec = filterSpec, **kwargFilters)
+    pd.testing.assert_frame_equal(result, expected)
+    assert unitsRead == [(tick, interv, month) for tick, interv, month in setup_directManifest.listUnits(testMonths[:3])
+                         if isSelected('Ticker', tick) and isSelected('Interval', interv)]
+
+# The manifest .json is only parsed again when the file changes
+def test_ExtractData_manifestCache(setup_directManifest: DataManifest):
+    manifest = DataManifest()
+    manifest.loadManifest(path = setup_directManifest.directory, echo = False)
+    expected = ExtractData('market', '2022-01-15', '2022-03', manifest)
+    assert manifest.manifestCacheStats == {'hits': 1, 'misses': 1}
+
+    manifest.DF.loc[('MSFT', 15), '2022-02'] = 0 # Not saved, the load restores the loaded copy
+    pd.testing.assert_frame_equal(ExtractData('market', '2022-01-15', '2022-03', manifest), expected)
+    assert manifest.manifestCacheStats == {'hits': 2, 'misses': 1}
+
+    # Same contents with a new modification time (hash unchanged)
+    manifestPath = Path(f"{manifest.directory}{manifest.fileName}.json")
+    manifestPath.write_bytes(manifestPath.read_bytes())
+    manifest.loadManifest(echo = False)
+    assert manifest.manifestCacheStats == {'hits': 3, 'misses': 1}
+
+    # Changed by another manifest, then forced reload
+    otherManifest = DataManifest()
+    otherManifest.loadManifest(path = manifest.directory, echo = False)
+    otherManifest.setValue('MSFT', 15, '2022-02', 2)
+    otherManifest.saveManifest(echo = False)
+    try:
+        manifest.loadManifest(echo = False)
+        assert manifest.manifestCacheStats == {'hits': 3, 'misses': 2}
+        assert manifest.DF.loc[('MSFT', 15), '2022-02'] == 2
+        manifest.refresh(echo = False)
+        assert manifest.manifestCacheStats == {'hits': 3, 'misses': 3}
+    finally:
+        setup_directManifest.saveManifest(echo = False)
+
+# Streaming the units/chunks gives the same data as ExtractData, in time (month) order
+@pytest.mark.parametrize("convertDatetime", [False, True])
+def test_ExtractData_stream(convertDatetime, setup_directManifest: DataManifest):
+    sortCols = ['Ticker', 'Interval', 'DateTime']
+    expected = ExtractData('market', '2022-01-15', '2022-03', setup_directManifest, postProcess = False, convertDatetime = convertDatetime)
+
+    units = list(ExtractDataUnits('2022-01-15', '2022-03', setup_directManifest, postProcess = False, convertDatetime = convertDatetime))
+    assert [unit[:3] for unit in units] == sorted([unit[:3] for unit in units], key = lambda unit: unit[2])
+    streamed = pd.concat([unitDF for *_, unitDF in units], ignore_index = True)
+    pd.testing.assert_frame_equal(streamed.sort_values(sortCols, ignore_index = True), expected.sort_values(sortCols, ignore_index = True))
+
+    # Post-processed units are the unit datasets (as given by ExtractData for a single ticker, interval and month)
+    tick, interv, month, unitDF = next(ExtractDataUnits('2022-01-15', '2022-03', setup_directManifest, convertDatetime = convertDatetime, Ticker = 'NVDA'))
+    assert (tick, interv, month) == ('NVDA', 15, '2022-01')
+    pd.testing.assert_frame_equal(unitDF, ExtractData('market', '2022-01-15', '2022-01', setup_directManifest, convertDatetime = convertDatetime, Ticker = 'NVDA'))
+
+    # Chunks are the units stitched in order, split in rows of chunkSize
+    chunks = list(ExtractDataChunks('2022-01-15', '2022-03', setup_directManifest, chunkSize = 1000, convertDatetime = convertDatetime))
+    assert [len(chunk) for chunk in chunks[:-1]] == [1000] * (len(chunks) - 1) and 0 < len(chunks[-1]) <= 1000
+    pd.testing.assert_frame_equal(pd.concat(chunks), streamed if convertDatetime else streamed.astype({'DateTime': str}))
+
+# The compact datatypes keep the same data (prices to 4 decimal places) in less memory
+@pytest.mark.parametrize("postProcess", [False, True])
+def test_ExtractData_compact(postProcess, setup_directManifest: DataManifest):
+    expected = ExtractData('market', '2022-01-15', '2022-03', setup_directManifest, postProcess = postProcess, convertDatetime = True)
+    result = ExtractData('market', '2022-01-15', '2022-03', setup_directManifest, postProcess = postProcess, compact = True)
+
+    assert result.dtypes.to_dict() == {'Ticker': 'category', 'Interval': 'int16', 'DateTime': 'datetime64[ns]', 'Open': 'float32',
+                                       'High': 'float32', 'Low': 'float32', 'Close': 'float32', 'Volume': 'int32'}
+    assert result.memory_usage(deep = True).sum() < expected.memory_usage(deep = True).sum() / 2
+    pd.testing.assert_frame_equal(result.astype(expected.dtypes.to_dict()).round(4), expected)
+
+    # Prices float32 cannot keep (to 4 decimal places) stay float64
+    priceDF = pd.DataFrame({'Open': [123.4567, 12345.6789], 'Close': [1.5, 2.25], 'Volume': [1, 2**31]})
+    compactDF = CompactFormat(priceDF)
+    assert compactDF.dtypes.to_dict() == {'Open': 'float64', 'Close': 'float32', 'Volume': 'int64'}
+    assert CompactFormat(priceDF, checkPrecision = False)['Open'].dtype == 'float32'
+
+#########################
+
+##################### FIXTURE FUNCTION(S) ######################
+@pytest.fixture(scope = 'module')
+def setup_directManifest(tmp_path_factory) -> DataManifest:
+    # Setup (copy the test units into a temporary directory, and make its manifest)
+    directory = tmp_path_factory.mktemp('StockHistData')
+    setupManifest = DataManifest()
+
+    for ticker in testTickers:
+        (directory / ticker).mkdir()
+        for month in testMonths:
+            for suffix in ['', '_meta']:
+                fileName = f"{ticker}_15_{month}{suffix}.csv"
+                shutil.copy(dataDirectory / ticker / fileName, directory / ticker / fileName)
+            setupManifest.setValue(ticker, 15, month, 1)
+
+    setupManifest.saveManifest(savePath = f"{directory}/", echo = False)
+    return setupManifest
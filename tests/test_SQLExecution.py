@@ -14,7 +14,8 @@ from sqlalchemy import types as sqltype
 
 # My packages
 from arcanequant import DataManifest
-from arcanequant import ExecuteSQL, SetKeysQuery, DropKeysQuery
+from arcanequant import ExecuteSQL, SetKeysQuery, DropKeysQuery, poolMetrics, unitCache
+from arcanequant.quantlib.DataManifestManager import EnvError
 
 # need sqlalchemy (and docker imports, after learning to set up docker)
 
@@ -91,6 +92,58 @@ def test_ExecuteSQL(testFrom: str, queryinput: str, expected, setup_SQLtestengin
             result = tabulate(rows, headers=headers, tablefmt="psql")
             assert result == expected
 
+# Pool settings and connection options read from the .env (only from the file), and the checkouts (with their waits and
+# timeouts) recorded in poolMetrics
+def test_connectSQL_pool(tmp_path):
+    login = open('testSQLlogin.env').read().strip()
+    (tmp_path / 'poolLogin.env').write_text(login + '\nPOOL_SIZE=1\nMAX_OVERFLOW=0\nPOOL_TIMEOUT=0.2\nPOOL_PRE_PING=true\n'
+                                            'STATEMENT_TIMEOUT=250\nAPPLICATION_NAME=poolTest\nKEEPALIVES_IDLE=60\n')
+    (tmp_path / 'badLogin.env').write_text(login + '\nPOOL_SIZE=many\n')
+
+    poolManifest = DataManifest()
+    poolManifest.connectSQL('poolLogin', path = str(tmp_path), echo = False)
+    engine = poolManifest.SQLengine
+    poolMetrics.reset(engine)
+    try:
+        assert engine.pool.size() == 1 and engine.pool._max_overflow == 0 and engine.pool._pre_ping
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT current_setting('application_name'), current_setting('statement_timeout');")).one() == ('poolTest', '250ms')
+            with pytest.raises(sqlexc.OperationalError): # Cancelled by the statement timeout
+                conn.execute(text('SELECT pg_sleep(1);'))
+            conn.rollback()
+            with pytest.raises(sqlexc.TimeoutError): # The only connection of the pool is checked out
+                engine.connect()
+            assert poolMetrics.stats(engine)['checkedOut'] == 1
+
+        stats = poolMetrics.stats(engine)
+        assert stats['checkouts'] == 1 and stats['timeouts'] == 1 and stats['checkedOut'] == 0 and stats['size'] == 1
+        assert stats['maxWaitSeconds'] >= 0.2 and stats['waitSeconds'] >= stats['maxWaitSeconds']
+
+        # Same database (and source of the caches) as the engine without the options, each engine recording its own checkouts
+        # (also after dispose)
+        defaultManifest = DataManifest()
+        defaultManifest.connectSQL('testSQLlogin', echo = False)
+        assert unitCache.source(defaultManifest.SQLengine) == unitCache.source(engine)
+        engine.dispose()
+        with engine.connect() as conn: conn.execute(text('SELECT 1;'))
+        assert poolMetrics.stats(engine)['checkouts'] == 2 and poolMetrics.stats(defaultManifest.SQLengine)['checkouts'] == 0
+        with defaultManifest.SQLengine.connect() as conn: # Options of the other file not carried over
+            assert conn.execute(text("SELECT current_setting('statement_timeout');")).scalar() == '0'
+        assert poolMetrics.stats(defaultManifest.SQLengine)['checkouts'] == 1 and poolMetrics.stats(engine)['checkouts'] == 2
+
+        # Any engine with a QueuePool is recorded once tracked (tracking again does not record twice)
+        plainEngine = poolMetrics.track(poolMetrics.track(create_engine(defaultManifest.SQLengine.url, pool_size = 2)))
+        with plainEngine.connect() as conn: conn.execute(text('SELECT 1;'))
+        assert poolMetrics.stats(plainEngine)['checkouts'] == 1 and poolMetrics.stats(plainEngine)['size'] == 2
+        plainEngine.dispose()
+        defaultManifest.SQLengine.dispose()
+    finally:
+        poolMetrics.reset(engine)
+        engine.dispose()
+
+    with pytest.raises(EnvError):
+        DataManifest().connectSQL('badLogin', path = str(tmp_path), echo = False)
+
 #########################
 
 ##################### FIXTURE FUNCTION(S) ######################
@@ -0,0 +1,318 @@
+# Integration Testing of ExtractData with SQL data (marketTable queried directly), using a copy of part of the stored data
+# synced into the test database.
+# Tests that the output from SQL is the same as from the direct data, and that the time range (and Ticker/Interval filters)
+# of the query are served by the indexes of marketTable (from the query plan), for a single and a partitioned marketTable.
+
+# Packages
+import re
+import pytest
+import pandas as pd
+from sqlalchemy import text
+
+# My packages
+from arcanequant import DataManifest, ExtractData, ExtractDataUnits, ExecuteSQL, SQLEstablish, SQLSetup, SQLRepair, SQLSync, SQLLoad, SQLClearUnits, SQLManifest, LoadBinary, unitCache, tickerCache
+from arcanequant.quantlib.DataManager import _marketQuery, _periodBounds
+from arcanequant.quantlib.SQLManager import setupKeys
+from test_ExtractData import setup_directManifest
+
+################################################################
+###################### SQL EXTRACTION TEST #####################
+################################################################
+# Test by:
+# Syncing the test units into the test database, then extracting ranges from SQL and comparing the output to the output
+# from the direct data. Then explaining the market query (with sequential scans disabled, as the test tables are too small
+# for the planner to prefer the indexes) and checking marketTable is only read through its indexes (of the partitions in
+# range only, if partitioned by month).
+
+################ TEST INPUTS ###############
+# (start, end, filters)
+testRanges = [('2022-01-15', '2022-03', {}), ('all', 'all', {'Ticker': 'MSFT'}), ('2022-02', '2022-04-10', {'Ticker': ['NVDA'], 'Interval': 15}),
+              ('2022-02-03 10:30', '2022-02-03 12', {'Interval': [15, 30]})]
+# Keys (index and constraint definitions, with their validity) of the tables of the database
+keysQuery = '''SELECT pg_get_indexdef(x.indexrelid), x.indisvalid FROM pg_index x JOIN pg_class t ON t.oid = x.indrelid
+               WHERE t.relnamespace = current_schema()::regnamespace
+               UNION ALL SELECT k.conname || pg_get_constraintdef(k.oid), k.convalidated FROM pg_constraint k JOIN pg_class t ON t.oid = k.conrelid
+               WHERE t.relnamespace = current_schema()::regnamespace ORDER BY 1;'''
+# (start, end, tickerSelect, intervalSelect, indexes expected (any of))
+timeIndex, unitIndex, keyIndex = 'ix_marketTable_DateTime', 'ix_marketTable_TickerID-Interval-DateTime', 'marketTable_pkey'
+testPlans = [('2022-02', '2022-02', None, None, [timeIndex]),
+             ('2022-01-15', '2022-03', ['MSFT'], [15], [unitIndex, keyIndex]),
+             ('all', 'all', ['MSFT', 'NVDA'], None, [timeIndex, unitIndex, keyIndex]),
+             ('2022-03-01', '2022-03-02 12:00', ['NVDA'], [15, 30], [timeIndex, unitIndex, keyIndex])]
+
+######################### TEST FUNCTION ########################
+@pytest.mark.parametrize("start,end,filters", testRanges)
+def test_ExtractData_SQL(start, end, filters, setup_SQLManifest: DataManifest, monkeypatch):
+    monkeypatch.setattr(unitCache, 'maxBytes', 0)
+    expected = ExtractData('market', start, end, setup_SQLManifest, convertDatetime = True, **filters)
+    result = ExtractData('market', start, end, setup_SQLManifest, fromSQL = True, convertDatetime = True, **filters)
+
+    assert not expected.empty
+    pd.testing.assert_frame_equal(result, expected, check_dtype = False)
+
+# The units streamed from SQL (ordered by the stored DateTime of marketTable) are the units streamed from the direct data
+def test_ExtractDataUnits_SQL(setup_SQLManifest: DataManifest):
+    expected = list(ExtractDataUnits('2022-01-15', '2022-03', setup_SQLManifest, convertDatetime = True))
+    result = list(ExtractDataUnits('2022-01-15', '2022-03', setup_SQLManifest, fromSQL = True, convertDatetime = True, fetchSize = 1000))
+
+    assert [unit[:3] for unit in result] == [unit[:3] for unit in expected]
+    for (*_, resultDF), (*_, expectedDF) in zip(result, expected):
+        pd.testing.assert_frame_equal(resultDF, expectedDF, check_dtype = False)
+
+# The manifest in SQL (long manifestTable) is read back in the wide form of the direct manifest
+def test_SQLManifest(setup_SQLManifest: DataManifest):
+    sqlManifest = DataManifest()
+    sqlManifest.SQLengine = setup_SQLManifest.SQLengine
+    sqlManifest.loadManifest('database', echo = False)
+    pd.testing.assert_frame_equal(sqlManifest.DF, setup_SQLManifest.DF, check_dtype = False)
+
+    expected = ExtractData('manifest', '2022-02', '2022-03-15', setup_SQLManifest)
+    result = ExtractData('manifest', '2022-02', '2022-03-15', setup_SQLManifest, fromSQL = True)
+    assert list(result.columns) == ['2022-02', '2022-03']
+    pd.testing.assert_frame_equal(result, expected, check_dtype = False)
+
+# Syncing in batches of units (single transaction, or batches in parallel worker processes) gives the same database as
+# syncing unit by unit
+@pytest.mark.parametrize("batchSize,workers", [(1, None), (3, None), (100, None), (2, 2)])
+def test_SQLSync_batched(batchSize, workers, setup_SQLManifest: DataManifest):
+    # Through the views (the TickerIDs are new after clearing)
+    dumpQueries = ['SELECT * FROM "stockData" ORDER BY "Ticker", "Interval", "DateTime";',
+                   'SELECT * FROM "metaData" ORDER BY "2. Symbol", "4. Interval", "7. Month";',
+                   'SELECT * FROM "manifestData" ORDER BY "Ticker", "Interval", "Month";']
+    expected = [ExecuteSQL(query, setup_SQLManifest.SQLengine, fetch = True) for query in dumpQueries]
+
+    stats = SQLSync(setup_SQLManifest, fastSync = False, batchSize = batchSize, workers = workers) # Cleared, then synced again
+    assert stats['units'] == len(setup_SQLManifest.listUnits()) and stats['batches'] == -(-stats['units'] // batchSize)
+    assert stats['rows'] == len(expected[0]) and stats['metaRows'] == len(expected[1])
+    assert [ExecuteSQL(query, setup_SQLManifest.SQLengine, fetch = True) for query in dumpQueries] == expected
+
+# Syncing with deferred keys (indexes and foreign keys dropped, then rebuilt after the load) gives the same database, with the
+# same (valid) keys
+@pytest.mark.parametrize("workers", [None, 2])
+def test_SQLSync_deferKeys(workers, setup_SQLManifest: DataManifest):
+    dumpQueries = ['SELECT * FROM "stockData" ORDER BY "Ticker", "Interval", "DateTime";',
+                   'SELECT * FROM "metaData" ORDER BY "2. Symbol", "4. Interval", "7. Month";']
+    expected = [ExecuteSQL(query, setup_SQLManifest.SQLengine, fetch = True) for query in dumpQueries + [keysQuery]]
+
+    stats = SQLSync(setup_SQLManifest, fastSync = False, batchSize = 3, workers = workers, deferKeys = True)
+    assert stats['rows'] == len(expected[0]) and stats['keySeconds'] > 0
+    assert [ExecuteSQL(query, setup_SQLManifest.SQLengine, fetch = True) for query in dumpQueries + [keysQuery]] == expected
+    assert all(valid for definition, valid in expected[-1])
+
+# A deferred key the loaded rows do not satisfy is reported (the other keys are rebuilt each in their own transaction) and
+# stays recorded, then SQLRepair rebuilds it from its record once the rows satisfy it
+def test_SQLSync_deferKeys_errors(setup_SQLManifest: DataManifest):
+    if setup_SQLManifest.partitionBy is not None: pytest.skip('NOT VALID foreign keys are not supported on a partitioned marketTable')
+    engine = setup_SQLManifest.SQLengine
+    ExecuteSQL('''CREATE TABLE "allowedTickers" ("TickerID" SMALLINT PRIMARY KEY);
+                  ALTER TABLE "marketTable" ADD CONSTRAINT "fk_allowedTickers" FOREIGN KEY ("TickerID") REFERENCES "allowedTickers" ("TickerID") NOT VALID;''', engine)
+    try:
+        stats = SQLSync(setup_SQLManifest, fastSync = False, deferKeys = True)
+        assert len(stats['keyErrors']) == 1 and stats['keyErrors'][0].startswith('"marketTable": "fk_allowedTickers": ')
+        assert ExecuteSQL('SELECT "KeyName" FROM "deferredKeys";', engine, fetch = True) == [('"fk_allowedTickers"',)]
+        assert ExecuteSQL('SELECT COUNT(*) FROM pg_indexes WHERE indexname = \'ix_marketTable_DateTime\';', engine, fetch = True) == [(1,)]
+
+        ExecuteSQL('INSERT INTO "allowedTickers" SELECT "TickerID" FROM "tickerTable";', engine)
+        report = SQLRepair(setup_SQLManifest, dataRepair = False)
+        assert report['deferred'] == ['"marketTable": "fk_allowedTickers"'] and report['deferredErrors'] == []
+        assert ExecuteSQL('SELECT COUNT(*) FROM "deferredKeys";', engine, fetch = True) == [(0,)]
+        assert ExecuteSQL('SELECT convalidated FROM pg_constraint WHERE conname = \'fk_allowedTickers\';', engine, fetch = True) == [(True,)]
+    finally:
+        ExecuteSQL('ALTER TABLE "marketTable" DROP CONSTRAINT IF EXISTS "fk_allowedTickers"; DROP TABLE "allowedTickers"; DELETE FROM "deferredKeys";', engine)
+
+# The keys of the database are all satisfied after the setup (nothing planned), keys missing or different are planned (with
+# the foreign keys depending on them) and set again in one transaction, giving the same keys
+def test_DDLPlan(setup_SQLManifest: DataManifest):
+    engine = setup_SQLManifest.SQLengine
+    assert SQLSetup(engine, new = False, dryRun = True) == []
+    assert len(SQLSetup(engine, new = False, dryRun = True, rebuild = True)) == len(setupKeys.steps)
+    expected = ExecuteSQL(keysQuery, engine, fetch = True)
+
+    # Index dropped, and manifestTable primary key with other columns order (its dependent foreign keys dropped with it, and
+    # the syncLedger foreign key added back, depending on it)
+    ledgerKey = 'fk_syncLedger_TickerID-Interval-Month_manifestTable_TickerID-Interval-Month'
+    ExecuteSQL(f'''DROP INDEX "ix_marketTable_DateTime";
+                  ALTER TABLE "manifestTable" DROP CONSTRAINT "manifestTable_pkey" CASCADE, ADD CONSTRAINT "manifestTable_pkey" PRIMARY KEY ("Interval", "TickerID", "Month");
+                  ALTER TABLE "syncLedger" ADD CONSTRAINT "{ledgerKey}" FOREIGN KEY ("TickerID", "Interval", "Month") REFERENCES "manifestTable" ("TickerID", "Interval", "Month") ON UPDATE CASCADE;''',
+               engine)
+    plan = SQLSetup(engine, new = False, dryRun = True)
+    planned = [target['name'] for statement, target in setupKeys.steps if statement in plan]
+    assert planned == ['manifestTable_pkey', 'ix_marketTable_DateTime', ledgerKey[:63], # Names truncated by the database
+                       'fk_metaTable_TickerID-4. Interval-7. Month_manifestTable_TickerID-Interval-Month'[:63]]
+
+    assert SQLSetup(engine, new = False) == plan
+    assert SQLSetup(engine, new = False, dryRun = True) == []
+    assert ExecuteSQL(keysQuery, engine, fetch = True) == expected
+
+# Repairing a database with all its keys changes nothing, missing keys are set again (and reported), the indexes concurrently
+def test_SQLRepair_keys(setup_SQLManifest: DataManifest):
+    engine = setup_SQLManifest.SQLengine
+    expected = ExecuteSQL(keysQuery, engine, fetch = True)
+    assert SQLRepair(setup_SQLManifest, dataRepair = False) == {'keys': [], 'deferred': [], 'deferredErrors': [],
+                                                                'migrated': {'manifestRows': 0, 'marketRows': 0}, 'sync': None}
+
+    ExecuteSQL('DROP INDEX "ix_marketTable_DateTime"; ALTER TABLE "dateTable" DROP CONSTRAINT "unique_dateTable_Date";', engine)
+    report = SQLRepair(setup_SQLManifest, dataRepair = False, concurrently = True)
+    assert report['keys'] == ['dateTable: unique_dateTable_Date', 'marketTable: ix_marketTable_DateTime']
+    assert ExecuteSQL(keysQuery, engine, fetch = True) == expected
+
+# Syncing again only syncs the units changed (replacing their rows, including rows removed from their files) and removes the
+# units no longer in the manifest, skipping the unchanged units
+def test_SQLSync_incremental(setup_SQLManifest: DataManifest):
+    dumpQuery = 'SELECT * FROM "stockData" ORDER BY "Ticker", "Interval", "DateTime";'
+    expected = ExecuteSQL(dumpQuery, setup_SQLManifest.SQLengine, fetch = True)
+    units = setup_SQLManifest.listUnits()
+    ticker, interval, month = units[0]
+    csvPath = f"{setup_SQLManifest.directory}{ticker}/{ticker}_{interval}_{month}.csv"
+    unitQuery = f'''SELECT "DateTime" FROM "stockData" WHERE "Ticker" = '{ticker}' AND "Interval" = {interval}
+                     AND to_char("DateTime", 'YYYY-MM') = '{month}' ORDER BY "DateTime";'''
+    with open(csvPath, 'rb') as csvFile: original = csvFile.read()
+
+    try:
+        stats = SQLSync(setup_SQLManifest, fastSync = True)
+        assert (stats['units'], stats['skipped'], stats['removed']) == (0, len(units), 0)
+
+        # Unit changed (first data row removed from its file), rows replaced
+        unitDF = pd.read_csv(csvPath, index_col = 0)
+        unitDF.iloc[1:].to_csv(csvPath)
+        stats = SQLSync(setup_SQLManifest, fastSync = True)
+        assert (stats['units'], stats['skipped'], stats['removed'], stats['rows']) == (1, len(units) - 1, 0, len(unitDF) - 1)
+        synced = ExecuteSQL(unitQuery, setup_SQLManifest.SQLengine, fetch = True)
+        assert [row[0] for row in synced] == sorted(pd.to_datetime(unitDF.index[1:]))
+
+        # Unit no longer in the manifest, rows (and ledger row) removed
+        setup_SQLManifest.setValue(ticker, interval, month, 0)
+        stats = SQLSync(setup_SQLManifest, fastSync = True)
+        assert (stats['units'], stats['skipped'], stats['removed']) == (0, len(units) - 1, 1)
+        assert ExecuteSQL(unitQuery, setup_SQLManifest.SQLengine, fetch = True) == []
+        assert ExecuteSQL('SELECT COUNT(*) FROM "syncLedger";', setup_SQLManifest.SQLengine, fetch = True)[0][0] == len(units) - 1
+    finally:
+        # Original unit synced again
+        setup_SQLManifest.setValue(ticker, interval, month, 1)
+        with open(csvPath, 'wb') as csvFile: csvFile.write(original)
+        SQLSync(setup_SQLManifest, fastSync = True)
+
+    assert ExecuteSQL(dumpQuery, setup_SQLManifest.SQLengine, fetch = True) == expected
+
+# Clearing a unit clears only its rows (dropping its partition if partitioned by unit) and sets it missing in the SQL manifest
+# (a unit of an unknown ticker has nothing to clear, and its ticker is not added),
+# syncing again restores it
+def test_SQLClearUnits(setup_SQLManifest: DataManifest):
+    dumpQuery = 'SELECT * FROM "stockData" ORDER BY "Ticker", "Interval", "DateTime";'
+    expected = ExecuteSQL(dumpQuery, setup_SQLManifest.SQLengine, fetch = True)
+    ticker, interval, month = setup_SQLManifest.listUnits()[0]
+    unitRows = sum(1 for row in expected if (row[0], row[1], row[2].strftime('%Y-%m')) == (ticker, interval, month))
+    tickerQuery = 'SELECT * FROM "tickerTable" ORDER BY "TickerID";'
+    tickers = ExecuteSQL(tickerQuery, setup_SQLManifest.SQLengine, fetch = True)
+
+    try:
+        stats = SQLClearUnits(setup_SQLManifest.SQLengine, [(ticker, interval, month)] * 2 + [('ZZZZ', 15, month)], vacuum = True)
+        assert stats == {'units': 2, 'rows': unitRows, 'partitions': int(setup_SQLManifest.partitionBy == 'unit')}
+        assert ExecuteSQL(tickerQuery, setup_SQLManifest.SQLengine, fetch = True) == tickers # The unknown ticker is not added
+        remaining = ExecuteSQL(dumpQuery, setup_SQLManifest.SQLengine, fetch = True)
+        assert remaining == [row for row in expected if (row[0], row[1], row[2].strftime('%Y-%m')) != (ticker, interval, month)]
+        assert SQLManifest(setup_SQLManifest.SQLengine).loc[(ticker, interval), month] == 0
+        assert ExecuteSQL('SELECT COUNT(*) FROM "syncLedger";', setup_SQLManifest.SQLengine, fetch = True)[0][0] == len(setup_SQLManifest.listUnits()) - 1
+
+        with setup_SQLManifest.SQLengine.connect() as conn, pytest.raises(ValueError):
+            SQLClearUnits(setup_SQLManifest.SQLengine, [(ticker, interval, month)], vacuum = True, conn = conn)
+    finally:
+        SQLSync(setup_SQLManifest, fastSync = True)
+
+    assert ExecuteSQL(dumpQuery, setup_SQLManifest.SQLengine, fetch = True) == expected
+
+# Loading the database into an empty directory gives the synced files (as .csv files, or binary series with the same
+# rows), loading again skips every unit
+@pytest.mark.parametrize("fileFormat", ['csv', 'binary'])
+def test_SQLLoad(fileFormat, setup_SQLManifest: DataManifest, tmp_path):
+    loadManifest = DataManifest()
+    loadManifest.directory = f"{tmp_path}/"
+    loadManifest.SQLengine = setup_SQLManifest.SQLengine
+    units = setup_SQLManifest.listUnits()
+
+    stats = SQLLoad(loadManifest, fileFormat = fileFormat, workers = 2)
+    assert (stats['units'], stats['skipped']) == (len(units), 0)
+    assert loadManifest.listUnits() == units
+    for ticker, interval, month in units:
+        expected = setup_SQLManifest.loadData_fromcsv(ticker, interval, month, convert_DateTime = True, echo = False)
+        if fileFormat == 'csv':
+            result = loadManifest.loadData_fromcsv(ticker, interval, month, convert_DateTime = True, echo = False)
+        else:
+            result, expected = LoadBinary(loadManifest.directory, ticker, interval, month, month), expected.sort_values('DateTime', ignore_index = True)
+        pd.testing.assert_frame_equal(result, expected, check_dtype = False)
+        metaName = f"{ticker}/{ticker}_{interval}_{month}_meta.csv"
+        pd.testing.assert_frame_equal(pd.read_csv(tmp_path / metaName, index_col = 0), pd.read_csv(f"{setup_SQLManifest.directory}{metaName}", index_col = 0))
+
+    stats = SQLLoad(loadManifest, fileFormat = fileFormat)
+    assert (stats['units'], stats['rows'], stats['skipped']) == (0, 0, len(units))
+
+@pytest.mark.parametrize("start,end,tickerSelect,intervalSelect,indexNames", testPlans)
+def test_marketQuery_indexScan(start, end, tickerSelect, intervalSelect, indexNames, setup_SQLManifest: DataManifest):
+    startDT, endDT = _periodBounds(start, end)
+    marketQuery, queryParams = _marketQuery(startDT, endDT, tickerSelect, intervalSelect)
+
+    with setup_SQLManifest.SQLengine.connect() as conn:
+        conn.execute(text('SET enable_seqscan = off;'))
+        plan = list(conn.execute(text('EXPLAIN ' + marketQuery.text).bindparams(*marketQuery._bindparams.values()), queryParams).scalars())
+
+    assert not any('Seq Scan on "marketTable' in line for line in plan)
+    # marketTable read through an expected index (or any index of its partitions, as each partition is planned on its own
+    # statistics), with the time range (of DateTime, or of DateID for the primary key) as an index condition (not a filter)
+    if setup_SQLManifest.partitionBy is None: patterns = [re.escape(name) for name in indexNames]
+    else: patterns = [r'marketTable_(\d+_\d+_)?\d{4}-\d{2}_' + ('pkey' if name == keyIndex else f'{name.removeprefix("ix_marketTable_").replace("-", "_")}_idx')
+                      for name in (timeIndex, unitIndex, keyIndex)]
+    scans = [i for i, line in enumerate(plan) if any(re.search(f'Index Scan (on|using) "{pattern}"', line) for pattern in patterns)]
+    assert scans
+    for i in scans:
+        assert 'Index Cond' in plan[i + 1] and any(f'"{column}" >=' in plan[i + 1] and f'"{column}" <=' in plan[i + 1] for column in ('DateTime', 'DateID'))
+
+#########################
+
+# Month partitions outside the time range are not scanned (pruned at planning)
+@pytest.mark.parametrize("start,end,months", [('2022-02', '2022-02', ['2022-02']), ('2022-01-31 12:00', '2022-02-01 12:00', ['2022-01', '2022-02'])])
+def test_marketQuery_partitionPruning(start, end, months, setup_SQLManifest: DataManifest):
+    if setup_SQLManifest.partitionBy != 'month': pytest.skip('marketTable not partitioned by month')
+    startDT, endDT = _periodBounds(start, end)
+    marketQuery, queryParams = _marketQuery(startDT, endDT)
+
+    with setup_SQLManifest.SQLengine.connect() as conn:
+        plan = '\n'.join(conn.execute(text('EXPLAIN ' + marketQuery.text), queryParams).scalars())
+        partitions = conn.execute(text('SELECT inhrelid::regclass::TEXT FROM pg_inherits WHERE inhparent = \'"marketTable"\'::regclass;')).scalars().all()
+
+    assert len(partitions) > len(months)
+    assert sorted(name.strip('"') for name in partitions if f'on {name} ' in plan) == [f'marketTable_{month}' for month in months]
+
+#########################
+
+##################### FIXTURE FUNCTION(S) ######################
+@pytest.fixture(scope = 'module', params = [None, 'month', 'unit'], ids = ['heap', 'month', 'unit'])
+def setup_SQLManifest(setup_directManifest: DataManifest, request) -> DataManifest:
+    # Setup (tables and keys in the test database, then sync the test units)
+    setupManifest = DataManifest()
+    setupManifest.loadManifest(path = setup_directManifest.directory, echo = False)
+    setupManifest.connectSQL('testSQLlogin')
+    setupManifest.partitionBy = request.param # Partitioning of marketTable (for the tests of the plans)
+    SQLEstablish(setupManifest.SQLengine, request.param)
+    SQLSetup(setupManifest.SQLengine, new = False)
+
+    try: # Used to teardown no matter the error/failure
+        cacheStats = (unitCache.hits, unitCache.misses)
+        SQLSync(setupManifest, fastSync = True)
+        assert (unitCache.hits, unitCache.misses) == cacheStats # The units synced are not read through the unitCache
+        ExecuteSQL('ANALYZE "marketTable";', setupManifest.SQLengine)
+        yield setupManifest
+    finally:
+        # Teardown
+        teardownquery = '''
+                        DROP TABLE IF EXISTS "tickerTable" CASCADE;
+                        DROP TABLE IF EXISTS "marketTable" CASCADE;
+                        DROP TABLE IF EXISTS "metaTable" CASCADE;
+                        DROP TABLE IF EXISTS "dateTable" CASCADE;
+                        DROP TABLE IF EXISTS "timeTable" CASCADE;
+                        DROP TABLE IF EXISTS "manifestTable" CASCADE;
+                        DROP TABLE IF EXISTS "syncLedger" CASCADE;
+                        DROP TABLE IF EXISTS "deferredKeys" CASCADE;
+                        '''
+        ExecuteSQL(teardownquery, setupManifest.SQLengine)
+        unitCache.invalidate(setupManifest.SQLengine)
+        tickerCache.invalidate(setupManifest.SQLengine)
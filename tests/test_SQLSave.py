@@ -0,0 +1,153 @@
+# Integration Testing of SQLSave upsert methods with database (COPY into a staging table, and INSERT ... VALUES).
+# Tests that both methods insert new rows and update existing rows (by primary key) the same way.
+
+# Packages
+import pytest
+import numpy as np
+import pandas as pd
+import sqlalchemy
+
+# My packages
+from arcanequant import SQLSave, ExecuteSQL, DateTimeIDs, TickerCache, tickerCache, SQLMigrate, SQLManifest
+from test_SQLExecution import setup_SQLtestengine
+
+################################################################
+######################## SQL SAVE TEST #########################
+################################################################
+# Test by:
+# Creating a table with a primary key, saving a dataset into it, then saving a second dataset with some rows of the first
+# (changed) and new rows, and checking the rows in the table are the second dataset over the first (for both methods).
+
+################ TEST QUERY AND EXPECTED RESULTS ###############
+testquery = """
+                    CREATE TABLE "testTable1" (
+                        "Key" INT NOT NULL,
+                        "DateID" INT NOT NULL,
+                        "TimeID" INT NOT NULL,
+                        "Name" VARCHAR,
+                        "Value" FLOAT,
+                        PRIMARY KEY ("Key", "DateID", "TimeID")
+                    );
+                    """
+
+firstDF = pd.DataFrame({'Key': [1, 1, 2, 3], 'DateTime': ['2022-01-03 09:30:00', '2022-01-03 09:45:00', '2022-01-03 09:30:00', '2022-02-28 23:59:59'],
+                        'Name': ['a', 'b', None, 'd, "quoted"'], 'Value': [1.5, np.nan, 3.25, -4.0]})
+secondDF = pd.DataFrame({'Key': [1, 3, 4], 'DateTime': ['2022-01-03 09:45:00', '2022-02-28 23:59:59', '2022-03-01 00:00:00'],
+                         'Name': ['B', '', 'e'], 'Value': [2.0, None, 0.1]})
+
+expected = [(1, 20220103, 93000, 'a', 1.5), (1, 20220103, 94500, 'B', 2.0), (2, 20220103, 93000, None, 3.25),
+            (3, 20220228, 235959, '', None), (4, 20220301, 0, 'e', 0.1)]
+
+tickerquery = """
+                    CREATE TABLE "tickerTable" (
+                        "TickerID" SMALLINT GENERATED BY DEFAULT AS IDENTITY,
+                        "Ticker" VARCHAR(10) PRIMARY KEY
+                    );
+                    CREATE TABLE "testTable2" (
+                        "TickerID" SMALLINT NOT NULL,
+                        "DateID" INT NOT NULL,
+                        "TimeID" INT NOT NULL,
+                        "Close" FLOAT,
+                        PRIMARY KEY ("TickerID", "DateID", "TimeID")
+                    );
+                    """
+
+# Manifest established with the wide manifestTable (a column per month)
+widequery = """
+                    CREATE TABLE "tickerTable" (
+                        "TickerID" SMALLINT GENERATED BY DEFAULT AS IDENTITY UNIQUE,
+                        "Ticker" VARCHAR(10) PRIMARY KEY
+                    );
+                    INSERT INTO "tickerTable" ("Ticker") VALUES ('MSFT'), ('NVDA');
+                    CREATE TABLE "manifestTable" ("TickerID" SMALLINT, "Interval" SMALLINT, "2022-01" SMALLINT, "2022-02" SMALLINT,
+                                                  PRIMARY KEY ("TickerID", "Interval"));
+                    INSERT INTO "manifestTable" VALUES (1, 15, 1, 0), (2, 15, 2, 1), (2, 30, NULL, 1);
+                    CREATE TABLE "marketTable" ("DateID" INT, "TimeID" INT, "TickerID" SMALLINT, "Interval" SMALLINT, "Open" FLOAT,
+                                                "High" FLOAT, "Low" FLOAT, "Close" FLOAT, "Volume" BIGINT, "Nominal" FLOAT);
+                    CREATE INDEX "ix_marketTable_DateID-TimeID" ON "marketTable" ("DateID", "TimeID");
+                    INSERT INTO "marketTable" VALUES (20220103, 93000, 1, 15, 1, 2, 0.5, 1.5, 100, NULL), (20220228, 235959, 2, 15, 3, 4, 2, 3, 200, NULL);
+                    """
+
+######################### TEST FUNCTION ########################
+@pytest.mark.parametrize("loadMethod", ['copy', 'insert'])
+def test_SQLSave_upsert(loadMethod, setup_SQLtestengine: sqlalchemy.engine):
+    ExecuteSQL(testquery, setup_SQLtestengine)
+
+    SQLSave(firstDF, setup_SQLtestengine, 'testTable1', loadMethod = loadMethod)
+    SQLSave(secondDF, setup_SQLtestengine, 'testTable1', loadMethod = loadMethod)
+
+    result = ExecuteSQL('SELECT "Key", "DateID", "TimeID", "Name", "Value" FROM "testTable1" ORDER BY "Key", "DateID", "TimeID";',
+                        setup_SQLtestengine, fetch = True)
+    assert [tuple(row) for row in result] == expected
+
+# DateID/TimeID from DateTime strings, or from already parsed datetime64 values (same IDs)
+@pytest.mark.parametrize("parse", [False, True])
+def test_DateTimeIDs(parse):
+    dateTimes = pd.Series(['2022-01-03 09:30:00', '1999-12-31 23:59:59', '2200-01-01 00:00:00'], index = [5, 6, 7])
+    if parse: dateTimes = pd.to_datetime(dateTimes)
+
+    dateIDs, timeIDs = DateTimeIDs(dateTimes)
+    pd.testing.assert_series_equal(dateIDs, pd.Series([20220103, 19991231, 22000101], index = [5, 6, 7]), check_names = False)
+    pd.testing.assert_series_equal(timeIDs, pd.Series([93000, 235959, 0], index = [5, 6, 7]), check_names = False)
+
+def test_SQLSave_loadMethod(setup_SQLtestengine: sqlalchemy.engine):
+    ExecuteSQL(testquery, setup_SQLtestengine)
+    with pytest.raises(ValueError):
+        SQLSave(firstDF, setup_SQLtestengine, 'testTable1', loadMethod = 'bulk')
+
+# TickerIDs are read once per database, new tickers are inserted (and returned) by one query, and cached
+def test_TickerCache(setup_SQLtestengine: sqlalchemy.engine, monkeypatch):
+    monkeypatch.setattr('arcanequant.quantlib.SQLManager.tickerCache', testCache := TickerCache())
+    ExecuteSQL(tickerquery, setup_SQLtestengine)
+    try:
+        assert testCache.resolve(setup_SQLtestengine, ['MSFT', 'NVDA', 'MSFT']) == {'MSFT': 1, 'NVDA': 2}
+        assert testCache.stats == {'reads': 1, 'inserts': 1, 'databases': 1, 'tickers': 2}
+
+        # Saving rows of cached tickers does not query the tickerTable again
+        saveDF = pd.DataFrame({'Ticker': ['NVDA', 'MSFT', 'NVDA'], 'DateTime': ['2022-01-03 09:30:00'] * 3, 'Close': [1.0, 2.0, 3.0]}).iloc[[0, 1]]
+        SQLSave(saveDF, setup_SQLtestengine, 'testTable2')
+        assert testCache.stats['reads'] == 1 and testCache.stats['inserts'] == 1
+        result = ExecuteSQL('SELECT "TickerID", "Close" FROM "testTable2" ORDER BY "TickerID";', setup_SQLtestengine, fetch = True)
+        assert [tuple(row) for row in result] == [(1, 2.0), (2, 1.0)]
+
+        # Ticker inserted by someone else (not returned by the insert, so read), and a new ticker (the conflicting insert of
+        # the other ticker also uses an identity value)
+        ExecuteSQL('INSERT INTO "tickerTable" ("Ticker") VALUES (\'AAPL\');', setup_SQLtestengine)
+        assert testCache.resolve(setup_SQLtestengine, ['AAPL', 'TSLA']) == {'AAPL': 3, 'TSLA': 5}
+        assert testCache.stats == {'reads': 1, 'inserts': 2, 'databases': 1, 'tickers': 4}
+
+        # Invalidated cache reads the tickerTable again
+        testCache.invalidate(setup_SQLtestengine)
+        assert testCache.resolve(setup_SQLtestengine, ['TSLA']) == {'TSLA': 5}
+        assert testCache.stats == {'reads': 2, 'inserts': 2, 'databases': 1, 'tickers': 4}
+    finally:
+        ExecuteSQL('DROP TABLE IF EXISTS "tickerTable" CASCADE;', setup_SQLtestengine)
+
+# The wide manifestTable is migrated into the long manifestTable (read back in the wide form), and manifests saved after add
+# rows only (no columns). The marketTable gets the stored DateTime (of its existing rows) and its indexes
+def test_SQLMigrate(setup_SQLtestengine: sqlalchemy.engine, monkeypatch):
+    monkeypatch.setattr('arcanequant.quantlib.SQLManager.tickerCache', TickerCache())
+    ExecuteSQL(widequery, setup_SQLtestengine)
+    try:
+        assert SQLMigrate(setup_SQLtestengine) == {'manifestRows': 5, 'marketRows': 2}
+        assert SQLMigrate(setup_SQLtestengine) == {'manifestRows': 0, 'marketRows': 0} # Already migrated
+        result = ExecuteSQL('SELECT "Ticker", "DateTime", "Close" FROM "stockData" ORDER BY "DateTime";', setup_SQLtestengine, fetch = True)
+        assert [tuple(row) for row in result] == [('MSFT', pd.Timestamp('2022-01-03 09:30:00'), 1.5), ('NVDA', pd.Timestamp('2022-02-28 23:59:59'), 3.0)]
+        indexQuery = 'SELECT indexname FROM pg_indexes WHERE tablename = \'marketTable\' ORDER BY indexname;'
+        assert [row[0] for row in ExecuteSQL(indexQuery, setup_SQLtestengine, fetch = True)] == ['ix_marketTable_DateTime', 'ix_marketTable_TickerID-Interval-DateTime']
+
+        result = SQLManifest(setup_SQLtestengine)
+        expected = pd.DataFrame({'2022-01': [1, 2, np.nan], '2022-02': [0, 1, 1]},
+                                index = pd.MultiIndex.from_tuples([('MSFT', 15), ('NVDA', 15), ('NVDA', 30)], names = ['Ticker', 'Interval']))
+        pd.testing.assert_frame_equal(result, expected, check_names = False, check_dtype = False)
+
+        columnQuery = 'SELECT COUNT(*) FROM information_schema.columns WHERE table_name = \'manifestTable\';'
+        newDF = pd.DataFrame({'2022-02': [2], '2022-03': [1]}, index = pd.MultiIndex.from_tuples([('NVDA', 30)], names = ['Ticker', 'Interval']))
+        SQLSave(newDF.rename_axis(columns = 'Month'), setup_SQLtestengine, 'manifestTable')
+        assert ExecuteSQL(columnQuery, setup_SQLtestengine, fetch = True)[0][0] == 4
+        result = SQLManifest(setup_SQLtestengine, '2022-02', '2022-03')
+        assert result.fillna(-1).astype(int).to_dict() == {'2022-02': {('MSFT', 15): 0, ('NVDA', 15): 1, ('NVDA', 30): 2},
+                                                          '2022-03': {('MSFT', 15): -1, ('NVDA', 15): -1, ('NVDA', 30): 1}}
+    finally:
+        ExecuteSQL('DROP TABLE IF EXISTS "marketTable" CASCADE; DROP TABLE IF EXISTS "manifestTable" CASCADE; DROP TABLE IF EXISTS "tickerTable" CASCADE;',
+                   setup_SQLtestengine)
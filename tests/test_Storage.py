@@ -0,0 +1,116 @@
+# Testing of the embedded DuckDB storage backend (StorageManager), using a copy of part of the stored data loaded into an
+# in-memory DuckDB database.
+# Tests that the output from the DuckDB storage is the same as from the direct data (as for the PostgreSQL database), and that
+# queries over the files give the same results as pandas over the direct data.
+
+# Packages
+import pytest
+import pandas as pd
+
+duckdb = pytest.importorskip('duckdb')
+
+# My packages
+from arcanequant import DataManifest, ExtractData, ExtractDataUnits, StorageBackend, DuckDBBackend, unitCache
+from test_ExtractData import setup_directManifest
+
+################################################################
+######################## STORAGE TEST ##########################
+################################################################
+# Test by:
+# Loading the test units into an in-memory DuckDB database (sync), then extracting ranges from it (fromSQL) and comparing
+# the output to the output from the direct data. Then querying the test files directly (fileView) and comparing to pandas.
+
+################ TEST INPUTS ###############
+# (start, end, filters)
+testRanges = [('2022-01-15', '2022-03', {}), ('all', 'all', {'Ticker': 'MSFT'}), ('2022-02', '2022-04-10', {'Ticker': ['NVDA'], 'Interval': 15}),
+              ('2022-02-03 10:30', '2022-02-03 12', {'Interval': [15, 30]})]
+
+@pytest.fixture(scope = 'module')
+def setup_DuckDBManifest(setup_directManifest: DataManifest) -> DataManifest:
+    setup_directManifest.connectDuckDB(echo = False)
+    cacheStats = (unitCache.hits, unitCache.misses)
+    stats = setup_directManifest.storage.sync(setup_directManifest)
+    assert stats['units'] == 8 and stats['metaRows'] == 8 and stats['rows'] > 0
+    assert (unitCache.hits, unitCache.misses) == cacheStats # The market files are only read by DuckDB (not through the unitCache)
+    yield setup_directManifest
+    setup_directManifest.storage.close()
+    setup_directManifest.storage = None
+
+######################### TEST FUNCTION ########################
+@pytest.mark.parametrize("start,end,filters", testRanges)
+def test_ExtractData_DuckDB(start, end, filters, setup_DuckDBManifest: DataManifest, monkeypatch):
+    monkeypatch.setattr(unitCache, 'maxBytes', 0)
+    expected = ExtractData('market', start, end, setup_DuckDBManifest, convertDatetime = True, **filters)
+    result = ExtractData('market', start, end, setup_DuckDBManifest, fromSQL = True, convertDatetime = True, **filters)
+
+    assert not expected.empty
+    pd.testing.assert_frame_equal(result, expected, check_dtype = False)
+
+# The units streamed from the storage (fetched in chunks of vectors) are the units streamed from the direct data
+def test_ExtractDataUnits_DuckDB(setup_DuckDBManifest: DataManifest):
+    expected = list(ExtractDataUnits('2022-01-15', '2022-03', setup_DuckDBManifest, convertDatetime = True))
+    result = list(ExtractDataUnits('2022-01-15', '2022-03', setup_DuckDBManifest, fromSQL = True, convertDatetime = True, fetchSize = 2048))
+
+    assert [unit[:3] for unit in result] == [unit[:3] for unit in expected]
+    for (*_, resultDF), (*_, expectedDF) in zip(result, expected):
+        pd.testing.assert_frame_equal(resultDF, expectedDF, check_dtype = False)
+
+# The manifest and meta data of the storage are read back in the form of the direct data
+def test_DuckDB_manifestMeta(setup_DuckDBManifest: DataManifest):
+    storedManifest = DataManifest()
+    storedManifest.storage = setup_DuckDBManifest.storage
+    storedManifest.loadManifest('database', echo = False)
+    pd.testing.assert_frame_equal(storedManifest.DF, setup_DuckDBManifest.DF, check_dtype = False)
+
+    expected = ExtractData('manifest', '2022-02', '2022-03-15', setup_DuckDBManifest)
+    result = ExtractData('manifest', '2022-02', '2022-03-15', setup_DuckDBManifest, fromSQL = True)
+    pd.testing.assert_frame_equal(result, expected, check_dtype = False)
+
+    unitDF, metaDF = setup_DuckDBManifest.loadData_fromsql('NVDA', 15, '2022-03', meta = True, echo = False)
+    csvDF, csvMetaDF = setup_DuckDBManifest.loadData_fromcsv('NVDA', 15, '2022-03', meta = True, echo = False)
+    pd.testing.assert_frame_equal(unitDF, csvDF, check_dtype = False)
+    pd.testing.assert_frame_equal(metaDF, csvMetaDF, check_dtype = False)
+
+# Saving upserts by the primary key (rows saved again are replaced, not repeated), and outdates the cached units
+def test_DuckDB_save():
+    storage = DuckDBBackend()
+    saveDF = pd.DataFrame({'Ticker': ['TEST'] * 2, 'Interval': [15, 15], 'DateTime': ['2022-01-03 09:30:00', '2022-01-03 09:45:00'],
+                           'Open': [1.0, 2.0], 'High': [1.0, 2.0], 'Low': [1.0, 2.0], 'Close': [1.0, 2.0], 'Volume': [10, 20]})
+    storage.save(saveDF, 'marketTable')
+    generation = unitCache.generation(storage.source)
+    storage.save(saveDF.assign(Close = [3.0, 4.0]), 'stockData')
+
+    result = storage.market(pd.Timestamp('2022-01-01'), pd.Timestamp('2022-01-31'), ['TEST'], [15])
+    assert result['Close'].tolist() == [4.0, 3.0] # In descending DateTime
+    assert unitCache.generation(storage.source) > generation
+    with pytest.raises(ValueError):
+        storage.save(saveDF, 'otherTable')
+    storage.close()
+
+# A backend missing any method of the interface cannot be instantiated
+def test_StorageBackend_abstract():
+    class PartialBackend(StorageBackend):
+        def save(self, saveDF: pd.DataFrame, saveTable: str): pass
+
+    with pytest.raises(TypeError):
+        PartialBackend()
+    with pytest.raises(TypeError):
+        StorageBackend()
+
+# Range and aggregate queries over the files (no load) give the results of pandas over the direct data
+@pytest.mark.parametrize("fileFormat", ['csv', 'parquet'])
+def test_DuckDB_fileView(fileFormat, setup_directManifest: DataManifest):
+    if fileFormat == 'parquet':
+        pytest.importorskip('pyarrow')
+        setup_directManifest.buildCache('parquet', echo = False)
+    storage = DuckDBBackend()
+    storage.fileView(setup_directManifest.directory, fileFormat)
+
+    expected = ExtractData('market', '2022-02', '2022-03', setup_directManifest, convertDatetime = True)
+    expected = expected.groupby(['Ticker', 'Interval'], as_index = False).agg(rows = ('Close', 'size'), meanClose = ('Close', 'mean'), volume = ('Volume', 'sum'))
+    result = storage.query('''SELECT "Ticker", "Interval", COUNT(*) AS "rows", avg("Close") AS "meanClose", sum("Volume") AS "volume"
+                              FROM "fileData" WHERE "DateTime" BETWEEN $start AND $end
+                              GROUP BY "Ticker", "Interval" ORDER BY "Ticker", "Interval";''',
+                           {'start': pd.Timestamp('2022-02-01').to_pydatetime(), 'end': pd.Timestamp('2022-03-31 23:59:59').to_pydatetime()})
+    pd.testing.assert_frame_equal(result, expected, check_dtype = False)
+    storage.close()
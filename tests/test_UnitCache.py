@@ -0,0 +1,83 @@
+# Testing of the process-wide unit cache (UnitCache), on its own and as used by DataManifest.loadData_fromcsv (and so ExtractData).
+
+# Packages
+import pytest
+import pandas as pd
+
+# My packages
+from arcanequant import DataManifest, ExtractData, UnitCache, unitCache, CSVtoBinary
+from test_ExtractData import setup_directManifest
+
+################################################################
+####################### UNIT CACHE TEST ########################
+################################################################
+# Test by:
+# Caching units over the budget of bytes (evicting the least recently used), checking the versions/options of the units
+# served and their invalidation, then loading units of the test directory through the process-wide cache
+
+################ TEST INPUTS ###############
+testUnit = pd.DataFrame({'DateTime': ['2022-01-03 10:00:00', '2022-01-03 09:45:00'], 'Close': [1.0, 2.0]})
+testSource = ('csv', '/test/')
+
+######################### TEST FUNCTION ########################
+def test_UnitCache():
+    unitBytes = int(testUnit.memory_usage(deep = True).sum())
+    cache = UnitCache(maxBytes = 2 * unitBytes)
+
+    cache.put(testSource, 'A', 15, '2022-01', 1, testUnit)
+    cache.put(testSource, 'B', 15, '2022-01', 1, testUnit)
+    assert cache.get(testSource, 'A', 15, '2022-01', 2) is None # Other version
+    assert cache.get(testSource, 'A', 15, '2022-01', 1, options = (True,)) is None # Other options
+    served = cache.get(testSource, 'A', 15, '2022-01', 1)
+    pd.testing.assert_frame_equal(served, testUnit)
+    served.loc[0, 'Close'] = 0.0 # Copies are served
+    pd.testing.assert_frame_equal(cache.get(testSource, 'A', 15, '2022-01', 1), testUnit)
+
+    # A is the most recently used, so B is evicted
+    cache.put(testSource, 'C', 15, '2022-01', 1, testUnit)
+    assert cache.get(testSource, 'B', 15, '2022-01', 1) is None
+    assert cache.stats == {'hits': 2, 'misses': 3, 'evictions': 1, 'units': 2, 'bytes': 2 * unitBytes, 'maxBytes': 2 * unitBytes}
+
+    # Invalidation of a unit, then of the whole source (new generation)
+    assert cache.invalidate(ticker = 'C') == 1
+    assert cache.invalidate(testSource) == 1 and cache.generation(testSource) == 1
+    assert cache.stats['units'] == 0 and cache.stats['bytes'] == 0
+
+def test_UnitCache_loadData(setup_directManifest: DataManifest, monkeypatch):
+    monkeypatch.setattr(unitCache, 'maxBytes', 64 * 1024**2)
+    unitCache.clear()
+    manifest = setup_directManifest
+
+    expected = manifest.loadData_fromcsv('MSFT', 15, '2022-02', echo = False)
+    hits = unitCache.hits
+    pd.testing.assert_frame_equal(manifest.loadData_fromcsv('MSFT', 15, '2022-02', echo = False), expected)
+    assert unitCache.hits == hits + 1
+    # Same for ExtractData (reading units through loadData_fromcsv)
+    extracted = ExtractData('market', '2022-02', '2022-02', manifest, Ticker = 'MSFT')
+    assert unitCache.hits == hits + 2
+    pd.testing.assert_frame_equal(extracted, expected)
+
+    # Changed file (new version) is read again
+    csvPath = f"{manifest.directory}MSFT/MSFT_15_2022-02.csv"
+    expected.iloc[:1].to_csv(csvPath, index = False)
+    try:
+        assert len(manifest.loadData_fromcsv('MSFT', 15, '2022-02', echo = False)) == 1
+    finally:
+        expected.to_csv(csvPath, index = False)
+
+    # Incomplete units (2) are never cached
+    manifest.setValue('MSFT', 15, '2022-02', 2)
+    try:
+        hits, units = unitCache.hits, unitCache.stats['units']
+        for _ in range(2): manifest.loadData_fromcsv('MSFT', 15, '2022-02', echo = False)
+        assert unitCache.hits == hits and unitCache.stats['units'] == units
+    finally:
+        manifest.setValue('MSFT', 15, '2022-02', 1)
+
+    # One-pass bulk reads (cache disabled) neither use nor fill the cache
+    cacheStats = unitCache.stats
+    manifest.loadData_fromcsv('NVDA', 15, '2022-01', echo = False, cache = False)
+    CSVtoBinary(manifest, echo = False)
+    assert unitCache.stats == cacheStats
+
+#########################